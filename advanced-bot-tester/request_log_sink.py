@@ -0,0 +1,152 @@
+# Streaming request log for the Bot Authentication Testing Framework
+# Attempts are written as compact JSONL (optionally gzip) as they happen,
+# in buffered batches, and rotated by size or age. RunningSummary keeps the
+# statistics the end-of-run summary needs, so nothing holds the full log.
+#
+# Files are named <prefix>.0000.jsonl, <prefix>.0001.jsonl, ... (.jsonl.gz
+# with compression). Each buffered flush reaches the OS (a gzip sync flush
+# when compressed), so a crash loses at most one buffer.
+
+import json
+import math
+import os
+import threading
+import time
+
+
+class RunningSummary:
+    """Attempt counts and response-time statistics, updated per entry (Welford)"""
+
+    def __init__(self):
+        self.total = 0
+        self.successes = 0
+        self.status_codes = {}
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self.response_time_min = math.inf
+        self.response_time_max = 0.0
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, entry):
+        self.total += 1
+        self.successes += bool(entry.get('success'))
+        status = str(entry.get('status_code'))
+        self.status_codes[status] = self.status_codes.get(status, 0) + 1
+        if self.first_timestamp is None:
+            self.first_timestamp = entry.get('timestamp')
+        self.last_timestamp = entry.get('timestamp')
+
+        response_time = entry.get('response_time')
+        if response_time is not None:
+            self.response_time_min = min(self.response_time_min, response_time)
+            self.response_time_max = max(self.response_time_max, response_time)
+            delta = response_time - self._mean
+            self._mean += delta / self.total
+            self._m2 += delta * (response_time - self._mean)
+
+    def snapshot(self):
+        return {
+            'total_attempts': self.total,
+            'successful_attempts': self.successes,
+            'status_codes': dict(self.status_codes),
+            'first_timestamp': self.first_timestamp,
+            'last_timestamp': self.last_timestamp,
+            'response_time_mean': self._mean if self.total else None,
+            'response_time_std': math.sqrt(self._m2 / self.total) if self.total else None,
+            'response_time_min': self.response_time_min if self.total else None,
+            'response_time_max': self.response_time_max if self.total else None,
+        }
+
+
+class RequestLogSink:
+    """
+    Append-only JSONL log with buffered writes and rotation.
+
+    ``append`` takes the same dicts ``log_request`` builds. Lines are
+    buffered and written once ``buffer_entries`` are pending or
+    ``flush_seconds`` have passed; a file is rotated once it holds
+    ``max_bytes`` (uncompressed) or is ``max_seconds`` old.
+    """
+
+    def __init__(self, prefix, compress=False, max_bytes=64 * 2 ** 20, max_seconds=None,
+                 buffer_entries=256, flush_seconds=1.0):
+        self.prefix = prefix
+        self.compress = compress
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.buffer_entries = buffer_entries
+        self.flush_seconds = flush_seconds
+        self.entries = 0
+        self.files = []
+        self._buffer = []
+        self._file = None
+        self._file_bytes = 0
+        self._file_opened = 0.0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _open_next(self):
+        if self._file is not None:
+            self._file.close()
+        path = f"{self.prefix}.{len(self.files):04d}.jsonl" + ('.gz' if self.compress else '')
+        if self.compress:
+            import gzip
+            self._file = gzip.open(path, 'wt', encoding='utf-8')
+        else:
+            self._file = open(path, 'w', encoding='utf-8')
+        self.files.append(path)
+        self._file_bytes = 0
+        self._file_opened = time.monotonic()
+
+    def _write_buffer(self):
+        if not self._buffer:
+            return
+        for line in self._buffer:
+            # Rotate before writing, so a full file never leaves an empty successor behind
+            if self._file is None or self._file_bytes >= self.max_bytes:
+                self._open_next()
+            self._file.write(line)
+            self._file_bytes += len(line)
+        self._file.flush()
+        self._buffer = []
+        self._last_flush = time.monotonic()
+
+    def append(self, entry):
+        line = json.dumps(entry, separators=(',', ':')) + '\n'
+        with self._lock:
+            self.entries += 1
+            now = time.monotonic()
+            if (self.max_seconds is not None and self._file is not None
+                    and now - self._file_opened >= self.max_seconds):
+                # Entries buffered so far belong to the old file
+                self._write_buffer()
+                self._file.close()
+                self._file = None
+            self._buffer.append(line)
+            if len(self._buffer) >= self.buffer_entries or now - self._last_flush >= self.flush_seconds:
+                self._write_buffer()
+
+    def __len__(self):
+        return self.entries
+
+    def flush(self):
+        with self._lock:
+            self._write_buffer()
+
+    def close(self):
+        with self._lock:
+            self._write_buffer()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,38 @@
+# Clocks for the Bot Authentication Testing Framework
+# BotBehaviorSimulator reads and spends time only through its clock.
+# SystemClock sleeps for real; VirtualClock only moves its own time forward,
+# so the same attack code replays hours of pacing in microseconds
+# (see trace_synthesis.py).
+
+import time
+from datetime import datetime, timedelta
+
+
+class SystemClock:
+    """Wall-clock time and real sleeps"""
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def now(self):
+        return datetime.now()
+
+    def perf_counter(self):
+        return time.perf_counter()
+
+
+class VirtualClock:
+    """Simulated time starting at ``start``; sleeping advances it instantly"""
+
+    def __init__(self, start=None):
+        self.start = start or datetime.now()
+        self.elapsed = 0.0
+
+    def sleep(self, seconds):
+        self.elapsed += max(0.0, seconds)
+
+    def now(self):
+        return self.start + timedelta(seconds=self.elapsed)
+
+    def perf_counter(self):
+        return self.elapsed
@@ -0,0 +1,328 @@
+# Virtual-clock trace synthesis for the Bot Authentication Testing Framework
+# Runs BotBehaviorSimulator's attack modes (spray, stuffing, brute, slow)
+# against a VirtualClock and a SimulatedTransport, so nothing sleeps and no
+# request leaves the process, and mixes them with human login sessions
+# arriving on a day/night cycle. Days of traffic are written in seconds as one
+# time-ordered request log (RequestLogSink JSONL, rotated, optionally gzip).
+# Actors start only when the merge of their streams reaches them, and entries
+# go to disk as they leave the merge, so memory follows the actors in flight,
+# not the simulated span.
+#
+# Entries have the request log fields plus ip, label ('bot' or 'human'),
+# actor and mode, so pattern_engine.py and detector training can use them as
+# labelled data. --telemetry adds a behavioral session per entry (bot- or
+# human-like, from models/synthetic_data.py) for FraudDetector. A
+# <prefix>.manifest.json lists every actor with its parameters.
+#
+# Usage:
+#   python trace_synthesis.py --days 3 --bots 60 --humans-per-hour 300 --output traces/run
+#   python pattern_engine.py scan traces/run.*.jsonl
+
+import argparse
+import contextlib
+import heapq
+import importlib.util
+import itertools
+import json
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from request_log_sink import RequestLogSink
+from sim_clock import VirtualClock
+
+TESTER_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SUCCESS_PAGE = "<html><body><h1>Welcome back, {username}</h1><p>Your dashboard is ready.</p></body></html>"
+FAILURE_PAGE = "<html><body><h1>Sign in</h1><p>Invalid username or password.</p></body></html>"
+
+# Attack modes and how often each is picked for a bot
+BOT_MODES = {'spray': 0.35, 'stuffing': 0.2, 'brute': 0.3, 'slow': 0.15}
+
+# Accounts brute-force bots go after
+BRUTE_FORCE_TARGETS = ('admin', 'administrator', 'root', 'user', 'test')
+
+# Weak account the stuffing list eventually hits, so some bot runs succeed
+WEAK_ACCOUNTS = {'guest': 'guest'}
+
+
+class SimulatedTransportError(Exception):
+    pass
+
+
+class SimulatedResponse:
+    def __init__(self, status_code, text, headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+
+class SimulatedTransport:
+    """
+    Stands in for requests.Session: answers logins from an accounts table.
+
+    Each request advances the clock by a server latency drawn from a
+    lognormal distribution (median ``latency_ms``).
+    """
+
+    error = SimulatedTransportError
+
+    def __init__(self, clock, accounts, rng, latency_ms=60.0, latency_sigma=0.35):
+        self.clock = clock
+        self.accounts = accounts
+        self.rng = rng
+        self.latency_mu = math.log(latency_ms / 1000.0)
+        self.latency_sigma = latency_sigma
+
+    def post(self, url, data=None, headers=None, timeout=None, allow_redirects=True):
+        data = data or {}
+        username = data.get('username', data.get('user'))
+        password = data.get('password', data.get('pass'))
+        self.clock.sleep(self.rng.lognormvariate(self.latency_mu, self.latency_sigma))
+        if username is not None and self.accounts.get(username) == password:
+            return SimulatedResponse(302, SUCCESS_PAGE.format(username=username), {'Location': '/dashboard'})
+        return SimulatedResponse(200, FAILURE_PAGE)
+
+
+def load_simulator_class():
+    """BotBehaviorSimulator from bot-auth-script.py (the hyphen prevents a plain import)"""
+    spec = importlib.util.spec_from_file_location('bot_auth_script', os.path.join(TESTER_DIR, 'bot-auth-script.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.BotBehaviorSimulator
+
+
+def random_ip(rng, prefix):
+    return f"{prefix}.{rng.randrange(256)}.{rng.randrange(1, 255)}"
+
+
+def run_bot(simulator_class, actor, start, accounts, rng, target_url):
+    """Entries of one attack run on its own virtual clock"""
+    clock = VirtualClock(start)
+    bot = simulator_class(target_url, clock=clock, transport=SimulatedTransport(clock, accounts, rng), rng=rng)
+    bot.auto_export = False
+    bot.log_context = {'ip': actor['ip'], 'label': 'bot', 'actor': actor['actor'], 'mode': actor['mode']}
+
+    params = actor['params']
+    # The attack methods narrate every attempt; nobody is watching a synthesis run
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        if actor['mode'] == 'spray':
+            bot.password_spray_attack(params['max_passwords'], params['delay'])
+        elif actor['mode'] == 'stuffing':
+            bot.credential_stuffing_attack(delay_range=(params['delay'], params['delay'] * 2))
+        elif actor['mode'] == 'brute':
+            bot.brute_force_attack(params['username'], params['max_passwords'], params['delay'])
+        else:
+            bot.slow_and_low_attack(params['duration_minutes'], params['requests_per_hour'])
+    actor['successful_logins'] = len(bot.successful_logins)
+    return bot.request_log
+
+
+def bot_actor(index, rng):
+    """Randomized parameters for one bot"""
+    mode = rng.choices(list(BOT_MODES), weights=list(BOT_MODES.values()))[0]
+    if mode == 'spray':
+        params = {'max_passwords': rng.randint(1, 5), 'delay': round(rng.uniform(0.5, 5.0), 2)}
+    elif mode == 'stuffing':
+        params = {'delay': round(rng.uniform(0.5, 3.0), 2)}
+    elif mode == 'brute':
+        params = {'username': rng.choice(BRUTE_FORCE_TARGETS), 'max_passwords': rng.randint(10, 30),
+                  'delay': round(rng.uniform(0.2, 3.0), 2)}
+    else:
+        params = {'duration_minutes': rng.randint(30, 240), 'requests_per_hour': rng.randint(10, 60)}
+    return {'actor': f'bot-{index:04d}', 'label': 'bot', 'mode': mode,
+            'ip': random_ip(rng, '10.66'), 'params': params}
+
+
+def typo(password, rng):
+    i = rng.randrange(len(password))
+    if rng.random() < 0.5:
+        return password[:i] + password[i + 1:]
+    return password[:i] + rng.choice('abcdefghijklmnopqrstuvwxyz0123456789') + password[i:]
+
+
+def run_human(actor, start, transport, rng):
+    """Entries of one human login: usually right first time, sometimes after a typo or two"""
+    clock = transport.clock
+    clock.start, clock.elapsed = start, 0.0
+    username, password = actor['username'], actor['password']
+    attempts = 1 + (rng.random() < 0.12) + (rng.random() < 0.03)
+    entries = []
+    for attempt in range(1, attempts + 1):
+        if attempt > 1:
+            # Noticing the error and retyping takes a few seconds, never the same amount
+            clock.sleep(rng.lognormvariate(math.log(6.0), 0.5))
+        tried = password if attempt == attempts else typo(password, rng)
+        sent = clock.perf_counter()
+        response = transport.post('/login', data={'username': username, 'password': tried})
+        entries.append({
+            'timestamp': clock.now().isoformat(),
+            'username': username,
+            'password': tried,
+            'success': response.status_code == 302,
+            'response_time': clock.perf_counter() - sent,
+            'status_code': response.status_code,
+            'attempt_number': attempt,
+            'ip': actor['ip'], 'label': 'human', 'actor': actor['actor'], 'mode': 'human',
+        })
+    return entries
+
+
+def human_arrivals(rng, start, seconds, per_hour, peak_hour=14):
+    """Poisson arrival times (seconds from start), busier around peak_hour and quiet at night"""
+    peak_rate = per_hour * 1.6 / 3600.0
+    t = 0.0
+    while True:
+        t += rng.expovariate(peak_rate)
+        if t >= seconds:
+            return
+        moment = start + timedelta(seconds=t)
+        hour = moment.hour + moment.minute / 60.0
+        # Thinning: accept with the diurnal rate relative to the peak rate
+        if rng.random() < (1 + 0.6 * math.cos(2 * math.pi * (hour - peak_hour) / 24)) / 1.6:
+            yield t
+
+
+def telemetry_sessions(contamination, seed, chunk_size=4096):
+    """Endless behavioral sessions (predict arguments) from models/synthetic_data.py, a chunk at a time"""
+    sys.path.insert(0, os.path.join(TESTER_DIR, '..'))
+    from models.synthetic_data import generate_session_arrays, iter_sessions
+
+    for chunk in itertools.count():
+        yield from iter_sessions(generate_session_arrays(chunk_size, contamination, seed + chunk))
+
+
+def merge_actor_streams(actors):
+    """
+    Entries of all actors in timestamp order.
+
+    ``actors`` yields ``(start, run)`` pairs in start order, where ``run()``
+    returns that actor's time-ordered entries, none earlier than ``start``
+    (ISO timestamps). An actor is run only once every queued entry is later
+    than its start, so only actors in flight are held in memory.
+    """
+    heap = []
+    order = itertools.count()
+    actors = iter(actors)
+    pending = next(actors, None)
+    while heap or pending is not None:
+        while pending is not None and (not heap or pending[0] <= heap[0][0]):
+            entries = iter(pending[1]())
+            entry = next(entries, None)
+            if entry is not None:
+                heapq.heappush(heap, (entry['timestamp'], next(order), entry, entries))
+            pending = next(actors, None)
+        _, _, entry, entries = heapq.heappop(heap)
+        yield entry
+        entry = next(entries, None)
+        if entry is not None:
+            heapq.heappush(heap, (entry['timestamp'], next(order), entry, entries))
+
+
+def synthesize(output, days=1.0, bots=20, humans_per_hour=200, members=2000, start=None, seed=7,
+               telemetry=False, compress=False, max_bytes=64 * 2 ** 20, target_url='http://127.0.0.1:8080/login'):
+    """Write a mixed, labelled trace; returns the manifest"""
+    rng = random.Random(seed)
+    start = start or datetime(2026, 1, 5)
+    seconds = days * 86400
+    simulator_class = load_simulator_class()
+
+    accounts = dict(WEAK_ACCOUNTS)
+    people = []
+    for i in range(members):
+        username = f'member{i:05d}'
+        accounts[username] = f'{username}-{rng.getrandbits(32):08x}'
+        people.append({'username': username, 'password': accounts[username],
+                       'ip': random_ip(rng, f'172.{16 + i % 16}')})
+
+    actors = []
+    for index in range(bots):
+        actor = bot_actor(index, rng)
+        actor['start'] = (start + timedelta(seconds=rng.uniform(0, seconds))).isoformat()
+        actors.append(actor)
+    actors.sort(key=lambda actor: actor['start'])
+    bot_runs = ((actor['start'],
+                 lambda actor=actor: run_bot(simulator_class, actor, datetime.fromisoformat(actor['start']),
+                                             accounts, rng, target_url))
+                for actor in actors)
+
+    transport = SimulatedTransport(VirtualClock(start), accounts, rng)
+    human_sessions = [0]
+
+    def human_run(t):
+        human_sessions[0] += 1
+        person = rng.choice(people)
+        # Most people log in from home; one in five from somewhere else
+        ip = person['ip'] if rng.random() < 0.8 else random_ip(rng, '100.64')
+        actor = {'actor': person['username'], 'username': person['username'], 'password': person['password'], 'ip': ip}
+        return run_human(actor, start + timedelta(seconds=t), transport, rng)
+
+    human_runs = (((start + timedelta(seconds=t)).isoformat(), lambda t=t: human_run(t))
+                  for t in human_arrivals(rng, start, seconds, humans_per_hour))
+
+    # ISO timestamps compare as strings (a whole second has no fraction and still sorts first)
+    entries = merge_actor_streams(heapq.merge(bot_runs, human_runs, key=lambda run: run[0]))
+    sessions = {'bot': telemetry_sessions(1.0, seed), 'human': telemetry_sessions(0.0, seed + 1)} if telemetry else None
+
+    labels = {'bot': 0, 'human': 0}
+    with RequestLogSink(output, compress, max_bytes, buffer_entries=4096) as sink:
+        for entry in entries:
+            labels[entry['label']] += 1
+            if sessions is not None:
+                entry['session'] = next(sessions[entry['label']])
+            sink.append(entry)
+
+    manifest = {
+        'start': start.isoformat(),
+        'end': (start + timedelta(seconds=seconds)).isoformat(),
+        'seed': seed,
+        'entries': sum(labels.values()),
+        'entries_by_label': labels,
+        'human_sessions': human_sessions[0],
+        'members': members,
+        'files': sink.files,
+        'bots': actors,
+    }
+    with open(f'{output}.manifest.json', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthesize labelled bot and human login traces on a virtual clock")
+    parser.add_argument('--output', default='synthetic_trace', help='Trace file prefix')
+    parser.add_argument('--days', type=float, default=1.0, help='Simulated time span (days)')
+    parser.add_argument('--bots', type=int, default=20, help='Attack runs spread over the span')
+    parser.add_argument('--humans-per-hour', type=float, default=200.0, help='Average human logins per hour')
+    parser.add_argument('--members', type=int, default=2000, help='Distinct human accounts')
+    parser.add_argument('--start', type=datetime.fromisoformat, help='Simulated start time (ISO, default 2026-01-05)')
+    parser.add_argument('--seed', type=int, default=7, help='Random seed (same seed, same trace)')
+    parser.add_argument('--telemetry', action='store_true', help='Attach a behavioral session to every entry')
+    parser.add_argument('--gzip', action='store_true', help='Compress the trace files')
+    parser.add_argument('--max-mb', type=float, default=64.0, help='Rotate trace files at this size (MB)')
+    args = parser.parse_args()
+
+    directory = os.path.dirname(args.output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    started = time.perf_counter()
+    manifest = synthesize(args.output, args.days, args.bots, args.humans_per_hour, args.members, args.start,
+                          args.seed, args.telemetry, args.gzip, int(args.max_mb * 2 ** 20))
+    elapsed = time.perf_counter() - started
+
+    print(f"[SYNTH] {manifest['entries']:,} entries ({manifest['entries_by_label']['bot']:,} bot, "
+          f"{manifest['entries_by_label']['human']:,} human) over {args.days:g} simulated days in {elapsed:.1f}s")
+    modes = {}
+    for actor in manifest['bots']:
+        modes[actor['mode']] = modes.get(actor['mode'], 0) + 1
+    print(f"[SYNTH] Bots by mode: {modes}")
+    print(f"[SYNTH] Trace: {', '.join(manifest['files'])}")
+    print(f"[SYNTH] Manifest: {args.output}.manifest.json")
+
+
+if __name__ == "__main__":
+    main()
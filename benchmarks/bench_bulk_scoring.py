@@ -0,0 +1,65 @@
+# Core scaling of offline bulk scoring (models/bulk_scoring.py)
+# Usage: python benchmarks/bench_bulk_scoring.py [--sessions 200000] [--workers 1 2 4 8]
+
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models.bulk_scoring import score_file
+from models.fraud_detector import FraudDetector
+from models.synthetic_data import generate_session_arrays, iter_sessions
+
+
+def check_csv_widths(model_path, input_path, output_path):
+    """CSV output has as many cells per row as header columns, with and without --rules"""
+    for rules in (None, 'default'):
+        score_file(model_path, input_path, output_path, workers=1, output_format='csv', rules=rules, verbose=False)
+        with open(output_path, newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            widths = {len(row) for row in reader}
+        if widths != {len(header)}:
+            raise SystemExit(f"[CHECK] CSV rows have {sorted(widths)} cells under a {len(header)}-column header "
+                             f"(rules={rules})")
+        print(f"[CHECK] CSV output (rules={rules}): {len(header)} columns on every row")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk scoring throughput per worker count")
+    parser.add_argument('--sessions', type=int, default=200000, help='Sessions in the synthetic archive')
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}), help='Worker counts to compare')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='Sessions per chunk')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.path.join(tmp, 'model.fdm')
+        input_path = os.path.join(tmp, 'sessions.jsonl')
+        output_path = os.path.join(tmp, 'scores.jsonl')
+
+        detector = FraudDetector()
+        detector.train()
+        detector.save(model_path)
+        with open(input_path, 'w') as f:
+            for session in iter_sessions(generate_session_arrays(args.sessions)):
+                f.write(json.dumps(session) + '\n')
+        check_csv_widths(model_path, input_path, os.path.join(tmp, 'scores.csv'))
+
+        print(f"{'workers':>8}{'rows/s':>12}{'per core':>12}{'scaling':>9}{'max RSS MB':>12}")
+        print("-" * 53)
+        single = None
+        for workers in args.workers:
+            report = score_file(model_path, input_path, output_path, workers, args.chunk_size, verbose=False)
+            single = single or report['rows_per_s'] / workers
+            peak_rss = max(w['peak_rss_mb'] for w in report['per_worker'])
+            print(f"{workers:>8}{report['rows_per_s']:>12,.0f}{report['rows_per_s_per_core']:>12,.0f}"
+                  f"{report['rows_per_s'] / single / workers:>9.0%}{peak_rss:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# Parity check and latency benchmark for the flat IsolationForest engine
+# Usage: python benchmarks/bench_forest_engine.py [--rows 2000] [--repeat 200]
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models.fraud_detector import FraudDetector
+
+
+def check_parity(detector, X):
+    """Fail loudly if the flat engine disagrees with sklearn"""
+    expected_scores = detector.model.decision_function(X)
+    expected_flags = detector.model.predict(X) == -1
+
+    scores, flags, risk = detector.engine.evaluate(X)
+
+    if not np.array_equal(scores, expected_scores):
+        max_diff = np.max(np.abs(scores - expected_scores))
+        raise AssertionError(f"anomaly scores differ from sklearn (max diff {max_diff:.3e})")
+    if not np.array_equal(flags, expected_flags):
+        raise AssertionError(f"{np.sum(flags != expected_flags)} fraud flags differ from sklearn")
+
+    expected_risk = np.array([max(0, min(1, (0.5 - s) / 1.0)) for s in expected_scores])
+    if not np.array_equal(risk, expected_risk):
+        raise AssertionError("risk scores differ from sklearn")
+
+    print(f"[PARITY] {len(X)} rows: scores, flags and risk identical to sklearn")
+
+
+def time_per_call(fn, repeat):
+    """Median wall time of fn() in microseconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flat forest engine parity check and benchmark")
+    parser.add_argument('--rows', type=int, default=2000, help='Rows for the parity check and batch timing')
+    parser.add_argument('--repeat', type=int, default=200, help='Repetitions per timing')
+    args = parser.parse_args()
+
+    detector = FraudDetector()
+    detector.train()
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(scale=2.0, size=(args.rows, len(detector.FEATURE_COLUMNS)))
+    check_parity(detector, X)
+
+    row = X[:1]
+
+    def sklearn_single():
+        detector.model.decision_function(row)
+        detector.model.predict(row)
+
+    def sklearn_batch():
+        detector.model.decision_function(X)
+        detector.model.predict(X)
+
+    results = [
+        ('single row', time_per_call(sklearn_single, args.repeat),
+         time_per_call(lambda: detector.engine.evaluate(row), args.repeat)),
+        (f'batch of {args.rows}', time_per_call(sklearn_batch, max(args.repeat // 20, 3)),
+         time_per_call(lambda: detector.engine.evaluate(X), max(args.repeat // 20, 3))),
+    ]
+
+    print(f"\n{'scenario':<18}{'sklearn (us)':>16}{'flat engine (us)':>20}{'speedup':>10}")
+    print("-" * 64)
+    for name, baseline, engine in results:
+        print(f"{name:<18}{baseline:>16.1f}{engine:>20.1f}{baseline / engine:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# Correctness checks and benchmark for the geolocation grid index and features
+# Usage: python benchmarks/bench_geo_features.py [--points 1000000 10000000] [--queries 100000]
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models.geo_features import GeoFeatures, GeoGridIndex, haversine_km
+
+
+def random_points(rng, n):
+    """Points spread uniformly over the sphere, in degrees"""
+    return np.degrees(np.arcsin(rng.uniform(-1, 1, n))), rng.uniform(-180, 180, n)
+
+
+def check_against_brute_force(index, lat, lon, qlat, qlon, max_km):
+    """Fail loudly if the index disagrees with an exhaustive scan"""
+    distances, _ = index.nearest_batch(qlat, qlon, max_km)
+    for i in range(len(qlat)):
+        expected = haversine_km(qlat[i], qlon[i], lat, lon).min()
+        single, _ = index.nearest(qlat[i], qlon[i])
+        if abs(single - expected) > 1e-6:
+            raise AssertionError(f"nearest() off for query {i}: {single} vs {expected}")
+        if expected <= max_km and abs(distances[i] - expected) > 1e-6:
+            raise AssertionError(f"nearest_batch() off for query {i}: {distances[i]} vs {expected}")
+    print(f"[CHECK] {len(qlat)} queries agree with brute force")
+
+
+def check_batch_against_observe(rng, n_events=10000, n_users=100):
+    """Fail loudly if batch() disagrees with observe() replayed over the same time-ordered log"""
+    # Users revisit a few home locations (repeats within the dedupe radius) and
+    # sometimes log in from anywhere, so histories both merge and overflow
+    homes_lat, homes_lon = random_points(rng, n_users * 4)
+    users = rng.integers(0, n_users, n_events)
+    home = users * 4 + rng.integers(0, 4, n_events)
+    lat = homes_lat[home] + rng.normal(0, 0.002, n_events)
+    lon = homes_lon[home] + rng.normal(0, 0.002, n_events)
+    away = rng.random(n_events) < 0.3
+    lat[away], lon[away] = random_points(rng, int(away.sum()))
+    timestamps = np.cumsum(rng.exponential(300.0, n_events))
+
+    bad_regions = GeoGridIndex(*random_points(rng, 1000), radius_km=50.0)
+    expected = GeoFeatures(bad_regions)
+    rows = np.array([expected.observe(int(u), a, b, t)
+                     for u, a, b, t in zip(users.tolist(), lat.tolist(), lon.tolist(), timestamps.tolist())])
+    features = GeoFeatures(bad_regions).batch(users, lat, lon, timestamps)
+    if not np.allclose(features, rows, rtol=0, atol=1e-9):
+        bad = np.argwhere(~np.isclose(features, rows, rtol=0, atol=1e-9))[0]
+        raise AssertionError(f"batch() off at event {bad[0]}, feature {bad[1]}: "
+                             f"{features[tuple(bad)]} vs {rows[tuple(bad)]}")
+    print(f"[CHECK] batch() matches observe() on {n_events} events from {n_users} users")
+
+
+def percentiles_us(fn, args_list):
+    timings = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    timings = np.asarray(timings) * 1e6
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Geo grid index benchmark")
+    parser.add_argument('--points', type=int, nargs='+', default=[1000000, 10000000], help='Indexed points')
+    parser.add_argument('--queries', type=int, default=100000, help='Queries for the batch timing')
+    parser.add_argument('--single', type=int, default=2000, help='Queries for the per-request timings')
+    parser.add_argument('--max-km', type=float, default=50.0, help='Search radius for bounded queries')
+    parser.add_argument('--cell-km', type=float, default=25.0, help='Grid cell size')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    check_batch_against_observe(rng)
+    print(f"{'points':>12}{'build s':>10}{'MB':>8}{'p50 us':>9}{'p99 us':>9}"
+          f"{'knn p50':>9}{'knn p99':>9}{'batch q/s':>12}{'observe us':>12}")
+    print("-" * 90)
+    for n in args.points:
+        lat, lon = random_points(rng, n)
+        start = time.perf_counter()
+        index = GeoGridIndex(lat, lon, cell_km=args.cell_km)
+        build = time.perf_counter() - start
+        size_mb = sum(a.nbytes for a in (index.cells, index.offsets, index.order,
+                                         index.lat, index.lon, index.cos_lat)) / 2 ** 20
+
+        qlat, qlon = random_points(rng, max(args.queries, args.single))
+        if n <= 1000000:
+            check_against_brute_force(index, lat, lon, qlat[:20], qlon[:20], args.max_km)
+
+        single = list(zip(qlat[:args.single].tolist(), qlon[:args.single].tolist()))
+        bounded_p50, bounded_p99 = percentiles_us(lambda a, b: index.nearest(a, b, args.max_km), single)
+        knn_p50, knn_p99 = percentiles_us(index.nearest, single)
+
+        start = time.perf_counter()
+        index.nearest_batch(qlat[:args.queries], qlon[:args.queries], args.max_km)
+        batch_rate = args.queries / (time.perf_counter() - start)
+
+        geo = GeoFeatures(GeoGridIndex(lat[:100000], lon[:100000], radius_km=10.0))
+        users = rng.integers(0, 10000, len(single)).tolist()
+        observe_args = [(user, a, b, i * 60.0) for i, (user, (a, b)) in enumerate(zip(users, single))]
+        observe_p50, _ = percentiles_us(geo.observe, observe_args)
+
+        print(f"{n:>12,}{build:>10.2f}{size_mb:>8.0f}{bounded_p50:>9.1f}{bounded_p99:>9.1f}"
+              f"{knn_p50:>9.1f}{knn_p99:>9.1f}{batch_rate:>12,.0f}{observe_p50:>12.1f}")
+        del index, lat, lon
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+# Benchmark suite for the fraud scoring and feature extraction hot paths
+#
+# Usage:
+#   python benchmarks/run_benchmarks.py                          # run and print
+#   python benchmarks/run_benchmarks.py --output results.json
+#   python benchmarks/run_benchmarks.py --save-baseline          # store benchmarks/baseline.json
+#   python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json --threshold 0.25
+#   python benchmarks/run_benchmarks.py --memory                 # peak RSS per scenario
+#
+# With --baseline the run exits with status 1 when any scenario's median time
+# is more than --threshold slower than the stored baseline. --cold-start-budget-ms
+# does the same for the cold_start scenarios against an absolute budget; they
+# also fail outright if the scoring path imports pandas or sklearn. Every run
+# exits with status 1 when a scenario's check fails, including forest_parity
+# (FlatForest against sklearn's IsolationForest on a fixed-seed fit).
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, REPO_ROOT)
+
+from models.fraud_detector import FraudDetector
+from models.synthetic_data import generate_sessions
+from models.telemetry_codec import encode_behavioral_data
+from models.user_baselines import UserBaselineStore
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# (keystrokes, mouse moves) per session for the extract_features scenarios
+EVENT_COUNTS = [(10, 10), (100, 100), (1000, 1000)]
+
+
+def measure(fn, repeat, warmup=1):
+    """Run fn() repeat times and return timing statistics in seconds"""
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    timings = np.asarray(timings)
+    return {
+        'median_s': float(np.median(timings)),
+        'p90_s': float(np.percentile(timings, 90)),
+        'min_s': float(timings.min()),
+        'iterations': repeat,
+    }
+
+
+class ScenarioFailed(Exception):
+    """A scenario ran but its check failed (reported, not raised as a traceback)"""
+
+
+class Context:
+    """
+    Shared fixtures, built lazily so --memory children only pay for what they use.
+
+    Given an ``artifact`` the detector is loaded from it instead of trained,
+    so a child's peak RSS reflects its scenario rather than the fitting
+    stack. Temporary files live in a directory removed by ``close``.
+    """
+
+    def __init__(self, quick=False, artifact=None):
+        self.quick = quick
+        self._detector = None
+        self._artifact = artifact
+        self._tmpdir = None
+
+    @property
+    def detector(self):
+        if self._detector is None:
+            if self._artifact is not None:
+                self._detector = FraudDetector.load(self._artifact)
+            else:
+                self._detector = FraudDetector()
+                self._detector.train()
+        return self._detector
+
+    @property
+    def artifact(self):
+        if self._artifact is None:
+            self._tmpdir = tempfile.TemporaryDirectory(prefix='fraud-bench-')
+            path = os.path.join(self._tmpdir.name, 'model.fdm')
+            self.detector.save(path)
+            self._artifact = path
+        return self._artifact
+
+    def close(self):
+        if self._tmpdir is not None:
+            self._tmpdir.cleanup()
+            self._tmpdir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def repeat(self, n):
+        return max(3, n // 10) if self.quick else n
+
+
+def scenario_extract_features(keystrokes, mouse_moves, packed=False):
+    def run(ctx):
+        sessions = generate_sessions(200, seed=1, keystrokes=(keystrokes, keystrokes),
+                                     mouse_moves=(mouse_moves, mouse_moves))
+        if packed:
+            for session in sessions:
+                session['behavioral_data'] = encode_behavioral_data(session['behavioral_data'])
+        detector = ctx.detector
+        position = [0]
+
+        def extract_one():
+            session = sessions[position[0] % len(sessions)]
+            position[0] += 1
+            detector.extract_features(session['behavioral_data'], session['geolocation_data'],
+                                      session['honeypot_triggered'])
+
+        return measure(extract_one, ctx.repeat(500))
+    return run
+
+
+def scenario_predict_single(ctx):
+    session = generate_sessions(1, seed=2)[0]
+    detector = ctx.detector
+    return measure(lambda: detector.predict(session['behavioral_data'], session['geolocation_data'],
+                                            session['honeypot_triggered']), ctx.repeat(500))
+
+
+def scenario_predict_batch(ctx):
+    sessions = generate_sessions(1000, seed=3)
+    detector = ctx.detector
+    result = measure(lambda: detector.predict_batch(sessions), ctx.repeat(30))
+    result['rows'] = len(sessions)
+    return result
+
+
+def scenario_predict_batch_cascade(ctx):
+    """predict_batch_1000 with the default rule cascade short-circuiting obvious sessions"""
+    sessions = generate_sessions(1000, seed=3)
+    detector = FraudDetector()
+    detector.swap_state(ctx.detector.state)
+    cascade = detector.enable_rule_cascade()
+    result = measure(lambda: detector.predict_batch(sessions), ctx.repeat(30))
+    result['rows'] = len(sessions)
+    result['short_circuit_rate'] = cascade.report()['short_circuit_rate']
+    return result
+
+
+def scenario_forest_parity(ctx):
+    """FlatForest scores, flags and risk identical to sklearn on a fixed-seed fit; times the flat engine"""
+    from bench_forest_engine import check_parity
+
+    detector = ctx.detector
+    if detector.model is None:
+        # Loaded artifacts carry no sklearn estimator to compare with
+        detector = FraudDetector()
+        detector.train()
+    X = np.random.default_rng(0).normal(scale=2.0, size=(2000, len(detector.feature_columns)))
+    try:
+        check_parity(detector, X)
+    except AssertionError as e:
+        raise ScenarioFailed(f"FlatForest differs from sklearn: {e}")
+    result = measure(lambda: detector.engine.evaluate(X), ctx.repeat(50))
+    result['rows'] = len(X)
+    return result
+
+
+def scenario_baseline_update(ctx):
+    """1000 compare_and_update calls against a store holding 100k users"""
+    with tempfile.TemporaryDirectory() as directory:
+        store = UserBaselineStore.create(os.path.join(directory, 'baselines.npy'), 1 << 18)
+        rng = np.random.default_rng(4)
+        values = rng.normal([150, 5, 100], [30, 1.5, 25], (1000, 3)).tolist()
+        for user in range(100000):
+            store.update(user, values[user % 1000], 28.6, 77.2)
+        users = rng.integers(0, 100000, 1000).tolist()
+
+        def update_batch():
+            for user, row in zip(users, values):
+                store.compare_and_update(user, row, 28.6, 77.2)
+
+        result = measure(update_batch, ctx.repeat(30))
+        result['rows'] = len(users)
+        return result
+
+
+def scenario_train(ctx):
+    detector = FraudDetector()
+    return measure(detector.train, ctx.repeat(10), warmup=0)
+
+
+# Modules the inference path must not import (fitting and demo data only)
+COLD_START_FORBIDDEN = ('pandas', 'sklearn')
+
+
+def measure_subprocess(code, repeat):
+    """Timing statistics for Python snippets that print their own elapsed seconds.
+
+    A snippet fails a check with ``sys.exit(message)``; that becomes ScenarioFailed.
+    """
+    timings = []
+    for _ in range(repeat):
+        process = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+        if process.returncode != 0:
+            lines = process.stderr.strip().splitlines()
+            raise ScenarioFailed(lines[-1] if lines else f'exited with status {process.returncode}')
+        timings.append(float(process.stdout.strip().splitlines()[-1]))
+    timings = np.asarray(timings)
+    return {
+        'median_s': float(np.median(timings)),
+        'p90_s': float(np.percentile(timings, 90)),
+        'min_s': float(timings.min()),
+        'iterations': len(timings),
+    }
+
+
+def scenario_cold_start(ctx):
+    """Fresh interpreter: import the detector, load the artifact and score one session"""
+    code = (
+        "import sys, time; start = time.perf_counter(); "
+        f"sys.path.insert(0, {REPO_ROOT!r}); "
+        "from models.fraud_detector import FraudDetector; "
+        f"d = FraudDetector.load({ctx.artifact!r}); "
+        "d.predict(None, None, False); "
+        "elapsed = time.perf_counter() - start; "
+        f"heavy = [m for m in {COLD_START_FORBIDDEN!r} if m in sys.modules]; "
+        "sys.exit(f'inference path imported {heavy}') if heavy else print(elapsed)"
+    )
+    return measure_subprocess(code, ctx.repeat(10))
+
+
+def scenario_cold_start_tester(ctx):
+    """Fresh interpreter: bot-auth-script.py --help (argument parsing before any network import)"""
+    script = os.path.join(REPO_ROOT, 'advanced-bot-tester', 'bot-auth-script.py')
+    code = (
+        "import runpy, sys, time; start = time.perf_counter(); "
+        f"sys.argv = [{script!r}, '--help']\n"
+        f"try:\n    runpy.run_path({script!r}, run_name='__main__')\n"
+        "except SystemExit:\n    pass\n"
+        "sys.exit('--help imported requests') if 'requests' in sys.modules else "
+        "print(time.perf_counter() - start)"
+    )
+    return measure_subprocess(code, ctx.repeat(10))
+
+
+SCENARIOS = {f'extract_features_k{k}_m{m}': scenario_extract_features(k, m) for k, m in EVENT_COUNTS}
+SCENARIOS.update({f'extract_features_packed_k{k}_m{m}': scenario_extract_features(k, m, packed=True)
+                  for k, m in EVENT_COUNTS})
+SCENARIOS.update({
+    'predict_single': scenario_predict_single,
+    'predict_batch_1000': scenario_predict_batch,
+    'predict_batch_1000_cascade': scenario_predict_batch_cascade,
+    'forest_parity': scenario_forest_parity,
+    'baseline_update_1000': scenario_baseline_update,
+    'train': scenario_train,
+    'cold_start': scenario_cold_start,
+    'cold_start_tester': scenario_cold_start_tester,
+})
+
+
+def peak_rss_mb():
+    # Linux keeps ru_maxrss across fork + exec, so a child would report the
+    # parent's peak; VmHWM belongs to this process image alone
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024.0 * 1024.0) if sys.platform == 'darwin' else rss / 1024.0
+
+
+def run_in_child(name, quick, artifact):
+    """Run one scenario in a fresh interpreter so its peak RSS is isolated"""
+    command = [sys.executable, os.path.abspath(__file__), '--child', name, '--artifact', artifact]
+    if quick:
+        command.append('--quick')
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def compare(results, baseline, threshold):
+    """Return the scenarios whose median regressed more than threshold"""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get('results', {}).get(name)
+        if not reference or 'median_s' not in result or 'median_s' not in reference:
+            continue
+        ratio = result['median_s'] / reference['median_s']
+        result['baseline_ratio'] = ratio
+        if ratio > 1 + threshold:
+            regressions.append((name, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FraudDetector benchmark suite")
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='Run only this scenario (repeatable)')
+    parser.add_argument('--quick', action='store_true', help='Fewer iterations (smoke run)')
+    parser.add_argument('--memory', action='store_true', help='Run each scenario in its own process and report peak RSS')
+    parser.add_argument('--output', help='Write results JSON here')
+    parser.add_argument('--baseline', help='Compare against this results JSON')
+    parser.add_argument('--save-baseline', action='store_true', help=f'Also write results to {DEFAULT_BASELINE}')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Allowed slowdown vs baseline (0.25 = 25%%)')
+    parser.add_argument('--cold-start-budget-ms', type=float,
+                        help='Fail when a cold_start scenario median exceeds this many milliseconds')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--artifact', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        with Context(args.quick, args.artifact) as ctx:
+            try:
+                result = SCENARIOS[args.child](ctx)
+            except ScenarioFailed as e:
+                result = {'error': str(e)}
+        result['peak_rss_mb'] = peak_rss_mb()
+        print(json.dumps(result))
+        return
+
+    names = args.scenario or list(SCENARIOS)
+    results = {}
+    exit_code = 0
+
+    print(f"{'scenario':<40}{'median':>12}{'p90':>12}" + (f"{'peak RSS':>12}" if args.memory else ''))
+    print("-" * (64 + (12 if args.memory else 0)))
+    with Context(args.quick) as ctx:
+        for name in names:
+            if args.memory:
+                # Children load the parent's trained artifact instead of training their own
+                result = run_in_child(name, args.quick, ctx.artifact)
+            else:
+                try:
+                    result = SCENARIOS[name](ctx)
+                except ScenarioFailed as e:
+                    result = {'error': str(e)}
+            results[name] = result
+            if 'error' in result:
+                print(f"{name:<40}[FAIL] {result['error']}")
+                exit_code = 1
+                continue
+            line = f"{name:<40}{result['median_s'] * 1e3:>10.3f}ms{result['p90_s'] * 1e3:>10.3f}ms"
+            if args.memory:
+                line += f"{result['peak_rss_mb']:>10.1f}MB"
+            print(line)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'quick': args.quick,
+        },
+        'results': results,
+    }
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for name, ratio in regressions:
+            print(f"[REGRESSION] {name}: {ratio:.2f}x baseline (threshold {1 + args.threshold:.2f}x)")
+        if regressions:
+            exit_code = 1
+        else:
+            print(f"[OK] No regressions beyond {args.threshold:.0%} of {args.baseline}")
+
+    if args.cold_start_budget_ms is not None:
+        for name, result in results.items():
+            if (name.startswith('cold_start') and 'median_s' in result
+                    and result['median_s'] * 1e3 > args.cold_start_budget_ms):
+                print(f"[REGRESSION] {name}: {result['median_s'] * 1e3:.0f}ms over the "
+                      f"{args.cold_start_budget_ms:.0f}ms cold-start budget")
+                exit_code = 1
+
+    for path in filter(None, [args.output, DEFAULT_BASELINE if args.save_baseline else None]):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"[EXPORT] Results saved to: {path}")
+
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
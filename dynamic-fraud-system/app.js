@@ -524,6 +524,38 @@ class FraudDetectionSystem {
     }
 
     // === UTILITY FUNCTIONS ===
+    // Packed telemetry (FDT1) for the Python scorer, see models/telemetry_codec.py:
+    // 16-byte header, Float64 keystroke times, then interleaved Float32 mouse x/y
+    packTelemetry() {
+        const keystrokes = this.behavioralTracker.keystrokeData.filter(k => k.type === 'keydown');
+        const mouse = this.behavioralTracker.mouseData;
+        const mouseOffset = 16 + keystrokes.length * 8;
+        const buffer = new ArrayBuffer(mouseOffset + mouse.length * 8);
+
+        const header = new DataView(buffer, 0, 16);
+        [0x46, 0x44, 0x54, 0x31].forEach((byte, i) => header.setUint8(i, byte));
+        header.setUint32(4, keystrokes.length, true);
+        header.setUint32(8, mouse.length, true);
+
+        const times = new Float64Array(buffer, 16, keystrokes.length);
+        keystrokes.forEach((k, i) => { times[i] = k.timestamp; });
+        const positions = new Float32Array(buffer, mouseOffset, mouse.length * 2);
+        mouse.forEach((m, i) => {
+            positions[2 * i] = m.x;
+            positions[2 * i + 1] = m.y;
+        });
+        return buffer;
+    }
+
+    packTelemetryBase64() {
+        const bytes = new Uint8Array(this.packTelemetry());
+        let binary = '';
+        for (let i = 0; i < bytes.length; i += 0x8000) {
+            binary += String.fromCharCode.apply(null, bytes.subarray(i, i + 0x8000));
+        }
+        return btoa(binary);
+    }
+
     calculateRhythmConsistency(flightTimes) {
         if (flightTimes.length < 3) return 0;
         
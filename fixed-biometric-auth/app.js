@@ -1742,6 +1742,46 @@ class FixedBiometricAuthPlatform {
         return type === 'platform' ? 'Platform Authenticator' : 'Hardware Key';
     }
 
+    /**
+     * Pack keystroke and mouse telemetry for the Python scorer (FDT1 format,
+     * see models/telemetry_codec.py): 16-byte header, Float64 keydown times,
+     * then interleaved Float32 mouse x/y
+     * @returns {ArrayBuffer} Packed telemetry
+     */
+    packTelemetry() {
+        const keystrokes = this.behavioralTracking.keystrokePatterns.filter(k => k.type === 'down');
+        const mouse = this.behavioralTracking.mouseMovePatterns;
+        const mouseOffset = 16 + keystrokes.length * 8;
+        const buffer = new ArrayBuffer(mouseOffset + mouse.length * 8);
+
+        const header = new DataView(buffer, 0, 16);
+        [0x46, 0x44, 0x54, 0x31].forEach((byte, i) => header.setUint8(i, byte));
+        header.setUint32(4, keystrokes.length, true);
+        header.setUint32(8, mouse.length, true);
+
+        const times = new Float64Array(buffer, 16, keystrokes.length);
+        keystrokes.forEach((k, i) => { times[i] = k.timestamp; });
+        const positions = new Float32Array(buffer, mouseOffset, mouse.length * 2);
+        mouse.forEach((m, i) => {
+            positions[2 * i] = m.x;
+            positions[2 * i + 1] = m.y;
+        });
+        return buffer;
+    }
+
+    /**
+     * Packed telemetry as base64, for JSON request bodies
+     * @returns {string} Base64 encoded telemetry
+     */
+    packTelemetryBase64() {
+        const bytes = new Uint8Array(this.packTelemetry());
+        let binary = '';
+        for (let i = 0; i < bytes.length; i += 0x8000) {
+            binary += String.fromCharCode.apply(null, bytes.subarray(i, i + 0x8000));
+        }
+        return btoa(binary);
+    }
+
     /**
      * Capture behavioral profile for new users
      * @returns {Object} Behavioral profile
@@ -1751,6 +1791,7 @@ class FixedBiometricAuthPlatform {
             keystrokePatterns: [...this.behavioralTracking.keystrokePatterns],
             touchPatterns: [...this.behavioralTracking.touchPatterns],
             mouseMovePatterns: [...this.behavioralTracking.mouseMovePatterns],
+            packedTelemetry: this.packTelemetryBase64(),
             capturedAt: new Date().toISOString(),
             deviceFingerprint: this.generateDeviceFingerprint()
         };
@@ -0,0 +1,198 @@
+# Multi-core offline scoring of session archives
+#
+# The input log (JSONL, CSV or Parquet) is read in chunks and scored in a
+# process pool. Every worker loads the model artifact once with mmap=True,
+# so the forest arrays are pages of one shared memory map rather than a
+# private copy per process. Each worker decodes, scores and formats its own
+# chunk; the parent only reads raw records and writes finished text blocks
+# in input order. At most ``workers * 2`` chunks are in flight, so memory
+# per process stays flat whatever the size of the archive.
+#
+# Output is one row per session: its index in the input, the id field when
+# the record has one, is_fraud, risk_score, anomaly_score (and reason with
+# --rules).
+#
+# Usage:
+#   python -m models.bulk_scoring model.fdm sessions.jsonl --output scores.jsonl --workers 8
+#   python -m models.bulk_scoring model.fdm sessions.csv --output scores.csv --rules
+
+import argparse
+import concurrent.futures
+import csv
+import io
+import json
+import math
+import os
+import resource
+import time
+
+from .fraud_detector import FraudDetector
+from .training_pipeline import iter_raw_chunks, parse_records
+
+OUTPUT_FIELDS = ('index', 'id', 'is_fraud', 'risk_score', 'anomaly_score', 'reason')
+
+# Detector of the current worker process, set by _init_worker
+_worker_detector = None
+
+
+def _init_worker(model_path, rules=None, rules_mode='enforce'):
+    global _worker_detector
+    _worker_detector = FraudDetector.load(model_path, mmap=True)
+    if rules:
+        _worker_detector.enable_rule_cascade(None if rules == 'default' else rules, rules_mode)
+
+
+def _record_ids(fmt, records, sessions, id_field):
+    if fmt == 'jsonl':
+        return [session.get(id_field) for session in sessions]
+    return [record.get(id_field) for record in records]
+
+
+def _format_rows(output_format, first_index, ids, results, with_reason=False):
+    """Text block for one scored chunk; CSV rows carry reason only ``with_reason``"""
+    reasons = results.get('reason', results.get('shadow_reason'))
+    rows = zip(range(first_index, first_index + len(ids)), ids,
+               results['is_fraud'].tolist(), results['risk_score'].tolist(),
+               results['anomaly_score'].tolist(),
+               reasons.tolist() if reasons is not None else [None] * len(ids))
+
+    out = io.StringIO()
+    if output_format == 'csv':
+        writer = csv.writer(out, lineterminator='\n')
+        for index, session_id, is_fraud, risk, anomaly, reason in rows:
+            row = [index, '' if session_id is None else session_id, int(is_fraud), risk,
+                   '' if math.isnan(anomaly) else anomaly]
+            if with_reason:
+                row.append(reason or '')
+            writer.writerow(row)
+    else:
+        for index, session_id, is_fraud, risk, anomaly, reason in rows:
+            row = {'index': index}
+            if session_id is not None:
+                row['id'] = session_id
+            row['is_fraud'] = is_fraud
+            row['risk_score'] = risk
+            # Sessions decided by a rule have no anomaly score
+            row['anomaly_score'] = None if math.isnan(anomaly) else anomaly
+            if reason:
+                row['reason'] = reason
+            out.write(json.dumps(row))
+            out.write('\n')
+    return out.getvalue()
+
+
+def score_chunk(fmt, records, first_index, id_field, output_format, with_reason=False):
+    """Decode, score and format one raw chunk (runs in worker processes).
+
+    Returns ``(text, stats)`` where stats carries the worker pid, its CPU
+    time for the chunk and its peak RSS.
+    """
+    cpu_start = time.process_time()
+    sessions = parse_records(fmt, records)
+    ids = _record_ids(fmt, records, sessions, id_field)
+    results = _worker_detector.predict_batch(sessions)
+    text = _format_rows(output_format, first_index, ids, results, with_reason)
+    stats = {
+        'pid': os.getpid(),
+        'rows': len(records),
+        'cpu_s': time.process_time() - cpu_start,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+    }
+    return text, stats
+
+
+def _scored_chunks(raw_chunks, workers, worker_args, chunk_args):
+    """Scored text blocks in input order, with bounded look-ahead"""
+    if workers <= 1:
+        _init_worker(*worker_args)
+        first_index = 0
+        for fmt, records in raw_chunks:
+            yield score_chunk(fmt, records, first_index, *chunk_args)
+            first_index += len(records)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(workers, initializer=_init_worker,
+                                                initargs=worker_args) as pool:
+        pending = []
+        first_index = 0
+        for fmt, records in raw_chunks:
+            pending.append(pool.submit(score_chunk, fmt, records, first_index, *chunk_args))
+            first_index += len(records)
+            if len(pending) >= workers * 2:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+def score_file(model_path, input_path, output_path, workers=None, chunk_size=5000, fmt=None,
+               output_format=None, id_field='session_id', rules=None, rules_mode='enforce', verbose=True):
+    """Score every session in ``input_path`` into ``output_path``; returns throughput statistics"""
+    workers = workers or os.cpu_count() or 1
+    if output_format is None:
+        output_format = 'csv' if output_path.lower().endswith('.csv') else 'jsonl'
+    columns = [field for field in OUTPUT_FIELDS if rules or field != 'reason']
+
+    start = time.perf_counter()
+    total_rows = 0
+    per_worker = {}
+    with open(output_path, 'w', newline='') as out:
+        if output_format == 'csv':
+            out.write(','.join(columns) + '\n')
+        chunks = _scored_chunks(iter_raw_chunks(input_path, chunk_size, fmt), workers,
+                                (model_path, rules, rules_mode), (id_field, output_format, 'reason' in columns))
+        for text, stats in chunks:
+            out.write(text)
+            total_rows += stats['rows']
+            worker = per_worker.setdefault(stats['pid'], {'rows': 0, 'cpu_s': 0.0, 'peak_rss_mb': 0.0})
+            worker['rows'] += stats['rows']
+            worker['cpu_s'] += stats['cpu_s']
+            worker['peak_rss_mb'] = max(worker['peak_rss_mb'], stats['peak_rss_mb'])
+            if verbose:
+                elapsed = time.perf_counter() - start
+                print(f"[SCORE] {total_rows:,} sessions scored ({total_rows / elapsed:,.0f}/s)")
+
+    elapsed = time.perf_counter() - start
+    report = {
+        'rows': total_rows,
+        'workers': workers,
+        'elapsed_s': elapsed,
+        'rows_per_s': total_rows / elapsed if elapsed else 0.0,
+        'rows_per_s_per_core': total_rows / elapsed / workers if elapsed else 0.0,
+        'per_worker': [dict(pid=pid, rows_per_cpu_s=w['rows'] / w['cpu_s'] if w['cpu_s'] else 0.0, **w)
+                       for pid, w in sorted(per_worker.items())],
+    }
+    if verbose:
+        print(f"[SCORE] {total_rows:,} sessions in {elapsed:.2f}s: {report['rows_per_s']:,.0f} rows/s, "
+              f"{report['rows_per_s_per_core']:,.0f} rows/s per core ({workers} workers)")
+        for worker in report['per_worker']:
+            print(f"[SCORE]   pid {worker['pid']}: {worker['rows']:,} rows, "
+                  f"{worker['rows_per_cpu_s']:,.0f} rows/cpu-s, peak RSS {worker['peak_rss_mb']:.0f} MB")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a session archive with a saved model in a process pool")
+    parser.add_argument('model', help='Model artifact written by FraudDetector.save')
+    parser.add_argument('input', help='Session log (.jsonl, .csv or .parquet)')
+    parser.add_argument('--output', required=True, help='Scores to write (.jsonl or .csv)')
+    parser.add_argument('--format', choices=['jsonl', 'csv', 'parquet'], help='Override input format detection')
+    parser.add_argument('--output-format', choices=['jsonl', 'csv'], help='Override output format detection')
+    parser.add_argument('--workers', type=int, default=None, help='Scoring processes (default: one per core)')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='Sessions per chunk')
+    parser.add_argument('--id-field', default='session_id', help='Input field copied to the output id column')
+    parser.add_argument('--rules', nargs='?', const='default',
+                        help='Run the rule cascade before the model (default rules, or a JSON rule file)')
+    parser.add_argument('--rules-mode', choices=['enforce', 'shadow'], default='enforce',
+                        help='Let rules decide sessions, or only compare them with the model')
+    parser.add_argument('--report', help='Write the throughput report to this JSON file')
+    args = parser.parse_args()
+
+    report = score_file(args.model, args.input, args.output, args.workers, args.chunk_size, args.format,
+                        args.output_format, args.id_field, args.rules, args.rules_mode)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
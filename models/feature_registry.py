@@ -0,0 +1,195 @@
+import threading
+
+import numpy as np
+
+from .telemetry_codec import PackedTelemetry, as_behavioral_data
+
+
+class FeatureGroup:
+    """
+    Features computed together from the same raw input.
+
+    ``compute(behavioral_data, geolocation_data, honeypot_triggered)`` returns
+    one value per name in ``features``, in that order. ``inputs`` documents
+    which part of the request the group reads.
+    """
+
+    __slots__ = ('name', 'features', 'inputs', 'dtype', 'compute')
+
+    def __init__(self, name, features, inputs, compute, dtype=np.float32):
+        self.name = name
+        self.features = tuple(features)
+        self.inputs = tuple(inputs)
+        self.dtype = np.dtype(dtype)
+        self.compute = compute
+
+
+class ExtractionPlan:
+    """
+    Extraction for one fixed column order (usually the schema of a loaded model).
+
+    Only groups with at least one requested column are evaluated, and values
+    are written straight into a preallocated float32 row; ``row_buffer``
+    returns a per-thread row that is reused across calls.
+    """
+
+    def __init__(self, columns, steps, dtype):
+        self.columns = tuple(columns)
+        self.dtype = dtype
+        # (group, output position per group feature or -1 when unused)
+        self.steps = steps
+        self._local = threading.local()
+
+    def __len__(self):
+        return len(self.columns)
+
+    def new_matrix(self, n_rows):
+        return np.empty((n_rows, len(self.columns)), dtype=self.dtype)
+
+    def row_buffer(self):
+        """Reusable 1 x n_columns matrix owned by the calling thread"""
+        buffer = getattr(self._local, 'row', None)
+        if buffer is None:
+            buffer = self._local.row = self.new_matrix(1)
+        return buffer
+
+    def extract_into(self, row, behavioral_data, geolocation_data, honeypot_triggered):
+        # Packed telemetry is decoded once here, as array views
+        behavioral_data = as_behavioral_data(behavioral_data)
+        for group, positions in self.steps:
+            values = group.compute(behavioral_data, geolocation_data, honeypot_triggered)
+            for position, value in zip(positions, values):
+                if position >= 0:
+                    row[position] = value
+        return row
+
+    def extract_from_source(self, row, source):
+        """Fill a row from an object with a ``group_values(group_name)`` method
+        (e.g. a SessionFeatureAccumulator)"""
+        for group, positions in self.steps:
+            for position, value in zip(positions, source.group_values(group.name)):
+                if position >= 0:
+                    row[position] = value
+        return row
+
+    def extract_matrix(self, sessions):
+        """Feature matrix for a sequence of session dicts (the ``predict``
+        argument names) or ``group_values`` sources, one row per session"""
+        matrix = self.new_matrix(len(sessions))
+        for row, session in zip(matrix, sessions):
+            if hasattr(session, 'group_values'):
+                self.extract_from_source(row, session)
+            else:
+                self.extract_into(row,
+                                  session.get('behavioral_data'),
+                                  session.get('geolocation_data'),
+                                  session.get('honeypot_triggered', False))
+        return matrix
+
+    def to_dict(self, row):
+        return dict(zip(self.columns, row.tolist()))
+
+
+class FeatureRegistry:
+    """Single definition of every feature: name, dtype, group and column order"""
+
+    def __init__(self):
+        self.groups = {}
+        self._feature_groups = {}
+        self._plans = {}
+
+    def register(self, name, features, inputs=(), dtype=np.float32):
+        """Decorator registering ``compute`` for a group of features"""
+        def decorator(compute):
+            duplicates = [f for f in features if f in self._feature_groups]
+            if duplicates:
+                raise ValueError(f"Features already registered: {duplicates}")
+            group = FeatureGroup(name, features, inputs, compute, dtype)
+            self.groups[name] = group
+            for feature in group.features:
+                self._feature_groups[feature] = group
+            self._plans.clear()
+            return compute
+        return decorator
+
+    @property
+    def columns(self):
+        """All registered features in registration order"""
+        return [feature for group in self.groups.values() for feature in group.features]
+
+    def plan(self, columns=None):
+        """ExtractionPlan for ``columns`` (default: every registered feature)"""
+        columns = tuple(columns if columns is not None else self.columns)
+        plan = self._plans.get(columns)
+        if plan is not None:
+            return plan
+
+        unknown = [c for c in columns if c not in self._feature_groups]
+        if unknown:
+            raise ValueError(f"Unknown features: {unknown}")
+
+        steps = []
+        dtype = np.result_type(*(self._feature_groups[c].dtype for c in columns)) if columns else np.float32
+        for group in self.groups.values():
+            positions = tuple(columns.index(f) if f in columns else -1 for f in group.features)
+            if any(position >= 0 for position in positions):
+                steps.append((group, positions))
+
+        plan = self._plans[columns] = ExtractionPlan(columns, steps, dtype)
+        return plan
+
+
+FEATURE_REGISTRY = FeatureRegistry()
+
+
+@FEATURE_REGISTRY.register('keystroke',
+                           ['avg_keystroke_interval', 'std_keystroke_interval', 'typing_speed', 'keystroke_count'],
+                           inputs=['behavioral_data.keystroke_times'])
+def keystroke_features(behavioral_data, geolocation_data, honeypot_triggered):
+    keystroke_times = behavioral_data.get('keystroke_times', []) if behavioral_data else []
+    if len(keystroke_times) > 1:
+        intervals = np.diff(keystroke_times)
+        duration = keystroke_times[-1] - keystroke_times[0]
+        # All keystrokes at one timestamp: no speed, like SessionFeatureAccumulator
+        typing_speed = len(keystroke_times) / duration if duration else 0
+        return np.mean(intervals), np.std(intervals), typing_speed, len(keystroke_times)
+    return 0, 0, 0, len(keystroke_times)
+
+
+@FEATURE_REGISTRY.register('mouse',
+                           ['avg_mouse_speed', 'mouse_movement_variance', 'mouse_step_count'],
+                           inputs=['behavioral_data.mouse_movements'])
+def mouse_features(behavioral_data, geolocation_data, honeypot_triggered):
+    if isinstance(behavioral_data, PackedTelemetry):
+        mouse_xy = behavioral_data.mouse_xy
+        n_moves = len(mouse_xy)
+        if n_moves > 1:
+            xs = mouse_xy[:, 0].astype(float)
+            ys = mouse_xy[:, 1].astype(float)
+    else:
+        mouse_movements = behavioral_data.get('mouse_movements', []) if behavioral_data else []
+        n_moves = len(mouse_movements)
+        if n_moves > 1:
+            xs = np.fromiter((m['x'] for m in mouse_movements), dtype=float, count=n_moves)
+            ys = np.fromiter((m['y'] for m in mouse_movements), dtype=float, count=n_moves)
+    if n_moves > 1:
+        # Step distances computed in one pass
+        dx = np.diff(xs)
+        dy = np.diff(ys)
+        distances = np.sqrt(dx * dx + dy * dy)
+        return np.mean(distances), np.var(distances), n_moves - 1
+    return 0, 0, 0
+
+
+@FEATURE_REGISTRY.register('geolocation',
+                           ['has_geolocation', 'latitude', 'longitude'],
+                           inputs=['geolocation_data'])
+def geolocation_features(behavioral_data, geolocation_data, honeypot_triggered):
+    if geolocation_data:
+        return 1, geolocation_data.get('latitude', 0), geolocation_data.get('longitude', 0)
+    return 0, 0, 0
+
+
+@FEATURE_REGISTRY.register('honeypot', ['honeypot_triggered'], inputs=['honeypot_triggered'])
+def honeypot_features(behavioral_data, geolocation_data, honeypot_triggered):
+    return (1 if honeypot_triggered else 0,)
@@ -0,0 +1,157 @@
+import numpy as np
+
+
+def average_path_length(n_samples):
+    """Average path length of an unsuccessful BST search in a tree of n_samples
+    (same definition as sklearn's IsolationForest)"""
+    n_samples = np.asarray(n_samples, dtype=float)
+    result = np.zeros(n_samples.shape)
+
+    mask_two = n_samples == 2
+    mask_many = n_samples > 2
+
+    result[mask_two] = 1.0
+    n = n_samples[mask_many]
+    result[mask_many] = 2.0 * (np.log(n - 1.0) + np.euler_gamma) - 2.0 * (n - 1.0) / n
+    return result
+
+
+class FlatForest:
+    """
+    Inference-only copy of a fitted IsolationForest stored as flat NumPy node arrays.
+
+    All trees are concatenated into one set of arrays indexed by global node id:
+    ``feature`` and ``threshold`` describe the split, ``children`` holds the
+    interleaved (left, right) child pairs and ``leaf_value`` the path length
+    contribution of a leaf
+    (its depth plus the average path length correction for its sample count).
+    Leaves point to themselves, so every row can be walked down every tree
+    for ``max_depth`` vectorized steps without branching.
+
+    One traversal yields the anomaly score, the fraud flag and the risk score,
+    replacing the separate ``decision_function`` and ``predict`` calls.
+    """
+
+    # Node arrays, in the order they are stored in a model artifact
+    ARRAYS = ('feature', 'threshold', 'children', 'leaf_value', 'roots')
+
+    def __init__(self, feature, threshold, children, leaf_value, roots,
+                 max_depth, offset, denominator):
+        self.feature = feature
+        self.threshold = threshold
+        # Interleaved (left, right) pairs so a step is one gather: children[2 * node + go_right]
+        self.children = children
+        self.leaf_value = leaf_value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.offset = float(offset)
+        self.denominator = float(denominator)
+
+    @classmethod
+    def from_isolation_forest(cls, model):
+        """Export a fitted sklearn IsolationForest"""
+        n_features = model.n_features_in_
+        subsample_features = model._max_features != n_features
+
+        features, thresholds, children, leaf_values, roots = [], [], [], [], []
+        max_depth = 0
+        offset = 0
+
+        for estimator, estimator_features in zip(model.estimators_, model.estimators_features_):
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            children_left = tree.children_left
+            children_right = tree.children_right
+            is_leaf = children_left == -1
+
+            # Node depths from the parent links (children always follow their parent)
+            depth = np.zeros(n_nodes, dtype=np.int64)
+            for node in range(n_nodes):
+                if not is_leaf[node]:
+                    depth[children_left[node]] = depth[node] + 1
+                    depth[children_right[node]] = depth[node] + 1
+            max_depth = max(max_depth, int(depth.max()))
+
+            node_ids = np.arange(n_nodes)
+            feature = np.where(is_leaf, 0, tree.feature)
+            if subsample_features:
+                feature = np.asarray(estimator_features)[feature]
+
+            features.append(feature)
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            children.append(np.stack([np.where(is_leaf, node_ids, children_left),
+                                      np.where(is_leaf, node_ids, children_right)], axis=1).ravel() + offset)
+            # Nodes on the decision path (depth + 1) plus the correction, minus one
+            leaf_values.append((depth + 1) + average_path_length(tree.n_node_samples) - 1.0)
+            roots.append(offset)
+            offset += n_nodes
+
+        return cls(
+            feature=np.concatenate(features).astype(np.intp),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            children=np.concatenate(children).astype(np.intp),
+            leaf_value=np.concatenate(leaf_values).astype(np.float64),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+            offset=model.offset_,
+            denominator=len(model.estimators_) * average_path_length(model._max_samples),
+        )
+
+    @classmethod
+    def from_arrays(cls, arrays, metadata):
+        """Rebuild from ``to_arrays`` output (arrays may be read-only memory maps)"""
+        return cls(*(arrays[name] for name in cls.ARRAYS),
+                   max_depth=metadata['max_depth'],
+                   offset=metadata['offset'],
+                   denominator=metadata['denominator'])
+
+    def to_arrays(self):
+        """Return ``(arrays, metadata)`` describing this forest"""
+        arrays = {name: getattr(self, name) for name in self.ARRAYS}
+        metadata = {
+            'max_depth': self.max_depth,
+            'offset': self.offset,
+            'denominator': self.denominator,
+        }
+        return arrays, metadata
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def apply(self, X):
+        """Return the leaf reached in every tree, shape (n_samples, n_trees)"""
+        # Trees compare float32 inputs against float64 thresholds, like sklearn
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_samples, n_features = X.shape
+        values = X.ravel()
+        row_offsets = (np.arange(n_samples) * n_features)[:, None]
+        nodes = np.broadcast_to(self.roots, (n_samples, self.n_trees))
+        for _ in range(self.max_depth):
+            # NaN compares False and goes right, as in sklearn
+            go_right = ~(values[row_offsets + self.feature[nodes]] <= self.threshold[nodes])
+            nodes = self.children[2 * nodes + go_right]
+        return nodes
+
+    def score_samples(self, X):
+        """Opposite of the anomaly score, as IsolationForest.score_samples"""
+        path_lengths = self.leaf_value[self.apply(X)]
+        # Accumulate tree by tree (cumsum is sequential) to match sklearn bit for bit
+        depths = np.cumsum(path_lengths, axis=1)[:, -1]
+        if self.denominator == 0:
+            return -np.ones_like(depths)
+        return -(2 ** (-(depths / self.denominator)))
+
+    def decision_function(self, X):
+        """Same as IsolationForest.decision_function"""
+        return self.score_samples(X) - self.offset
+
+    def evaluate(self, X):
+        """Score rows with a single forest traversal.
+
+        Returns ``(anomaly_scores, is_fraud, risk_scores)`` arrays.
+        """
+        anomaly_scores = self.decision_function(X)
+        is_fraud = anomaly_scores < 0
+        risk_scores = np.clip((0.5 - anomaly_scores) / 1.0, 0, 1)
+        return anomaly_scores, is_fraud, risk_scores
@@ -1,71 +1,66 @@
+import collections
+import time
+
 import numpy as np
-import pandas as pd
-from sklearn.ensemble import IsolationForest
-from sklearn.preprocessing import StandardScaler
-import pickle
-import os
+
+from .feature_registry import FEATURE_REGISTRY
+from .forest_engine import FlatForest
+from .model_artifact import fingerprint_artifact, load_artifact, save_artifact
+from .prediction_cache import PredictionCache
+
+# Everything scoring needs from a fitted model, including the extraction plan
+# for its feature schema. It is replaced as one reference, so a concurrent
+# predict sees either the old or the new model.
+ModelState = collections.namedtuple('ModelState', ['scaler_mean', 'scaler_scale', 'engine', 'fingerprint', 'plan'])
+
+# Scoring a loaded model only needs NumPy: sklearn is imported when a model is
+# fitted and pandas only for the demonstration training set.
 
 class FraudDetector:
-    def __init__(self):
-        self.model = IsolationForest(contamination=0.1, random_state=42)
-        self.scaler = StandardScaler()
+    def __init__(self, feature_columns=None):
+        # Extraction plan for the features this detector trains on
+        self.plan = FEATURE_REGISTRY.plan(feature_columns)
+        # Fitted sklearn estimators; None until trained in this process
+        self.model = None
+        self.scaler = None
+        self.state = None
+        self.cache = None
+        self.retrainer = None
+        self.baselines = None
+        self._baseline_full_reported = False
+        self.geo = None
+        self.cascade = None
+        self.metrics = None
         self.is_trained = False
         
+    # Default column order of the feature matrix (every registered feature)
+    FEATURE_COLUMNS = FEATURE_REGISTRY.columns
+
+    @property
+    def feature_columns(self):
+        """Feature schema of the active model"""
+        return list((self.state.plan if self.state else self.plan).columns)
+
     def extract_features(self, behavioral_data, geolocation_data, honeypot_triggered):
         """Extract features from raw data"""
-        features = {}
-        
-        # Behavioral features
-        if behavioral_data:
-            keystroke_times = behavioral_data.get('keystroke_times', [])
-            mouse_movements = behavioral_data.get('mouse_movements', [])
-            
-            # Keystroke analysis
-            if len(keystroke_times) > 1:
-                intervals = np.diff(keystroke_times)
-                features['avg_keystroke_interval'] = np.mean(intervals)
-                features['std_keystroke_interval'] = np.std(intervals)
-                features['typing_speed'] = len(keystroke_times) / (keystroke_times[-1] - keystroke_times[0]) if len(keystroke_times) > 1 else 0
-            else:
-                features['avg_keystroke_interval'] = 0
-                features['std_keystroke_interval'] = 0
-                features['typing_speed'] = 0
-            
-            # Mouse movement analysis
-            if len(mouse_movements) > 1:
-                distances = []
-                for i in range(1, len(mouse_movements)):
-                    prev = mouse_movements[i-1]
-                    curr = mouse_movements[i]
-                    dist = np.sqrt((curr['x'] - prev['x'])**2 + (curr['y'] - prev['y'])**2)
-                    distances.append(dist)
-                
-                features['avg_mouse_speed'] = np.mean(distances) if distances else 0
-                features['mouse_movement_variance'] = np.var(distances) if distances else 0
-            else:
-                features['avg_mouse_speed'] = 0
-                features['mouse_movement_variance'] = 0
-        else:
-            features.update({
-                'avg_keystroke_interval': 0,
-                'std_keystroke_interval': 0,
-                'typing_speed': 0,
-                'avg_mouse_speed': 0,
-                'mouse_movement_variance': 0
-            })
-        
-        # Geolocation features
-        features['has_geolocation'] = 1 if geolocation_data else 0
-        features['latitude'] = geolocation_data.get('latitude', 0) if geolocation_data else 0
-        features['longitude'] = geolocation_data.get('longitude', 0) if geolocation_data else 0
-        
-        # Honeypot feature
-        features['honeypot_triggered'] = 1 if honeypot_triggered else 0
-        
-        return features
+        plan = self.state.plan if self.state else self.plan
+        row = plan.row_buffer()[0]
+        plan.extract_into(row, behavioral_data, geolocation_data, honeypot_triggered)
+        return plan.to_dict(row)
     
+    def new_model(self, **params):
+        """Unfitted IsolationForest for a fit: a clone of ``self.model``, or the default"""
+        from sklearn.base import clone
+        from sklearn.ensemble import IsolationForest
+
+        if self.model is not None:
+            return clone(self.model).set_params(**params)
+        return IsolationForest(contamination=0.1, random_state=42, **params)
+
     def create_sample_training_data(self):
         """Create sample training data for demonstration"""
+        import pandas as pd
+
         np.random.seed(42)
         n_samples = 1000
         
@@ -76,8 +71,10 @@ class FraudDetector:
                 'avg_keystroke_interval': np.random.normal(150, 30),  # milliseconds
                 'std_keystroke_interval': np.random.normal(50, 15),
                 'typing_speed': np.random.normal(5, 1.5),  # keys per second
+                'keystroke_count': np.random.normal(35, 15),
                 'avg_mouse_speed': np.random.normal(100, 25),
                 'mouse_movement_variance': np.random.normal(500, 150),
+                'mouse_step_count': np.random.normal(64, 32),
                 'has_geolocation': 1,
                 'latitude': np.random.normal(28.6139, 2),  # Around Delhi
                 'longitude': np.random.normal(77.2090, 2),
@@ -92,8 +89,10 @@ class FraudDetector:
                 'avg_keystroke_interval': np.random.normal(50, 10),  # Very fast typing
                 'std_keystroke_interval': np.random.normal(5, 2),   # Very consistent
                 'typing_speed': np.random.normal(15, 3),  # Superhuman speed
+                'keystroke_count': np.random.normal(35, 15),  # Same form, same length
                 'avg_mouse_speed': np.random.normal(300, 50),  # Very fast mouse
                 'mouse_movement_variance': np.random.normal(50, 15),  # Very consistent
+                'mouse_step_count': np.random.normal(64, 32),
                 'has_geolocation': np.random.choice([0, 1]),
                 'latitude': np.random.normal(40.7128, 10),  # Different location
                 'longitude': np.random.normal(-74.0060, 10),
@@ -104,62 +103,512 @@ class FraudDetector:
         all_data = normal_data + fraud_data
         return pd.DataFrame(all_data)
     
-    def train(self):
-        """Train the fraud detection model"""
+    def train(self, session_log=None, **pipeline_options):
+        """Train the fraud detection model.
+
+        With ``session_log`` (a JSONL/CSV/Parquet file of sessions) training
+        streams the log in chunks; see ``training_pipeline.train_from_logs``
+        for the options. Otherwise the demonstration data set is used.
+        """
+        if session_log is not None:
+            from .training_pipeline import train_from_logs
+
+            train_from_logs(self, session_log, **pipeline_options)
+            print("Model trained successfully!")
+            return True
+
+        from sklearn.preprocessing import StandardScaler
+
         # Create sample training data
         training_data = self.create_sample_training_data()
         
         # Prepare features
-        feature_columns = ['avg_keystroke_interval', 'std_keystroke_interval', 'typing_speed',
-                          'avg_mouse_speed', 'mouse_movement_variance', 'has_geolocation',
-                          'latitude', 'longitude', 'honeypot_triggered']
-        
-        X = training_data[feature_columns].values
+        X = training_data[list(self.plan.columns)].values
         
         # Scale features
+        self.scaler = StandardScaler()
         X_scaled = self.scaler.fit_transform(X)
         
         # Train model
+        self.model = self.new_model()
         self.model.fit(X_scaled)
-        self.is_trained = True
+        self.swap_state(self.build_state(self.scaler, self.model))
         
         print("Model trained successfully!")
         return True
-    
-    def predict(self, behavioral_data, geolocation_data, honeypot_triggered):
-        """Predict if registration is fraudulent"""
+
+    def save(self, path):
+        """Save the fitted scaler and forest as one versioned model artifact"""
         if not self.is_trained:
+            raise ValueError("Model must be trained before it can be saved")
+
+        return save_artifact(path, *self._artifact_contents(self.state))
+
+    @staticmethod
+    def _artifact_contents(state):
+        """Arrays and metadata that fully describe a fitted model"""
+        arrays, metadata = state.engine.to_arrays()
+        arrays['scaler_mean'] = state.scaler_mean
+        arrays['scaler_scale'] = state.scaler_scale
+        metadata['feature_columns'] = list(state.plan.columns)
+        return arrays, metadata
+
+    def build_state(self, scaler, model):
+        """Compile a fitted StandardScaler and IsolationForest into a ModelState"""
+        state = ModelState(scaler.mean_, scaler.scale_, FlatForest.from_isolation_forest(model),
+                           None, self.plan)
+        return state._replace(fingerprint=fingerprint_artifact(*self._artifact_contents(state)))
+
+    def swap_state(self, state):
+        """Atomically replace the model used for scoring"""
+        self.state = state
+        self.is_trained = True
+
+    @property
+    def engine(self):
+        return self.state.engine if self.state else None
+
+    @property
+    def model_fingerprint(self):
+        return self.state.fingerprint if self.state else None
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Load a detector from a model artifact written by ``save``.
+
+        With ``mmap=True`` the model arrays stay in a read-only memory map of
+        the file, shared by every process that loads the same artifact.
+        """
+        arrays, metadata, fingerprint = load_artifact(path, mmap=mmap)
+
+        try:
+            detector = cls(metadata['feature_columns'])
+        except ValueError as e:
+            raise ValueError(f"Model artifact {path} uses features this build does not define: {e}")
+
+        detector.swap_state(ModelState(arrays['scaler_mean'], arrays['scaler_scale'],
+                                       FlatForest.from_arrays(arrays, metadata), fingerprint,
+                                       detector.plan))
+        return detector
+
+    @classmethod
+    def load_or_train(cls, path, mmap=True):
+        """Load the artifact at ``path``, training and saving it first if missing"""
+        try:
+            return cls.load(path, mmap=mmap)
+        except FileNotFoundError:
+            detector = cls()
+            detector.train()
+            detector.save(path)
+            return cls.load(path, mmap=mmap)
+
+    def enable_cache(self, max_entries=10000, ttl_seconds=300.0, quantum=1e-3):
+        """Cache predictions per session id and quantized feature vector.
+
+        Only calls that pass a ``session_id`` use the cache. Entries expire
+        after ``ttl_seconds``, the least recently used entry is evicted past
+        ``max_entries``, and everything is dropped when the model changes.
+        """
+        self.cache = PredictionCache(max_entries, ttl_seconds, quantum)
+        return self.cache
+
+    def enable_retraining(self, **kwargs):
+        """Keep a sliding window of scored feature vectors and refit in the background.
+
+        Keyword arguments are passed to OnlineRetrainer; call ``start()`` on
+        the returned retrainer to retrain periodically.
+        """
+        from .online_retrainer import OnlineRetrainer
+
+        self.retrainer = OnlineRetrainer(self, **kwargs)
+        return self.retrainer
+
+    def enable_baselines(self, path, capacity=1 << 20, **kwargs):
+        """Compare sessions against each user's own history, kept in a UserBaselineStore.
+
+        Predictions that pass a ``user_id`` get the store's deviation
+        features, and sessions not flagged as fraud are added to the user's
+        baseline. The store at ``path`` is created when it does not exist;
+        once it is full, new users are scored with all-zero deviations.
+        """
+        from .user_baselines import UserBaselineStore
+
+        self.baselines = UserBaselineStore.open_or_create(path, capacity, **kwargs)
+        return self.baselines
+
+    def enable_geo(self, bad_regions=None, **kwargs):
+        """Compute geolocation features (GEO_FEATURES) for predictions that pass a ``user_id``.
+
+        ``bad_regions`` is a GeoGridIndex or the path of a CSV with latitude,
+        longitude and radius_km columns. Keyword arguments go to GeoFeatures.
+        """
+        from .geo_features import GeoFeatures
+
+        if isinstance(bad_regions, str):
+            self.geo = GeoFeatures.from_region_csv(bad_regions, **kwargs)
+        else:
+            self.geo = GeoFeatures(bad_regions, **kwargs)
+        return self.geo
+
+    def enable_rule_cascade(self, rules=None, mode='enforce'):
+        """Run an ordered RuleCascade before the model.
+
+        ``rules`` is a sequence of Rule objects, a list of rule dicts or the
+        path of a JSON rule file (default: DEFAULT_RULES). In ``enforce``
+        mode a matching rule decides the session (its ``reason`` is added and
+        ``anomaly_score`` is None, NaN in ``predict_batch``); in ``shadow`` mode the model still scores
+        every session and the rule's reason is reported as ``shadow_reason``.
+        """
+        from .rule_cascade import DEFAULT_RULES, Rule, RuleCascade
+
+        if rules is None:
+            self.cascade = RuleCascade(DEFAULT_RULES, mode)
+        elif isinstance(rules, str):
+            self.cascade = RuleCascade.load(rules, mode)
+        elif all(isinstance(rule, Rule) for rule in rules):
+            self.cascade = RuleCascade(rules, mode)
+        else:
+            self.cascade = RuleCascade.from_config(rules, mode)
+        return self.cascade
+
+    def enable_metrics(self, slow_request_ms=None, sample_interval_ms=1.0):
+        """Record per-stage latency histograms and counters in ``self.metrics``.
+
+        With ``slow_request_ms`` a sampling profiler also captures stack
+        samples of requests slower than that threshold.
+        """
+        from .instrumentation import DetectorMetrics, SlowRequestProfiler
+
+        profiler = None
+        if slow_request_ms is not None:
+            profiler = SlowRequestProfiler(slow_request_ms, sample_interval_ms)
+        self.metrics = DetectorMetrics(profiler)
+        return self.metrics
+
+    def _ensure_trained(self):
+        """Train on first use when no model was trained or loaded (a cold train)"""
+        if self.is_trained:
+            return
+        metrics = self.metrics
+        if metrics is None:
             self.train()
-        
-        # Extract features
-        features = self.extract_features(behavioral_data, geolocation_data, honeypot_triggered)
-        
-        # Convert to array
-        feature_array = np.array([[
-            features['avg_keystroke_interval'],
-            features['std_keystroke_interval'],
-            features['typing_speed'],
-            features['avg_mouse_speed'],
-            features['mouse_movement_variance'],
-            features['has_geolocation'],
-            features['latitude'],
-            features['longitude'],
-            features['honeypot_triggered']
-        ]])
+            return
+        mark = metrics.now()
+        self.train()
+        metrics.lap('train', mark)
+        metrics.increment('cold_trains')
+
+    @staticmethod
+    def _scale(X, state):
+        """Standardize feature rows (same arithmetic as StandardScaler.transform)"""
+        return (X - state.scaler_mean) / state.scaler_scale
+    
+    def predict(self, behavioral_data, geolocation_data, honeypot_triggered, session_id=None, user_id=None):
+        """Predict if registration is fraudulent"""
+        metrics = self.metrics
+        if metrics is not None:
+            request_start = metrics.request_started()
+        try:
+            self._ensure_trained()
+            state = self.state
+            mark = metrics.now() if metrics is not None else 0
+
+            # Extract features into this thread's reusable row
+            feature_array = state.plan.row_buffer()
+            state.plan.extract_into(feature_array[0], behavioral_data, geolocation_data, honeypot_triggered)
+            if metrics is not None:
+                metrics.lap('extract_features', mark)
+
+            result = self._score_row(feature_array, state, session_id)
+            if user_id is not None:
+                result = self._add_user_features(result, user_id, feature_array[0], state)
+            return result
+        finally:
+            if metrics is not None:
+                metrics.request_finished(request_start)
+
+    def predict_session(self, accumulator, session_id=None, user_id=None):
+        """Predict from a SessionFeatureAccumulator fed with streamed events"""
+        metrics = self.metrics
+        if metrics is not None:
+            request_start = metrics.request_started()
+        try:
+            self._ensure_trained()
+            state = self.state
+            mark = metrics.now() if metrics is not None else 0
+
+            feature_array = state.plan.row_buffer()
+            state.plan.extract_from_source(feature_array[0], accumulator)
+            if metrics is not None:
+                metrics.lap('extract_features', mark)
+
+            result = self._score_row(feature_array, state, session_id)
+            if user_id is not None:
+                result = self._add_user_features(result, user_id, feature_array[0], state)
+            return result
+        finally:
+            if metrics is not None:
+                metrics.request_finished(request_start, 'session')
+
+    def _score_row(self, feature_array, state, session_id=None):
+        """Rule cascade first (when enabled), then the model for undecided rows"""
+        cascade = self.cascade
+        if cascade is None:
+            return self._predict_row(feature_array, state, session_id)
+
+        decided = cascade.evaluate_row(feature_array[0], state.plan.columns)
+        if decided >= 0 and cascade.mode == 'enforce':
+            rule = cascade.rules[decided]
+            if self.metrics is not None:
+                self.metrics.increment('cascade_hits')
+            return {
+                'is_fraud': rule.verdict,
+                'risk_score': rule.risk_score,
+                'anomaly_score': None,
+                'features': state.plan.to_dict(feature_array[0]),
+                'reason': rule.reason
+            }
+
+        start = time.perf_counter_ns()
+        result = self._predict_row(feature_array, state, session_id)
+        cascade.record_model(1, time.perf_counter_ns() - start)
+        if decided >= 0:
+            cascade.record_agreement(decided, result['is_fraud'])
+            result = dict(result, shadow_reason=cascade.rules[decided].reason)
+        return result
+
+    def _predict_row(self, feature_array, state, session_id=None):
+        """Score a 1 x n_features matrix and build the predict result dict"""
+        metrics = self.metrics
+        if self.retrainer is not None:
+            self.retrainer.observe(feature_array)
+
+        cache_key = None
+        if self.cache is not None and session_id is not None:
+            cache_key = self.cache.make_key(session_id, feature_array[0])
+            cached = self.cache.get(cache_key, state.fingerprint)
+            if metrics is not None:
+                metrics.increment('cache_hits' if cached is not None else 'cache_misses')
+            if cached is not None:
+                return dict(cached)
+
+        features = state.plan.to_dict(feature_array[0])
         
         # Scale features
-        feature_scaled = self.scaler.transform(feature_array)
-        
-        # Predict
-        anomaly_score = self.model.decision_function(feature_scaled)[0]
-        is_anomaly = self.model.predict(feature_scaled)[0] == -1
+        if metrics is not None:
+            mark = metrics.now()
+        feature_scaled = self._scale(feature_array, state)
+        if metrics is not None:
+            mark = metrics.lap('scale', mark)
         
-        # Calculate risk score (0-1)
-        risk_score = max(0, min(1, (0.5 - anomaly_score) / 1.0))
+        # Predict (anomaly score, fraud flag and risk score from one traversal)
+        anomaly_scores, fraud_flags, risk_scores = state.engine.evaluate(feature_scaled)
+        if metrics is not None:
+            metrics.lap('forest', mark)
+        anomaly_score = anomaly_scores[0]
+        is_anomaly = fraud_flags[0]
+        risk_score = risk_scores[0]
         
-        return {
+        result = {
             'is_fraud': is_anomaly,
             'risk_score': risk_score,
             'anomaly_score': anomaly_score,
             'features': features
         }
+        if cache_key is not None:
+            self.cache.put(cache_key, result, state.fingerprint)
+        return result
+
+    def _add_user_features(self, result, user_id, row, state):
+        """Result dict with the enabled per-user features (``baseline``, ``geo``) added"""
+        if self.baselines is None and self.geo is None:
+            return result
+        result = dict(result)
+        # Flagged sessions are scored against the user's history but not added to it
+        update = not result['is_fraud']
+        if self.baselines is not None:
+            from .user_baselines import DEVIATION_FEATURES
+
+            deviations = self._baseline_deviations(user_id, row, state, update)
+            result['baseline'] = dict(zip(DEVIATION_FEATURES, deviations))
+        if self.geo is not None:
+            from .geo_features import GEO_FEATURES
+
+            latitude, longitude = self._location(row, state)
+            if latitude is not None:
+                result['geo'] = dict(zip(GEO_FEATURES, self.geo.observe(
+                    user_id, latitude, longitude, update=update)))
+        return result
+
+    @staticmethod
+    def _location(row, state):
+        """``(latitude, longitude)`` of a feature row, or ``(None, None)`` without geolocation"""
+        columns = state.plan.columns
+        if 'has_geolocation' not in columns or 'latitude' not in columns or 'longitude' not in columns:
+            return None, None
+        if not row[columns.index('has_geolocation')]:
+            return None, None
+        return float(row[columns.index('latitude')]), float(row[columns.index('longitude')])
+
+    def predict_batch(self, sessions, user_ids=None):
+        """Score many registrations at once.
+
+        ``sessions`` is a sequence of dicts with the same keys as the
+        arguments of ``predict`` (``behavioral_data``, ``geolocation_data``,
+        ``honeypot_triggered``) or of SessionFeatureAccumulator objects.
+        Features for every session are written into
+        one preallocated matrix which is scaled and scored in a single call.
+        Returns columnar results: a dict of NumPy arrays aligned with the
+        input order, plus the raw ``features`` matrix.
+
+        With baselines or geo features enabled, ``user_ids`` (one per session,
+        None to skip) adds a ``baseline`` matrix (DEVIATION_FEATURES columns)
+        and / or a ``geo`` matrix (GEO_FEATURES columns).
+        """
+        metrics = self.metrics
+        if metrics is not None:
+            request_start = metrics.request_started()
+        try:
+            self._ensure_trained()
+            state = self.state
+            mark = metrics.now() if metrics is not None else 0
+
+            if not isinstance(sessions, (list, tuple)):
+                sessions = list(sessions)
+
+            feature_matrix = state.plan.extract_matrix(sessions)
+
+            if metrics is not None:
+                mark = metrics.lap('extract_features', mark)
+                metrics.observe_batch(len(sessions))
+
+            if len(sessions) == 0:
+                return {
+                    'is_fraud': np.zeros(0, dtype=bool),
+                    'risk_score': np.zeros(0),
+                    'anomaly_score': np.zeros(0),
+                    'features': feature_matrix
+                }
+
+            cascade = self.cascade
+            if cascade is not None:
+                decided = cascade.evaluate(feature_matrix, state.plan.columns)
+                if cascade.mode == 'enforce':
+                    return self._predict_batch_cascade(feature_matrix, decided, state, user_ids)
+                model_start = time.perf_counter_ns()
+
+            if self.retrainer is not None:
+                self.retrainer.observe(feature_matrix)
+
+            feature_scaled = self._scale(feature_matrix, state)
+            if metrics is not None:
+                mark = metrics.lap('scale', mark)
+            anomaly_scores, is_anomaly, risk_scores = state.engine.evaluate(feature_scaled)
+            if metrics is not None:
+                metrics.lap('forest', mark)
+
+            results = {
+                'is_fraud': is_anomaly,
+                'risk_score': risk_scores,
+                'anomaly_score': anomaly_scores,
+                'features': feature_matrix
+            }
+            if cascade is not None:
+                cascade.record_model(len(feature_matrix), time.perf_counter_ns() - model_start)
+                cascade.record_agreement(decided, is_anomaly)
+                results['shadow_reason'] = cascade.verdicts(decided)[2]
+            if user_ids is not None and (self.baselines is not None or self.geo is not None):
+                results.update(self._user_feature_matrices(user_ids, feature_matrix, state, is_anomaly))
+            return results
+        finally:
+            if metrics is not None:
+                metrics.request_finished(request_start, 'batch')
+
+    def _predict_batch_cascade(self, feature_matrix, decided, state, user_ids):
+        """predict_batch in enforce mode: rule verdicts, then the model on undecided rows only"""
+        metrics = self.metrics
+        cascade = self.cascade
+        is_fraud, risk_scores, reasons = cascade.verdicts(decided)
+        anomaly_scores = np.full(len(feature_matrix), np.nan)
+        if metrics is not None:
+            metrics.increment('cascade_hits', int(np.count_nonzero(decided >= 0)))
+
+        undecided = np.flatnonzero(decided < 0)
+        if len(undecided):
+            model_start = time.perf_counter_ns()
+            X = feature_matrix[undecided]
+            if self.retrainer is not None:
+                self.retrainer.observe(X)
+            mark = metrics.now() if metrics is not None else 0
+            feature_scaled = self._scale(X, state)
+            if metrics is not None:
+                mark = metrics.lap('scale', mark)
+            anomaly_scores[undecided], is_fraud[undecided], risk_scores[undecided] = \
+                state.engine.evaluate(feature_scaled)
+            if metrics is not None:
+                metrics.lap('forest', mark)
+            cascade.record_model(len(undecided), time.perf_counter_ns() - model_start)
+
+        results = {
+            'is_fraud': is_fraud,
+            'risk_score': risk_scores,
+            'anomaly_score': anomaly_scores,
+            'features': feature_matrix,
+            'reason': reasons
+        }
+        if user_ids is not None and (self.baselines is not None or self.geo is not None):
+            results.update(self._user_feature_matrices(user_ids, feature_matrix, state, is_fraud))
+        return results
+
+    def _baseline_deviations(self, user_id, row, state, update):
+        """DEVIATION_FEATURES of one row; a new user arriving at a full store is scored without a baseline"""
+        from .user_baselines import StoreFull
+
+        values, latitude, longitude = self.baselines.session_values(row, state.plan.columns)
+        try:
+            return self.baselines.compare_and_update(user_id, values, latitude, longitude, update=update)
+        except StoreFull as e:
+            if self.metrics is not None:
+                self.metrics.increment('baseline_store_full')
+            if not self._baseline_full_reported:
+                self._baseline_full_reported = True
+                print(f"[BASELINE] {e}; new users are scored without a baseline")
+            return self.baselines.compare(user_id, values, latitude, longitude)
+
+    def _user_feature_matrices(self, user_ids, feature_matrix, state, is_fraud):
+        """Per-user feature matrices for a scored batch (rows without a user id stay zero)"""
+        matrices = {}
+        if self.baselines is not None:
+            from .user_baselines import DEVIATION_FEATURES
+            matrices['baseline'] = np.zeros((len(feature_matrix), len(DEVIATION_FEATURES)))
+        if self.geo is not None:
+            from .geo_features import GEO_FEATURES
+            matrices['geo'] = np.zeros((len(feature_matrix), len(GEO_FEATURES)))
+
+        for i, (user_id, row, flagged) in enumerate(zip(user_ids, feature_matrix, is_fraud.tolist())):
+            if user_id is None:
+                continue
+            if self.baselines is not None:
+                matrices['baseline'][i] = self._baseline_deviations(user_id, row, state, not flagged)
+            if self.geo is not None:
+                latitude, longitude = self._location(row, state)
+                if latitude is not None:
+                    matrices['geo'][i] = self.geo.observe(user_id, latitude, longitude, update=not flagged)
+        return matrices
+
+def main():
+    """Train the detector and write a model artifact for workers to load"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train the fraud detector and save a model artifact")
+    parser.add_argument('output', help='Path of the model artifact to write')
+    args = parser.parse_args()
+
+    detector = FraudDetector()
+    detector.train()
+    fingerprint = detector.save(args.output)
+    print(f"Model artifact saved to {args.output} ({fingerprint[:12]})")
+
+
+if __name__ == "__main__":
+    main()
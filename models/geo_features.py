@@ -0,0 +1,453 @@
+# Geolocation features: distance to a user's known locations, travel speed
+# since their last login (impossible travel) and distance to known-bad regions
+#
+# Raw latitude / longitude say little to the IsolationForest. What matters is
+# where a login is relative to where this user has been and to where abuse
+# comes from. Points are kept in a uniform latitude / longitude grid
+# (GeoGridIndex); a query only scans the cells within its search radius, so a
+# lookup over millions of indexed points stays well under a millisecond, and
+# nearest_batch answers whole arrays of queries with vectorized cell scans.
+#
+# Usage:
+#   python -m models.geo_features events.csv --bad-regions regions.csv --output geo.npy
+
+import argparse
+import csv
+import math
+import threading
+import time
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180.0
+
+# Faster than a commercial flight over a distance no GPS jitter explains
+IMPOSSIBLE_SPEED_KMH = 900.0
+IMPOSSIBLE_MIN_KM = 100.0
+
+# Returned per request by GeoFeatures.observe and per row by GeoFeatures.batch
+GEO_FEATURES = ('known_locations', 'km_to_nearest_known_location', 'km_since_last_login',
+                'travel_speed_kmh', 'impossible_travel', 'km_to_bad_region', 'in_bad_region')
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km between points in degrees (broadcasts over arrays)"""
+    lat1, lon1, lat2, lon2 = (np.radians(v) for v in (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _expand_ranges(starts, ends):
+    """Concatenation of arange(start, end) for every pair, without a Python loop"""
+    lengths = ends - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.intp), lengths
+    shift = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+    return np.arange(total) + shift, lengths
+
+
+class GeoGridIndex:
+    """
+    Static spatial index over points in degrees.
+
+    Points are bucketed into cells of ``cell_km`` by ``cell_km`` (measured
+    along a meridian) and stored sorted by cell, with one offset per
+    non-empty cell. With ``radius_km`` each point is a disc, and distances
+    are measured to its edge (0 inside).
+    """
+
+    def __init__(self, latitudes, longitudes, radius_km=None, cell_km=25.0):
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.cell_km = float(cell_km)
+        self.cell_deg = self.cell_km / KM_PER_DEGREE
+        self.n_rows = int(math.ceil(180.0 / self.cell_deg)) + 1
+        self.n_cols = int(math.ceil(360.0 / self.cell_deg))
+
+        cells = self._cell_ids(latitudes, longitudes)
+        order = np.argsort(cells, kind='stable')
+        sorted_cells = cells[order]
+        self.cells, starts = np.unique(sorted_cells, return_index=True)
+        self.offsets = np.append(starts, len(order))
+        # Original position of each stored point
+        self.order = order
+        self.lat = np.radians(latitudes[order])
+        self.lon = np.radians(longitudes[order])
+        self.cos_lat = np.cos(self.lat)
+        if radius_km is None:
+            self.radius = None
+            self.max_radius = 0.0
+        else:
+            self.radius = np.broadcast_to(np.asarray(radius_km, dtype=np.float64), latitudes.shape)[order]
+            self.max_radius = float(self.radius.max()) if len(self.radius) else 0.0
+
+    def __len__(self):
+        return len(self.order)
+
+    def _cell_ids(self, latitudes, longitudes):
+        rows = np.clip(np.floor((latitudes + 90.0) / self.cell_deg), 0, self.n_rows - 1).astype(np.int64)
+        cols = np.clip(np.floor(np.mod(longitudes + 180.0, 360.0) / self.cell_deg), 0, self.n_cols - 1)
+        return rows * self.n_cols + cols.astype(np.int64)
+
+    def _point_ranges(self, latitudes, longitudes, radius_km):
+        """Stored-point ranges covering ``radius_km`` around each query.
+
+        Within one grid row, the cells of a column interval are contiguous in
+        the sorted cell array, and so are their points. Each query therefore
+        needs two binary searches per row of its window, or four when the
+        window wraps around the antimeridian. Returns ``(owner, starts, ends)``,
+        with one entry per query, row and interval.
+        """
+        cells = self._cell_ids(latitudes, longitudes)
+        rows, cols = np.divmod(cells, self.n_cols)
+        row_span = int(math.ceil(radius_km / self.cell_km))
+
+        # Column half-width from the widest latitude the window reaches
+        max_lat = np.minimum(np.abs(latitudes) + radius_km / KM_PER_DEGREE, 90.0)
+        half_cols = (self.n_cols - 1) // 2
+        with np.errstate(divide='ignore'):
+            col_span = np.ceil(radius_km / (self.cell_km * np.cos(np.radians(max_lat))))
+        col_span = np.where(max_lat >= 89.0, half_cols, np.minimum(col_span, half_cols)).astype(np.int64)
+
+        first, last = cols - col_span, cols + col_span
+        # Main interval, plus the part that wraps around (empty when there is none)
+        intervals = np.stack([
+            np.maximum(first, 0), np.minimum(last, self.n_cols - 1),
+            np.where(first < 0, first + self.n_cols, np.where(last >= self.n_cols, 0, 1)),
+            np.where(first < 0, self.n_cols - 1, np.where(last >= self.n_cols, last - self.n_cols, 0)),
+        ], axis=1).reshape(-1, 1, 2, 2)
+
+        window_rows = rows[:, None] + np.arange(-row_span, row_span + 1)
+        valid = (window_rows >= 0) & (window_rows < self.n_rows)
+        base = (window_rows * self.n_cols)[:, :, None]
+        low = base + intervals[..., 0]
+        high = base + intervals[..., 1] + 1
+        starts = self.offsets[np.searchsorted(self.cells, low)]
+        ends = self.offsets[np.searchsorted(self.cells, high)]
+        ends = np.where(valid[:, :, None] & (high > low), ends, starts)
+
+        owner = np.broadcast_to(np.arange(len(cells))[:, None, None], starts.shape)
+        return owner.ravel(), starts.ravel(), ends.ravel()
+
+    def _search(self, latitudes, longitudes, radius_km):
+        """Closest scanned point per query: ``(distances, stored positions)``.
+
+        Every point within ``radius_km`` (of its edge) is scanned, so a
+        result at or under ``radius_km`` is exact; anything further may not be.
+        """
+        n = len(latitudes)
+        best = np.full(n, np.inf)
+        best_position = np.full(n, -1, dtype=np.int64)
+        owner, starts, ends = self._point_ranges(latitudes, longitudes, radius_km + self.max_radius)
+        points, lengths = _expand_ranges(starts, ends)
+        if len(points) == 0:
+            return best, best_position
+
+        owner = np.repeat(owner, lengths)
+        lat = np.radians(latitudes)[owner]
+        a = (np.sin((self.lat[points] - lat) / 2) ** 2
+             + np.cos(lat) * self.cos_lat[points]
+             * np.sin((self.lon[points] - np.radians(longitudes)[owner]) / 2) ** 2)
+        distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+        if self.radius is not None:
+            distances = np.maximum(distances - self.radius[points], 0.0)
+
+        if n == 1:
+            position = int(np.argmin(distances))
+            best[0] = distances[position]
+            best_position[0] = points[position]
+            return best, best_position
+        np.minimum.at(best, owner, distances)
+        hit = distances <= best[owner]
+        best_position[owner[hit]] = points[hit]
+        return best, best_position
+
+    def _search_one(self, latitude, longitude, radius_km):
+        """``_search`` for a single query, with the window computed in plain Python
+        (a request-path lookup is dominated by per-call NumPy overhead otherwise)"""
+        radius_km += self.max_radius
+        row = min(max(int(math.floor((latitude + 90.0) / self.cell_deg)), 0), self.n_rows - 1)
+        col = min(max(int(math.floor(((longitude + 180.0) % 360.0) / self.cell_deg)), 0), self.n_cols - 1)
+        row_span = int(math.ceil(radius_km / self.cell_km))
+        max_lat = min(abs(latitude) + radius_km / KM_PER_DEGREE, 90.0)
+        half_cols = (self.n_cols - 1) // 2
+        if max_lat >= 89.0:
+            col_span = half_cols
+        else:
+            col_span = min(int(math.ceil(radius_km / (self.cell_km * math.cos(math.radians(max_lat))))),
+                           half_cols)
+
+        first, last = col - col_span, col + col_span
+        intervals = [(max(first, 0), min(last, self.n_cols - 1))]
+        if first < 0:
+            intervals.append((first + self.n_cols, self.n_cols - 1))
+        elif last >= self.n_cols:
+            intervals.append((0, last - self.n_cols))
+        keys = []
+        for window_row in range(max(0, row - row_span), min(self.n_rows, row + row_span + 1)):
+            base = window_row * self.n_cols
+            for low, high in intervals:
+                keys.append(base + low)
+                keys.append(base + high + 1)
+
+        bounds = self.offsets[np.searchsorted(self.cells, keys)]
+        points, _ = _expand_ranges(bounds[0::2], bounds[1::2])
+        if len(points) == 0:
+            return math.inf, -1
+
+        lat = math.radians(latitude)
+        a = (np.sin((self.lat[points] - lat) / 2) ** 2
+             + math.cos(lat) * self.cos_lat[points]
+             * np.sin((self.lon[points] - math.radians(longitude)) / 2) ** 2)
+        distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+        if self.radius is not None:
+            distances = np.maximum(distances - self.radius[points], 0.0)
+        best = int(np.argmin(distances))
+        return float(distances[best]), int(points[best])
+
+    def nearest(self, latitude, longitude, max_km=math.inf):
+        """``(distance_km, index)`` of the nearest point, or ``(inf, -1)`` beyond ``max_km``"""
+        if len(self.order) == 0:
+            return math.inf, -1
+        # Small bounded searches go straight to max_km; others widen from one cell
+        radius = max_km if max_km <= 4 * self.cell_km else self.cell_km
+        while True:
+            search = min(radius, max_km)
+            distance, position = self._search_one(latitude, longitude, search)
+            if distance <= search or search >= max_km or radius >= math.pi * EARTH_RADIUS_KM:
+                if distance <= max_km:
+                    return distance, int(self.order[position])
+                return math.inf, -1
+            radius *= 4
+
+    def nearest_batch(self, latitudes, longitudes, max_km, chunk_size=65536):
+        """Vectorized ``nearest`` for arrays of queries within a finite ``max_km``.
+
+        Returns ``(distances, indices)``; queries with nothing within
+        ``max_km`` get ``inf`` and ``-1``.
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        distances = np.full(len(latitudes), np.inf)
+        indices = np.full(len(latitudes), -1, dtype=np.int64)
+        if len(self.order) == 0:
+            return distances, indices
+
+        for start in range(0, len(latitudes), chunk_size):
+            stop = min(start + chunk_size, len(latitudes))
+            best, positions = self._search(latitudes[start:stop], longitudes[start:stop], max_km)
+            found = best <= max_km
+            distances[start:stop][found] = best[found]
+            indices[start:stop][found] = self.order[positions[found]]
+        return distances, indices
+
+
+class UserLocationHistory:
+    """
+    Recent distinct locations and the last login of every user, in flat arrays.
+
+    Each user owns a row with a ring of up to ``per_user`` locations;
+    locations within ``dedupe_km`` of a known one are not stored again, so
+    the ring holds distinct places rather than repeated logins. Rows grow by
+    doubling.
+    """
+
+    def __init__(self, per_user=16, dedupe_km=1.0, initial_users=1024):
+        self.per_user = per_user
+        self.dedupe_km = dedupe_km
+        self.rows = {}
+        self.locations = np.zeros((initial_users, per_user, 2))
+        self.counts = np.zeros(initial_users, dtype=np.int32)
+        self.heads = np.zeros(initial_users, dtype=np.int32)
+        # latitude, longitude, unix time of the last login
+        self.last_login = np.zeros((initial_users, 3))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def row(self, user_id, create=False):
+        row = self.rows.get(user_id)
+        if row is None and create:
+            row = len(self.rows)
+            if row == len(self.counts):
+                self._grow()
+            self.rows[user_id] = row
+        return row
+
+    def _grow(self):
+        size = 2 * len(self.counts)
+        for name in ('locations', 'counts', 'heads', 'last_login'):
+            old = getattr(self, name)
+            new = np.zeros((size,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def add(self, row, latitude, longitude, timestamp, nearest_km):
+        if nearest_km > self.dedupe_km:
+            head = self.heads[row]
+            self.locations[row, head] = (latitude, longitude)
+            self.heads[row] = (head + 1) % self.per_user
+            self.counts[row] = min(self.counts[row] + 1, self.per_user)
+        self.last_login[row] = (latitude, longitude, timestamp)
+
+
+def _travel(distance_km, seconds):
+    """Travel speed (km/h, elapsed time floored at one minute) and the impossible-travel flag"""
+    speed = distance_km / (np.maximum(seconds, 60.0) / 3600.0)
+    return speed, (speed > IMPOSSIBLE_SPEED_KMH) & (distance_km > IMPOSSIBLE_MIN_KM)
+
+
+class GeoFeatures:
+    """
+    Per-request geolocation features (GEO_FEATURES order).
+
+    ``observe`` scores one login against the user's history and the
+    bad-region index, then records it. ``batch`` computes the same features
+    offline for a whole event log without touching the online history.
+    Distances to bad regions beyond ``bad_region_km`` are reported as
+    ``bad_region_km``.
+    """
+
+    def __init__(self, bad_regions=None, bad_region_km=500.0, history=None):
+        self.bad_regions = bad_regions
+        self.bad_region_km = bad_region_km
+        self.history = history if history is not None else UserLocationHistory()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_region_csv(cls, path, **kwargs):
+        """Load bad regions from a CSV with latitude, longitude and optional radius_km columns"""
+        with open(path, newline='') as f:
+            rows = list(csv.DictReader(f))
+        latitudes = [float(row['latitude']) for row in rows]
+        longitudes = [float(row['longitude']) for row in rows]
+        radius = [float(row.get('radius_km') or 0) for row in rows]
+        return cls(GeoGridIndex(latitudes, longitudes, radius_km=radius), **kwargs)
+
+    def _bad_region(self, latitude, longitude):
+        if self.bad_regions is None:
+            return self.bad_region_km, 0.0
+        distance, _ = self.bad_regions.nearest(latitude, longitude, self.bad_region_km)
+        distance = min(distance, self.bad_region_km)
+        return distance, 1.0 if distance == 0.0 else 0.0
+
+    def observe(self, user_id, latitude, longitude, timestamp=None, update=True):
+        """GEO_FEATURES of one login, then (when ``update``) add it to the user's history"""
+        timestamp = time.time() if timestamp is None else timestamp
+        bad_km, in_bad = self._bad_region(latitude, longitude)
+
+        history = self.history
+        with self._lock:
+            row = history.row(user_id, create=update)
+            known = int(history.counts[row]) if row is not None else 0
+            nearest = km_since_last = speed = impossible = 0.0
+            if known:
+                stored = history.locations[row, :known]
+                nearest = float(haversine_km(latitude, longitude, stored[:, 0], stored[:, 1]).min())
+                last_lat, last_lon, last_time = history.last_login[row]
+                km_since_last = float(haversine_km(latitude, longitude, last_lat, last_lon))
+                speed, impossible = _travel(km_since_last, timestamp - last_time)
+                speed, impossible = float(speed), float(impossible)
+            if update:
+                history.add(row, latitude, longitude, timestamp, nearest if known else np.inf)
+
+        return [float(known), nearest, km_since_last, speed, impossible, bad_km, in_bad]
+
+    def batch(self, user_ids, latitudes, longitudes, timestamps):
+        """GEO_FEATURES for an event log, one row per event in input order.
+
+        Each event is compared with the same user's previous events in time
+        order, kept exactly as ``observe`` keeps them (the history's
+        ``per_user`` distinct locations, merged within ``dedupe_km``), so a
+        time-ordered log gets the features ``observe`` would compute. Users
+        advance together: one vectorized step per event rank, so the loop
+        runs as many times as the busiest user has events.
+        """
+        user_ids = np.asarray(user_ids)
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        n = len(latitudes)
+        per_user, dedupe_km = self.history.per_user, self.history.dedupe_km
+
+        # Group events by user, in time order within each user
+        order = np.lexsort((timestamps, user_ids))
+        users = user_ids[order]
+        lat, lon, ts = latitudes[order], longitudes[order], timestamps[order]
+        first = np.ones(n, dtype=bool)
+        first[1:] = users[1:] != users[:-1]
+        rank = np.arange(n) - np.maximum.accumulate(np.where(first, np.arange(n), 0))
+        group = np.cumsum(first) - 1
+
+        grouped = np.zeros((n, len(GEO_FEATURES)))
+        # Travel from the login right before, whether or not its location was stored
+        idx = np.flatnonzero(rank >= 1)
+        distance = haversine_km(lat[idx], lon[idx], lat[idx - 1], lon[idx - 1])
+        grouped[idx, 2] = distance
+        grouped[idx, 3], grouped[idx, 4] = _travel(distance, ts[idx] - ts[idx - 1])
+
+        # Per-user rings of distinct locations, as in UserLocationHistory
+        n_groups = int(group[-1]) + 1 if n else 0
+        ring = np.zeros((n_groups, per_user, 2))
+        counts = np.zeros(n_groups, dtype=np.int64)
+        heads = np.zeros(n_groups, dtype=np.int64)
+        by_rank = np.argsort(rank, kind='stable')
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(rank))]) if n else [0]
+        slots = np.arange(per_user)
+        for k in range(len(bounds) - 1):
+            idx = by_rank[bounds[k]:bounds[k + 1]]
+            g = group[idx]
+            known = counts[g]
+            distances = haversine_km(lat[idx, None], lon[idx, None], ring[g, :, 0], ring[g, :, 1])
+            distances[slots >= known[:, None]] = np.inf
+            nearest = distances.min(axis=1)
+            grouped[idx, 0] = known
+            grouped[idx, 1] = np.where(known > 0, nearest, 0.0)
+
+            store = nearest > dedupe_km
+            g, head = g[store], heads[g[store]]
+            ring[g, head, 0] = lat[idx[store]]
+            ring[g, head, 1] = lon[idx[store]]
+            heads[g] = (head + 1) % per_user
+            counts[g] = np.minimum(known[store] + 1, per_user)
+
+        features = np.empty_like(grouped)
+        features[order] = grouped
+
+        if self.bad_regions is not None:
+            bad_km, _ = self.bad_regions.nearest_batch(latitudes, longitudes, self.bad_region_km)
+            bad_km = np.minimum(bad_km, self.bad_region_km)
+        else:
+            bad_km = np.full(n, self.bad_region_km)
+        features[:, 5] = bad_km
+        features[:, 6] = bad_km == 0.0
+        return features
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline geolocation features for a login event log")
+    parser.add_argument('events', help='CSV with user_id, latitude, longitude, timestamp columns')
+    parser.add_argument('--output', required=True, help='Feature matrix to write (.npy, GEO_FEATURES columns)')
+    parser.add_argument('--bad-regions', help='CSV with latitude, longitude, radius_km columns')
+    args = parser.parse_args()
+
+    with open(args.events, newline='') as f:
+        rows = list(csv.DictReader(f))
+    geo = GeoFeatures.from_region_csv(args.bad_regions) if args.bad_regions else GeoFeatures()
+    start = time.perf_counter()
+    features = geo.batch([row['user_id'] for row in rows],
+                         [float(row['latitude']) for row in rows],
+                         [float(row['longitude']) for row in rows],
+                         [float(row['timestamp']) for row in rows])
+    elapsed = time.perf_counter() - start
+    np.save(args.output, features)
+    print(f"Wrote {len(rows):,} x {len(GEO_FEATURES)} geo features to {args.output} "
+          f"({len(rows) / elapsed:,.0f} events/s, "
+          f"{int(features[:, GEO_FEATURES.index('impossible_travel')].sum()):,} impossible travel)")
+
+
+if __name__ == "__main__":
+    main()
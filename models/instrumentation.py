@@ -0,0 +1,196 @@
+import bisect
+import collections
+import sys
+import threading
+import time
+import traceback
+
+# Latency buckets in seconds (upper bounds; +Inf is implicit)
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096)
+
+STAGES = ('extract_features', 'scale', 'forest', 'train', 'request')
+
+
+class Histogram:
+    """Fixed-bucket histogram (cumulative on export, like Prometheus)"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'buckets': {('+Inf' if bound == float('inf') else repr(bound)): total
+                        for bound, total in self.cumulative()},
+        }
+
+
+class DetectorMetrics:
+    """
+    Low-overhead metrics for FraudDetector.
+
+    Stages are timed with ``time.perf_counter_ns`` (monotonic) via ``lap``,
+    which records the elapsed time since the previous mark and returns a new
+    mark, so a request costs one clock read per stage and a bisect per
+    histogram update. Export with ``to_prometheus()`` or ``snapshot()``.
+    """
+
+    def __init__(self, profiler=None):
+        self.stages = {stage: Histogram(LATENCY_BUCKETS) for stage in STAGES}
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.counters = collections.Counter()
+        self.profiler = profiler
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def now():
+        return time.perf_counter_ns()
+
+    def lap(self, stage, mark):
+        """Record time since ``mark`` under ``stage`` and return the current time"""
+        now = time.perf_counter_ns()
+        with self._lock:
+            self.stages[stage].observe((now - mark) / 1e9)
+        return now
+
+    def increment(self, counter, amount=1):
+        with self._lock:
+            self.counters[counter] += amount
+
+    def observe_batch(self, size):
+        with self._lock:
+            self.batch_sizes.observe(size)
+            self.counters['batches'] += 1
+
+    def request_started(self):
+        """Mark the start of a scoring request; returns a token for ``request_finished``"""
+        start = time.perf_counter_ns()
+        if self.profiler is not None:
+            self.profiler.begin()
+        return start
+
+    def request_finished(self, start, kind='predict'):
+        """Close a request from ``request_started``; callers run it in a finally block, failures included"""
+        duration = (time.perf_counter_ns() - start) / 1e9
+        with self._lock:
+            self.stages['request'].observe(duration)
+            self.counters[f'requests_{kind}'] += 1
+        if self.profiler is not None:
+            self.profiler.end(duration, kind)
+
+    def snapshot(self):
+        """JSON-serializable view of every metric"""
+        with self._lock:
+            snapshot = {
+                'stages': {stage: histogram.snapshot() for stage, histogram in self.stages.items()},
+                'batch_size': self.batch_sizes.snapshot(),
+                'counters': dict(self.counters),
+            }
+        if self.profiler is not None:
+            snapshot['slow_requests'] = self.profiler.snapshot()
+        return snapshot
+
+    def to_prometheus(self, prefix='fraud_detector'):
+        """Metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            lines.append(f"# HELP {prefix}_stage_seconds Time spent per scoring stage")
+            lines.append(f"# TYPE {prefix}_stage_seconds histogram")
+            for stage, histogram in self.stages.items():
+                self._histogram_lines(lines, f"{prefix}_stage_seconds", histogram, f'stage="{stage}"')
+
+            lines.append(f"# HELP {prefix}_batch_size Rows per predict_batch call")
+            lines.append(f"# TYPE {prefix}_batch_size histogram")
+            self._histogram_lines(lines, f"{prefix}_batch_size", self.batch_sizes, '')
+
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE {prefix}_{name}_total counter")
+                lines.append(f"{prefix}_{name}_total {value}")
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _histogram_lines(lines, name, histogram, labels):
+        separator = ',' if labels else ''
+        for bound, total in histogram.cumulative():
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f'{name}_bucket{{{labels}{separator}le="{le}"}} {total}')
+        label_block = f'{{{labels}}}' if labels else ''
+        lines.append(f"{name}_sum{label_block} {histogram.sum}")
+        lines.append(f"{name}_count{label_block} {histogram.count}")
+
+
+class SlowRequestProfiler:
+    """
+    Opt-in sampling profiler that keeps stacks only for slow requests.
+
+    While any request is in flight a daemon thread samples the stacks of the
+    threads serving requests every ``interval_ms``. When a request finishes
+    its samples are kept (as collapsed stack counts) only if it took longer
+    than ``threshold_ms``; fast requests discard theirs.
+    """
+
+    def __init__(self, threshold_ms=50.0, interval_ms=1.0, max_reports=100, max_depth=30):
+        self.threshold = threshold_ms / 1000.0
+        self.interval = interval_ms / 1000.0
+        self.max_depth = max_depth
+        self.reports = collections.deque(maxlen=max_reports)
+        self._active = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = threading.Thread(target=self._sample_loop, name='slow-request-profiler', daemon=True)
+        self._thread.start()
+
+    def begin(self):
+        with self._lock:
+            self._active[threading.get_ident()] = collections.Counter()
+        self._wakeup.set()
+
+    def end(self, duration, kind):
+        with self._lock:
+            samples = self._active.pop(threading.get_ident(), None)
+            if not self._active:
+                self._wakeup.clear()
+        if samples is not None and duration >= self.threshold:
+            self.reports.append({
+                'kind': kind,
+                'duration_ms': duration * 1000.0,
+                'finished_at': time.time(),
+                'stacks': dict(samples.most_common()),
+            })
+
+    def _sample_loop(self):
+        while True:
+            self._wakeup.wait()
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, samples in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stack = traceback.extract_stack(frame, limit=self.max_depth)
+                        samples[';'.join(f"{entry.name} ({entry.filename}:{entry.lineno})"
+                                         for entry in stack)] += 1
+            time.sleep(self.interval)
+
+    def snapshot(self):
+        return list(self.reports)
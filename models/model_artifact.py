@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+import struct
+
+import numpy as np
+
+# File layout:
+#   MAGIC | uint64 header length | JSON header | padding | aligned raw arrays
+# The header records the format version, caller metadata (feature schema,
+# forest constants, fingerprint) and the dtype/shape/offset of every array,
+# so a loader can map the arrays straight out of the file without copying.
+MAGIC = b'FDMODEL\0'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def fingerprint_artifact(arrays, metadata):
+    """Content hash of named arrays plus metadata, as stored in an artifact header"""
+    digest = hashlib.sha256()
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        digest.update(name.encode('utf-8'))
+        digest.update(array.dtype.str.encode('ascii'))
+        digest.update(array.tobytes())
+    digest.update(json.dumps(metadata, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def save_artifact(path, arrays, metadata):
+    """Write named arrays and JSON metadata to one versioned artifact file.
+
+    The file is written next to ``path`` and renamed into place, so processes
+    that already mapped an older artifact keep reading a consistent copy.
+    Returns the content fingerprint stored in the header.
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        offset = _align(offset)
+        layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset += array.nbytes
+
+    fingerprint = fingerprint_artifact(arrays, metadata)
+
+    header = json.dumps({
+        'format_version': FORMAT_VERSION,
+        'fingerprint': fingerprint,
+        'metadata': metadata,
+        'arrays': layout,
+    }).encode('utf-8')
+    data_start = _align(len(MAGIC) + 8 + len(header))
+
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]['offset'])
+            f.write(array.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return fingerprint
+
+
+def load_artifact(path, mmap=True):
+    """Read an artifact written by ``save_artifact``.
+
+    Returns ``(arrays, metadata, fingerprint)``. With ``mmap=True`` the arrays
+    are read-only views of a shared memory map of the file, so every worker
+    process loading the same artifact shares its pages.
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a fraud model artifact")
+        (header_length,) = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(header_length).decode('utf-8'))
+
+    if header.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported model artifact version {header.get('format_version')} "
+                         f"(expected {FORMAT_VERSION})")
+
+    data_start = _align(len(MAGIC) + 8 + header_length)
+    if mmap:
+        buffer = np.memmap(path, dtype=np.uint8, mode='r')
+    else:
+        with open(path, 'rb') as f:
+            buffer = f.read()
+
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape'], dtype=np.int64))
+        array = np.frombuffer(buffer, dtype=dtype, count=count,
+                              offset=data_start + spec['offset'])
+        arrays[name] = array.reshape(spec['shape'])
+
+    return arrays, header['metadata'], header['fingerprint']
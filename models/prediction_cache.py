@@ -0,0 +1,92 @@
+import collections
+import hashlib
+import threading
+import time
+
+import numpy as np
+
+
+class PredictionCache:
+    """
+    Bounded TTL + LRU cache of FraudDetector predictions.
+
+    Keys combine the session id with a hash of the quantized feature vector,
+    so retries and field-blur re-submissions with (nearly) identical features
+    hit the cache. Every entry belongs to one model fingerprint; when the
+    detector reports a different fingerprint the whole cache is invalidated.
+    """
+
+    def __init__(self, max_entries=10000, ttl_seconds=300.0, quantum=1e-3, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.quantum = quantum
+        self.clock = clock
+        self.model_fingerprint = None
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def make_key(self, session_id, feature_row):
+        """Session id plus a 64-bit hash of the feature row rounded to ``quantum``"""
+        quantized = np.round(np.asarray(feature_row, dtype=np.float64) / self.quantum).astype(np.int64)
+        return session_id, hashlib.blake2b(quantized.tobytes(), digest_size=8).digest()
+
+    def _check_model(self, model_fingerprint):
+        if model_fingerprint != self.model_fingerprint:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.model_fingerprint = model_fingerprint
+
+    def get(self, key, model_fingerprint):
+        """Return the cached value or None"""
+        with self._lock:
+            self._check_model(model_fingerprint)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= self.clock():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, model_fingerprint):
+        with self._lock:
+            self._check_model(model_fingerprint)
+            self._entries[key] = (self.clock() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+        }
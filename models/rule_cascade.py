@@ -0,0 +1,222 @@
+# Ordered rule cascade evaluated before the IsolationForest
+#
+# Obvious sessions (honeypot hit, superhuman or perfectly regular typing)
+# do not need the forest. Each rule is a conjunction of feature comparisons;
+# the first rule that matches decides the session with its reason code and
+# risk score, and only sessions no rule matches are scored by the model.
+#
+# Modes:
+#   enforce  rule verdicts replace the model for matched sessions
+#   shadow   the model scores every session; rule verdicts are only recorded
+#            and compared with it (agreement per rule in ``report()``)
+#
+# Rules can be loaded from JSON, e.g.
+#   [{"name": "honeypot", "reason": "HONEYPOT_TRIGGERED", "verdict": true,
+#     "risk_score": 1.0, "when": [["honeypot_triggered", "==", 1]]}]
+
+import json
+import operator
+import threading
+import time
+
+import numpy as np
+
+OPERATORS = {
+    '<': (operator.lt, np.less),
+    '<=': (operator.le, np.less_equal),
+    '>': (operator.gt, np.greater),
+    '>=': (operator.ge, np.greater_equal),
+    '==': (operator.eq, np.equal),
+    '!=': (operator.ne, np.not_equal),
+}
+
+MODES = ('enforce', 'shadow')
+
+
+class Rule:
+    """A named conjunction of ``(feature, operator, value)`` clauses with a verdict"""
+
+    __slots__ = ('name', 'reason', 'verdict', 'risk_score', 'when')
+
+    def __init__(self, name, when, reason=None, verdict=True, risk_score=None):
+        for feature, op, _ in when:
+            if op not in OPERATORS:
+                raise ValueError(f"Rule {name}: unknown operator {op!r} for {feature}")
+        self.name = name
+        self.reason = reason or name.upper()
+        self.verdict = bool(verdict)
+        self.risk_score = float(risk_score if risk_score is not None else (1.0 if verdict else 0.0))
+        self.when = tuple((feature, op, float(value)) for feature, op, value in when)
+
+    def to_dict(self):
+        return {'name': self.name, 'reason': self.reason, 'verdict': self.verdict,
+                'risk_score': self.risk_score, 'when': [list(clause) for clause in self.when]}
+
+
+DEFAULT_RULES = (
+    Rule('honeypot', [('honeypot_triggered', '==', 1)], 'HONEYPOT_TRIGGERED'),
+    # Intervals are in milliseconds; 25 ms between keys is ~40 keys per second
+    Rule('superhuman_typing', [('avg_keystroke_interval', '>', 0), ('avg_keystroke_interval', '<', 25)],
+         'SUPERHUMAN_TYPING_SPEED'),
+    # Zero spread only means something over several intervals: with one
+    # interval (two events) the std / variance is always 0
+    Rule('robotic_typing', [('keystroke_count', '>=', 6), ('avg_keystroke_interval', '>', 0),
+                            ('std_keystroke_interval', '<', 1)],
+         'ZERO_KEYSTROKE_VARIANCE'),
+    Rule('robotic_mouse', [('mouse_step_count', '>=', 5), ('avg_mouse_speed', '>', 0),
+                           ('mouse_movement_variance', '<', 1e-6)],
+         'CONSTANT_MOUSE_STEP'),
+)
+
+
+class RuleCascade:
+    """
+    Ordered rules over feature rows, with hit and agreement statistics.
+
+    ``evaluate_row`` decides one row with plain Python comparisons;
+    ``evaluate`` decides a whole feature matrix with one NumPy comparison
+    per clause. Both return the index of the first matching rule, or -1.
+    Rules whose features are missing from a model's columns never match.
+    """
+
+    def __init__(self, rules=DEFAULT_RULES, mode='enforce'):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cascade mode {mode!r}, expected one of {MODES}")
+        self.rules = tuple(rules)
+        self.mode = mode
+        self._compiled = {}
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    @classmethod
+    def from_config(cls, config, mode='enforce'):
+        """Build from a list of rule dicts (see module header)"""
+        return cls([Rule(r['name'], r['when'], r.get('reason'), r.get('verdict', True), r.get('risk_score'))
+                    for r in config], mode)
+
+    @classmethod
+    def load(cls, path, mode='enforce'):
+        with open(path) as f:
+            return cls.from_config(json.load(f), mode)
+
+    def reset_stats(self):
+        self.evaluated = 0
+        self.hits = [0] * len(self.rules)
+        # Shadow mode: rule verdict matched the model's is_fraud
+        self.agreements = [0] * len(self.rules)
+        self.model_rows = 0
+        self.model_ns = 0
+        self.cascade_ns = 0
+
+    def compile(self, columns):
+        """Clauses with feature positions for one column order (memoized)"""
+        columns = tuple(columns)
+        compiled = self._compiled.get(columns)
+        if compiled is None:
+            index = {name: i for i, name in enumerate(columns)}
+            compiled = []
+            for rule in self.rules:
+                if all(feature in index for feature, _, _ in rule.when):
+                    compiled.append(tuple((index[feature], OPERATORS[op], value)
+                                          for feature, op, value in rule.when))
+                else:
+                    compiled.append(None)
+            compiled = self._compiled[columns] = tuple(compiled)
+        return compiled
+
+    def evaluate_row(self, row, columns):
+        """Index of the first rule matching one feature row, or -1"""
+        start = time.perf_counter_ns()
+        values = row.tolist()
+        decided = -1
+        for i, clauses in enumerate(self.compile(columns)):
+            if clauses is not None and all(ops[0](values[position], value)
+                                           for position, ops, value in clauses):
+                decided = i
+                break
+        elapsed = time.perf_counter_ns() - start
+        with self._lock:
+            self.evaluated += 1
+            self.cascade_ns += elapsed
+            if decided >= 0:
+                self.hits[decided] += 1
+        return decided
+
+    def evaluate(self, X, columns):
+        """First matching rule index per row of a feature matrix (-1 where none match)"""
+        start = time.perf_counter_ns()
+        decided = np.full(len(X), -1, dtype=np.int64)
+        undecided = np.ones(len(X), dtype=bool)
+        for i, clauses in enumerate(self.compile(columns)):
+            if clauses is None:
+                continue
+            match = undecided.copy()
+            for position, ops, value in clauses:
+                match &= ops[1](X[:, position], value)
+            decided[match] = i
+            undecided &= ~match
+        elapsed = time.perf_counter_ns() - start
+        counts = np.bincount(decided[decided >= 0], minlength=len(self.rules)).tolist()
+        with self._lock:
+            self.evaluated += len(X)
+            self.cascade_ns += elapsed
+            for i, count in enumerate(counts):
+                self.hits[i] += count
+        return decided
+
+    def record_model(self, rows, elapsed_ns):
+        """Time the model spent on ``rows`` rows (the cost a rule hit saves)"""
+        with self._lock:
+            self.model_rows += rows
+            self.model_ns += elapsed_ns
+
+    def record_agreement(self, decided, is_fraud):
+        """Shadow mode: compare rule verdicts with the model's flags"""
+        decided = np.atleast_1d(decided)
+        is_fraud = np.atleast_1d(is_fraud)
+        with self._lock:
+            for rule_index, flagged in zip(decided.tolist(), is_fraud.tolist()):
+                if rule_index >= 0 and self.rules[rule_index].verdict == bool(flagged):
+                    self.agreements[rule_index] += 1
+
+    def verdicts(self, decided):
+        """``(is_fraud, risk_score, reason)`` arrays for decided rule indices"""
+        is_fraud = np.array([rule.verdict for rule in self.rules] + [False])[decided]
+        risk = np.array([rule.risk_score for rule in self.rules] + [np.nan])[decided]
+        reasons = np.array([rule.reason for rule in self.rules] + [''], dtype=object)[decided]
+        return is_fraud, risk, reasons
+
+    def report(self):
+        """Hit rates per rule, shadow agreement and the model time saved by short-circuits"""
+        with self._lock:
+            evaluated = self.evaluated
+            hits = list(self.hits)
+            agreements = list(self.agreements)
+            model_rows, model_ns, cascade_ns = self.model_rows, self.model_ns, self.cascade_ns
+
+        model_us = model_ns / model_rows / 1e3 if model_rows else None
+        cascade_us = cascade_ns / evaluated / 1e3 if evaluated else 0.0
+        total_hits = sum(hits)
+        rules = []
+        for rule, hit, agreed in zip(self.rules, hits, agreements):
+            entry = {'name': rule.name, 'reason': rule.reason, 'hits': hit,
+                     'hit_rate': hit / evaluated if evaluated else 0.0}
+            if self.mode == 'shadow':
+                entry['agreement'] = agreed / hit if hit else None
+            rules.append(entry)
+
+        report = {
+            'mode': self.mode,
+            'evaluated': evaluated,
+            'short_circuited': total_hits,
+            'short_circuit_rate': total_hits / evaluated if evaluated else 0.0,
+            'cascade_us_per_row': cascade_us,
+            'model_us_per_row': model_us,
+            'rules': rules,
+        }
+        if model_us is not None and self.mode == 'enforce':
+            # Every hit skipped one model evaluation, and every row paid for the cascade
+            saved_us = total_hits * model_us - evaluated * cascade_us
+            report['saved_ms_total'] = saved_us / 1e3
+            report['saved_us_per_request'] = saved_us / evaluated if evaluated else 0.0
+        return report
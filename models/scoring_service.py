@@ -0,0 +1,395 @@
+# Micro-batching local scoring service around FraudDetector
+#
+# One process owns one loaded detector. Requests are queued and flushed as a
+# batch when max_batch_size requests are waiting or max_wait_ms has passed
+# since the first one arrived, then scored with a single predict_batch call.
+#
+# POST /score takes a JSON session, or a msgpack one (Content-Type:
+# application/msgpack) whose behavioral_data is packed telemetry (see
+# models/telemetry_codec.py). Bodies larger than --max-body-kb are refused
+# with 413 before they are read.
+#
+# Usage:
+#   python -m models.scoring_service --model model.fdm --port 8765
+#   python -m models.scoring_service --model model.fdm --unix /tmp/fraud.sock
+#   python -m models.scoring_service --model model.fdm --bench
+
+import argparse
+import asyncio
+import collections
+import json
+import time
+
+import numpy as np
+
+from .fraud_detector import FraudDetector
+from .synthetic_data import generate_sessions
+from .telemetry_codec import as_behavioral_data
+
+
+class ServiceOverloaded(Exception):
+    """Raised when the request queue is full (backpressure)"""
+
+
+class MicroBatcher:
+    """Queue single scoring requests and score them in vectorized batches"""
+
+    def __init__(self, detector, max_batch_size=64, max_wait_ms=2.0,
+                 max_queue_size=1024, request_timeout_ms=1000.0, latency_window=10000):
+        self.detector = detector
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.request_timeout = request_timeout_ms / 1000.0 if request_timeout_ms else None
+        self.queue = asyncio.Queue(maxsize=max_queue_size)
+        self._worker = None
+
+        # Statistics
+        self.latencies = collections.deque(maxlen=latency_window)
+        self.requests = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.batches = 0
+        self.scored_rows = 0
+        self.failed = 0
+        self.started_at = None
+
+    async def start(self):
+        self.started_at = time.perf_counter()
+        self._worker = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def score(self, session):
+        """Score one session dict; raises ServiceOverloaded or asyncio.TimeoutError"""
+        start = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((session, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise ServiceOverloaded("Scoring queue is full")
+
+        self.requests += 1
+        try:
+            result = await asyncio.wait_for(future, self.request_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        self.latencies.append(time.perf_counter() - start)
+        return result
+
+    async def _next_batch(self):
+        """Wait for one request, then collect more until the batch is full or the wait expires"""
+        batch = [await self.queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            # Requests that already timed out are dropped instead of scored
+            batch = [(session, future) for session, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            sessions = [session for session, _ in batch]
+            # Score off the event loop so new requests keep queueing meanwhile
+            outcomes = await loop.run_in_executor(None, self._score, sessions)
+
+            self.batches += 1
+            for outcome, (_, future) in zip(outcomes, batch):
+                if isinstance(outcome, Exception):
+                    self.failed += 1
+                    if not future.done():
+                        future.set_exception(outcome)
+                else:
+                    self.scored_rows += 1
+                    if not future.done():
+                        future.set_result(outcome)
+
+    def _score(self, sessions):
+        """One result dict or exception per session.
+
+        The batch is scored with one predict_batch call. If that raises, the
+        sessions whose features cannot be extracted fail with their own error
+        and the rest are scored again in one call, so every row is counted
+        once in the cascade and metrics stats. When every session extracts,
+        the failure is not a row's fault and the whole batch fails with it.
+        """
+        try:
+            return self._results(self.detector.predict_batch(sessions), len(sessions))
+        except Exception as e:
+            batch_error = e
+
+        # extract_features records no stats
+        errors = []
+        for session in sessions:
+            try:
+                self.detector.extract_features(session.get('behavioral_data'),
+                                               session.get('geolocation_data'),
+                                               session.get('honeypot_triggered', False))
+                errors.append(None)
+            except Exception as e:
+                errors.append(e)
+        valid = [session for session, error in zip(sessions, errors) if error is None]
+        if len(valid) == len(sessions):
+            return [batch_error] * len(sessions)
+        if valid:
+            try:
+                scored = iter(self._results(self.detector.predict_batch(valid), len(valid)))
+            except Exception as e:
+                scored = iter([e] * len(valid))
+        return [error if error is not None else next(scored) for error in errors]
+
+    @staticmethod
+    def _results(results, n):
+        reasons = results.get('reason')
+        rows = []
+        for i in range(n):
+            anomaly_score = float(results['anomaly_score'][i])
+            result = {
+                'is_fraud': bool(results['is_fraud'][i]),
+                'risk_score': float(results['risk_score'][i]),
+                # NaN when a cascade rule decided the session without the model
+                'anomaly_score': None if np.isnan(anomaly_score) else anomaly_score,
+            }
+            if reasons is not None and reasons[i]:
+                result['reason'] = reasons[i]
+            rows.append(result)
+        return rows
+
+    def stats(self):
+        """Latency percentiles, throughput and queue counters"""
+        elapsed = time.perf_counter() - self.started_at if self.started_at else 0
+        latencies_ms = np.asarray(self.latencies) * 1000.0
+        stats = {
+            'requests': self.requests,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts,
+            'failed': self.failed,
+            'batches': self.batches,
+            'avg_batch_size': self.scored_rows / self.batches if self.batches else 0,
+            'queue_depth': self.queue.qsize(),
+            'p50_ms': float(np.percentile(latencies_ms, 50)) if len(latencies_ms) else None,
+            'p99_ms': float(np.percentile(latencies_ms, 99)) if len(latencies_ms) else None,
+            'throughput_rps': self.scored_rows / elapsed if elapsed else 0,
+        }
+        if self.detector.cascade is not None:
+            stats['cascade'] = self.detector.cascade.report()
+        return stats
+
+
+class ScoringHTTPServer:
+    """Minimal HTTP/1.1 front end: POST /score with a JSON session, GET /stats, GET /metrics"""
+
+    def __init__(self, batcher, max_body_bytes=1 << 20):
+        self.batcher = batcher
+        self.max_body_bytes = max_body_bytes
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0))
+                if length < 0 or length > self.max_body_bytes:
+                    # The body is never read, so the connection cannot be reused
+                    status = 413 if length > 0 else 400
+                    self.write_response(writer, status, {'error': f'body of {length} bytes refused '
+                                                                  f'(limit {self.max_body_bytes})'})
+                    await writer.drain()
+                    break
+                body = await reader.readexactly(length)
+                status, payload = await self.dispatch(method, path, body, headers.get('content-type', ''))
+                self.write_response(writer, status, payload)
+                await writer.drain()
+
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, path, body, content_type=''):
+        if method == 'GET' and path == '/stats':
+            return 200, self.batcher.stats()
+        if method == 'GET' and path == '/metrics':
+            metrics = self.batcher.detector.metrics
+            if metrics is None:
+                return 404, {'error': 'metrics are disabled (start with --metrics)'}
+            return 200, metrics.to_prometheus()
+        if method != 'POST' or path != '/score':
+            return 404, {'error': 'not found'}
+
+        if content_type.startswith('application/msgpack'):
+            # Lets behavioral_data travel as a raw packed telemetry bin field
+            try:
+                import msgpack
+            except ImportError:
+                return 415, {'error': 'msgpack bodies require the msgpack package'}
+            try:
+                session = msgpack.unpackb(body)
+            except Exception:
+                return 400, {'error': 'invalid msgpack body'}
+        else:
+            try:
+                session = json.loads(body or b'{}')
+            except json.JSONDecodeError:
+                return 400, {'error': 'invalid JSON body'}
+
+        # Decode packed telemetry here so a malformed payload fails only its own request
+        try:
+            session['behavioral_data'] = as_behavioral_data(session.get('behavioral_data'))
+        except (AttributeError, ValueError) as e:
+            return 400, {'error': f'invalid session: {e}'}
+
+        try:
+            return 200, await self.batcher.score(session)
+        except ServiceOverloaded as e:
+            return 503, {'error': str(e)}
+        except asyncio.TimeoutError:
+            return 504, {'error': 'scoring timed out'}
+        except (KeyError, TypeError, ValueError, ArithmeticError) as e:
+            # Raised by feature extraction on sessions with unusable values
+            return 400, {'error': f'invalid session: {type(e).__name__}: {e}'}
+        except Exception as e:
+            return 500, {'error': f'scoring failed: {type(e).__name__}: {e}'}
+
+    @staticmethod
+    def write_response(writer, status, payload):
+        reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 413: 'Payload Too Large',
+                   415: 'Unsupported Media Type',
+                   500: 'Internal Server Error', 503: 'Service Unavailable', 504: 'Gateway Timeout'}
+        if isinstance(payload, str):
+            content_type, body = 'text/plain; version=0.0.4', payload.encode('utf-8')
+        else:
+            content_type, body = 'application/json', json.dumps(payload).encode('utf-8')
+        writer.write(
+            f"HTTP/1.1 {status} {reasons.get(status, 'Error')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body
+        )
+
+
+async def serve(detector, args):
+    batcher = MicroBatcher(detector, args.max_batch, args.max_wait_ms,
+                           args.queue_size, args.timeout_ms)
+    await batcher.start()
+    http = ScoringHTTPServer(batcher, int(args.max_body_kb * 1024))
+
+    if args.unix:
+        server = await asyncio.start_unix_server(http.handle, path=args.unix)
+        print(f"[SERVICE] Scoring on unix socket {args.unix}")
+    else:
+        server = await asyncio.start_server(http.handle, args.host, args.port)
+        print(f"[SERVICE] Scoring on http://{args.host}:{args.port}/score")
+
+    async with server:
+        await server.serve_forever()
+
+
+async def bench_setting(detector, sessions, max_batch, max_wait_ms, concurrency):
+    """Drive the batcher with `concurrency` closed-loop clients"""
+    batcher = MicroBatcher(detector, max_batch, max_wait_ms,
+                           max_queue_size=concurrency * 2, request_timeout_ms=None,
+                           latency_window=len(sessions))
+    await batcher.start()
+    position = iter(range(len(sessions)))
+
+    async def client():
+        for i in position:
+            await batcher.score(sessions[i])
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    stats = batcher.stats()
+    await batcher.stop()
+    return stats
+
+
+def run_benchmark(detector, n_requests=5000, concurrency=64,
+                  settings=((1, 0.0), (8, 1.0), (32, 2.0), (64, 5.0))):
+    """Report p50/p99 latency and throughput for several batch settings"""
+    sessions = generate_sessions(n_requests, seed=0)
+    print(f"\n{'max_batch':>10}{'wait_ms':>9}{'avg_batch':>11}{'p50_ms':>9}{'p99_ms':>9}{'req/s':>10}")
+    print("-" * 58)
+    rows = []
+    for max_batch, max_wait_ms in settings:
+        stats = asyncio.run(bench_setting(detector, sessions, max_batch, max_wait_ms, concurrency))
+        rows.append(dict(stats, max_batch=max_batch, max_wait_ms=max_wait_ms))
+        print(f"{max_batch:>10}{max_wait_ms:>9.1f}{stats['avg_batch_size']:>11.1f}"
+              f"{stats['p50_ms']:>9.2f}{stats['p99_ms']:>9.2f}{stats['throughput_rps']:>10.0f}")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-batching FraudDetector scoring service")
+    parser.add_argument('--model', help='Model artifact to load (trained in-process if omitted)')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=8765, help='TCP port to listen on')
+    parser.add_argument('--unix', help='Listen on this unix socket path instead of TCP')
+    parser.add_argument('--max-batch', type=int, default=64, help='Flush when this many requests are queued')
+    parser.add_argument('--max-wait-ms', type=float, default=2.0, help='Flush after this wait (milliseconds)')
+    parser.add_argument('--queue-size', type=int, default=1024, help='Queued requests before rejecting (503)')
+    parser.add_argument('--timeout-ms', type=float, default=1000.0, help='Per-request timeout (504)')
+    parser.add_argument('--max-body-kb', type=float, default=1024, help='Largest request body accepted (413)')
+    parser.add_argument('--metrics', action='store_true', help='Record stage metrics, exported on GET /metrics')
+    parser.add_argument('--slow-request-ms', type=float, help='Capture stack samples of requests slower than this')
+    parser.add_argument('--rules', nargs='?', const='default',
+                        help='Run the rule cascade before the model (default rules, or a JSON rule file)')
+    parser.add_argument('--rules-mode', choices=['enforce', 'shadow'], default='enforce',
+                        help='Let rules decide sessions, or only compare them with the model')
+    parser.add_argument('--bench', action='store_true', help='Benchmark batch settings instead of serving')
+    parser.add_argument('--requests', type=int, default=5000, help='Requests per benchmark setting')
+    parser.add_argument('--concurrency', type=int, default=64, help='Concurrent benchmark clients')
+    args = parser.parse_args()
+
+    if args.model:
+        detector = FraudDetector.load(args.model)
+    else:
+        detector = FraudDetector()
+        detector.train()
+    if args.metrics or args.slow_request_ms is not None:
+        detector.enable_metrics(args.slow_request_ms)
+    if args.rules:
+        detector.enable_rule_cascade(None if args.rules == 'default' else args.rules, args.rules_mode)
+
+    if args.bench:
+        run_benchmark(detector, args.requests, args.concurrency)
+        return
+
+    try:
+        asyncio.run(serve(detector, args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import math
+
+from .feature_registry import FEATURE_REGISTRY
+from .telemetry_codec import PackedTelemetry, as_behavioral_data
+
+
+class RunningStats:
+    """Welford running mean / population variance in O(1) memory"""
+
+    __slots__ = ('count', 'mean', 'm2')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def push(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self):
+        # Population variance, like np.var / np.std with the default ddof=0
+        return self.m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+
+class SessionFeatureAccumulator:
+    """
+    Incrementally builds the FraudDetector features of one session from a
+    stream of keystroke and mouse events.
+
+    Each event updates running statistics in O(1) and no raw history is kept,
+    so memory per session is constant and the session can be scored at any
+    moment (``FraudDetector.predict_session``) without re-scanning its events.
+    Results match ``extract_features`` up to floating point rounding.
+    """
+
+    __slots__ = ('keystroke_count', 'first_keystroke', 'last_keystroke', 'intervals',
+                 'last_mouse_x', 'last_mouse_y', 'mouse_steps',
+                 'geolocation_data', 'honeypot_triggered')
+
+    def __init__(self):
+        self.keystroke_count = 0
+        self.first_keystroke = None
+        self.last_keystroke = None
+        self.intervals = RunningStats()
+
+        self.last_mouse_x = None
+        self.last_mouse_y = None
+        self.mouse_steps = RunningStats()
+
+        self.geolocation_data = None
+        self.honeypot_triggered = False
+
+    def add_keystroke(self, timestamp):
+        """Record one keystroke timestamp (same unit as ``keystroke_times``)"""
+        if self.last_keystroke is None:
+            self.first_keystroke = timestamp
+        else:
+            self.intervals.push(timestamp - self.last_keystroke)
+        self.last_keystroke = timestamp
+        self.keystroke_count += 1
+
+    def add_mouse_move(self, x, y):
+        """Record one mouse position"""
+        if self.last_mouse_x is not None:
+            dx = x - self.last_mouse_x
+            dy = y - self.last_mouse_y
+            self.mouse_steps.push(math.sqrt(dx * dx + dy * dy))
+        self.last_mouse_x = x
+        self.last_mouse_y = y
+
+    def update(self, behavioral_data):
+        """Feed a chunk of events in the ``behavioral_data`` format used by ``predict``"""
+        behavioral_data = as_behavioral_data(behavioral_data)
+        if isinstance(behavioral_data, PackedTelemetry):
+            for timestamp in behavioral_data.keystroke_times.tolist():
+                self.add_keystroke(timestamp)
+            for x, y in behavioral_data.mouse_xy.tolist():
+                self.add_mouse_move(x, y)
+            return
+        for timestamp in behavioral_data.get('keystroke_times', []):
+            self.add_keystroke(timestamp)
+        for move in behavioral_data.get('mouse_movements', []):
+            self.add_mouse_move(move['x'], move['y'])
+
+    def set_geolocation(self, geolocation_data):
+        self.geolocation_data = geolocation_data
+
+    def trigger_honeypot(self):
+        self.honeypot_triggered = True
+
+    def group_values(self, group):
+        """Current values of one FEATURE_REGISTRY group (see ExtractionPlan.extract_from_source)"""
+        if group == 'keystroke':
+            if self.keystroke_count > 1:
+                duration = self.last_keystroke - self.first_keystroke
+                return (self.intervals.mean, self.intervals.std,
+                        self.keystroke_count / duration if duration else 0, self.keystroke_count)
+            return 0, 0, 0, self.keystroke_count
+        if group == 'mouse':
+            if self.mouse_steps.count:
+                return self.mouse_steps.mean, self.mouse_steps.variance, self.mouse_steps.count
+            return 0, 0, 0
+        if group == 'geolocation':
+            geolocation_data = self.geolocation_data
+            if geolocation_data:
+                return 1, geolocation_data.get('latitude', 0), geolocation_data.get('longitude', 0)
+            return 0, 0, 0
+        if group == 'honeypot':
+            return (1 if self.honeypot_triggered else 0,)
+        raise KeyError(f"SessionFeatureAccumulator does not compute feature group {group!r}")
+
+    def write_features(self, row, plan=None):
+        """Write the current features into a preallocated row (plan column order)"""
+        if plan is None:
+            plan = FEATURE_REGISTRY.plan()
+        return plan.extract_from_source(row, self)
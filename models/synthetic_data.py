@@ -0,0 +1,188 @@
+# Vectorized synthetic traffic for training sets and benchmarks
+#
+# Same populations as FraudDetector.create_sample_training_data (normal users
+# around Delhi, fast and very regular bots elsewhere), but every draw is one
+# NumPy call over all rows, so millions of rows take seconds. The same seed
+# always gives the same output.
+#
+# Usage:
+#   python -m models.synthetic_data features 1000000 features.npy
+#   python -m models.synthetic_data sessions 100000 sessions.jsonl
+
+import argparse
+import json
+
+import numpy as np
+
+from .feature_registry import FEATURE_REGISTRY
+
+# Per-feature (mean, std) by FEATURE_REGISTRY name; None = drawn separately
+NORMAL_PROFILE = {
+    'avg_keystroke_interval': (150, 30),
+    'std_keystroke_interval': (50, 15),
+    'typing_speed': (5, 1.5),
+    'keystroke_count': (35, 15),
+    'avg_mouse_speed': (100, 25),
+    'mouse_movement_variance': (500, 150),
+    'mouse_step_count': (64, 32),
+    'has_geolocation': None,
+    'latitude': (28.6139, 2),
+    'longitude': (77.2090, 2),
+    'honeypot_triggered': None,
+}
+FRAUD_PROFILE = {
+    'avg_keystroke_interval': (50, 10),
+    'std_keystroke_interval': (5, 2),
+    'typing_speed': (15, 3),
+    'keystroke_count': (35, 15),
+    'avg_mouse_speed': (300, 50),
+    'mouse_movement_variance': (50, 15),
+    'mouse_step_count': (64, 32),
+    'has_geolocation': None,
+    'latitude': (40.7128, 10),
+    'longitude': (-74.0060, 10),
+    'honeypot_triggered': None,
+}
+
+
+def _labels(rng, n, contamination):
+    is_fraud = np.zeros(n, dtype=bool)
+    is_fraud[:int(round(n * contamination))] = True
+    rng.shuffle(is_fraud)
+    return is_fraud
+
+
+def generate_feature_matrix(n, contamination=0.1, seed=42, dtype=np.float32, columns=None):
+    """Return ``(X, is_fraud)``: n feature rows mixing normal and fraud traffic.
+
+    Columns follow ``columns`` (default: every FEATURE_REGISTRY feature);
+    a feature without a profile entry raises ValueError.
+    """
+    columns = list(columns if columns is not None else FEATURE_REGISTRY.columns)
+    missing = [c for c in columns if c not in NORMAL_PROFILE or c not in FRAUD_PROFILE]
+    if missing:
+        raise ValueError(f"No synthetic profile for features: {missing}")
+
+    rng = np.random.default_rng(seed)
+    is_fraud = _labels(rng, n, contamination)
+
+    profiles = (NORMAL_PROFILE, FRAUD_PROFILE)
+    mean = np.array([[p[c][0] if p[c] else 0 for c in columns] for p in profiles], dtype=dtype)
+    std = np.array([[p[c][1] if p[c] else 0 for c in columns] for p in profiles], dtype=dtype)
+
+    population = is_fraud.astype(np.intp)
+    X = rng.standard_normal((n, len(columns)), dtype=np.float32).astype(dtype, copy=False)
+    X *= std[population]
+    X += mean[population]
+
+    # Binary features: every normal user shares location and never hits the honeypot
+    has_geolocation = np.where(is_fraud, rng.integers(0, 2, n), 1)
+    honeypot_triggered = np.where(is_fraud, rng.random(n) < 0.3, 0)
+    if 'has_geolocation' in columns:
+        X[:, columns.index('has_geolocation')] = has_geolocation
+    if 'honeypot_triggered' in columns:
+        X[:, columns.index('honeypot_triggered')] = honeypot_triggered
+    return X, is_fraud
+
+
+def generate_session_arrays(n, contamination=0.1, seed=42, keystrokes=(10, 60), mouse_moves=(10, 120)):
+    """Raw keystroke / mouse sessions in columnar form.
+
+    Events of all sessions are stored back to back; session i owns
+    ``keystroke_times[keystroke_offsets[i]:keystroke_offsets[i + 1]]`` (in
+    milliseconds) and the same slice of ``mouse_xy`` via ``mouse_offsets``.
+    """
+    rng = np.random.default_rng(seed)
+    is_fraud = _labels(rng, n, contamination)
+
+    key_counts = rng.integers(keystrokes[0], keystrokes[1] + 1, n)
+    mouse_counts = rng.integers(mouse_moves[0], mouse_moves[1] + 1, n)
+    keystroke_offsets = np.concatenate([[0], np.cumsum(key_counts)])
+    mouse_offsets = np.concatenate([[0], np.cumsum(mouse_counts)])
+
+    # Keystroke intervals: humans ~150 +- 50 ms, bots ~50 +- 5 ms
+    key_owner = np.repeat(is_fraud, key_counts)
+    intervals = np.where(key_owner, rng.normal(50, 5, len(key_owner)),
+                         rng.normal(150, 50, len(key_owner))).clip(10)
+    keystroke_times = np.cumsum(intervals)
+    # Restart the clock for each session (its first keystroke at its first interval)
+    session_start = np.repeat(keystroke_times[keystroke_offsets[:-1]] - intervals[keystroke_offsets[:-1]],
+                              key_counts)
+    keystroke_times -= session_start
+
+    # Mouse trajectories: random headings, human steps ~100 +- 25 px, bot steps ~300 +- 7 px
+    mouse_owner = np.repeat(is_fraud, mouse_counts)
+    step = np.where(mouse_owner, rng.normal(300, 7, len(mouse_owner)),
+                    rng.normal(100, 25, len(mouse_owner))).clip(0)
+    heading = rng.uniform(0, 2 * np.pi, len(mouse_owner))
+    steps = np.stack([step * np.cos(heading), step * np.sin(heading)], axis=1)
+    steps[mouse_offsets[:-1]] = rng.uniform(0, 1000, (n, 2))
+    mouse_xy = np.cumsum(steps, axis=0)
+    mouse_xy -= np.repeat(mouse_xy[mouse_offsets[:-1]] - steps[mouse_offsets[:-1]], mouse_counts, axis=0)
+
+    has_geolocation = np.where(is_fraud, rng.integers(0, 2, n), 1).astype(bool)
+    latitude = np.where(is_fraud, rng.normal(40.7128, 10, n), rng.normal(28.6139, 2, n))
+    longitude = np.where(is_fraud, rng.normal(-74.0060, 10, n), rng.normal(77.2090, 2, n))
+    honeypot_triggered = is_fraud & (rng.random(n) < 0.3)
+
+    return {
+        'is_fraud': is_fraud,
+        'keystroke_offsets': keystroke_offsets,
+        'keystroke_times': keystroke_times,
+        'mouse_offsets': mouse_offsets,
+        'mouse_xy': mouse_xy,
+        'has_geolocation': has_geolocation,
+        'latitude': latitude,
+        'longitude': longitude,
+        'honeypot_triggered': honeypot_triggered,
+    }
+
+
+def iter_sessions(arrays):
+    """Session dicts in the ``predict`` argument format from ``generate_session_arrays`` output"""
+    keystroke_offsets = arrays['keystroke_offsets']
+    mouse_offsets = arrays['mouse_offsets']
+    for i in range(len(arrays['is_fraud'])):
+        keys = arrays['keystroke_times'][keystroke_offsets[i]:keystroke_offsets[i + 1]]
+        mouse = arrays['mouse_xy'][mouse_offsets[i]:mouse_offsets[i + 1]]
+        yield {
+            'behavioral_data': {
+                'keystroke_times': keys.tolist(),
+                'mouse_movements': [{'x': x, 'y': y} for x, y in mouse.tolist()],
+            },
+            'geolocation_data': ({'latitude': float(arrays['latitude'][i]),
+                                  'longitude': float(arrays['longitude'][i])}
+                                 if arrays['has_geolocation'][i] else None),
+            'honeypot_triggered': bool(arrays['honeypot_triggered'][i]),
+        }
+
+
+def generate_sessions(n, contamination=0.1, seed=42, **kwargs):
+    """List of n raw session dicts, e.g. to benchmark ``extract_features``"""
+    return list(iter_sessions(generate_session_arrays(n, contamination, seed, **kwargs)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic fraud detection traffic")
+    parser.add_argument('kind', choices=['features', 'sessions'], help='Feature rows (.npy) or raw sessions (.jsonl)')
+    parser.add_argument('n', type=int, help='Number of rows / sessions')
+    parser.add_argument('output', help='Output path')
+    parser.add_argument('--contamination', type=float, default=0.1, help='Fraction of fraud traffic')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    args = parser.parse_args()
+
+    if args.kind == 'features':
+        X, is_fraud = generate_feature_matrix(args.n, args.contamination, args.seed)
+        np.save(args.output, X)
+        np.save(args.output.rsplit('.', 1)[0] + '_labels.npy', is_fraud)
+    else:
+        arrays = generate_session_arrays(args.n, args.contamination, args.seed)
+        with open(args.output, 'w') as f:
+            for session, is_fraud in zip(iter_sessions(arrays), arrays['is_fraud']):
+                session['is_fraud'] = bool(is_fraud)
+                f.write(json.dumps(session) + '\n')
+    print(f"Wrote {args.n:,} {args.kind} to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# Packed columnar wire format for behavioral telemetry
+#
+# A session's keystroke timestamps and mouse positions travel as typed-array
+# buffers instead of JSON lists of numbers and {x, y} objects. Decoding is a
+# pair of np.frombuffer views over the payload: no per-event Python objects.
+#
+# Layout (little-endian, format version 1):
+#   offset 0   4 bytes   magic b'FDT1'
+#   offset 4   uint32    number of keystrokes (nk)
+#   offset 8   uint32    number of mouse positions (nm)
+#   offset 12  uint32    reserved, 0
+#   offset 16  float64[nk]      keystroke timestamps (ms)
+#   then       float32[nm * 2]  mouse positions, interleaved x, y (px)
+#
+# The payload can be sent as raw bytes (e.g. a msgpack bin field or an
+# application/octet-stream body) or base64 encoded inside JSON, either as the
+# whole ``behavioral_data`` value or as ``{"packed": ...}``. The JSON object
+# form ({"keystroke_times": [...], "mouse_movements": [...]}) keeps working.
+# The browser encoder is ``packTelemetry`` in the front-end app.js files.
+
+import base64
+import binascii
+import struct
+
+import numpy as np
+
+MAGIC = b'FDT1'
+HEADER = struct.Struct('<4sIII')
+KEYSTROKE_DTYPE = np.dtype('<f8')
+MOUSE_DTYPE = np.dtype('<f4')
+
+
+class PackedTelemetry:
+    """Decoded packed telemetry: read-only array views over the payload"""
+
+    __slots__ = ('keystroke_times', 'mouse_xy')
+
+    def __init__(self, keystroke_times, mouse_xy):
+        self.keystroke_times = keystroke_times
+        # (nm, 2) array of x, y
+        self.mouse_xy = mouse_xy
+
+    def __bool__(self):
+        return True
+
+    def get(self, key, default=None):
+        """Dict-style access for code written against the JSON format.
+        ``mouse_movements`` builds per-event dicts, so hot paths use ``mouse_xy``."""
+        if key == 'keystroke_times':
+            return self.keystroke_times
+        if key == 'mouse_movements':
+            return [{'x': x, 'y': y} for x, y in self.mouse_xy.tolist()]
+        return default
+
+
+def encode_telemetry(keystroke_times, mouse_xy):
+    """Pack keystroke timestamps and an (n, 2) sequence of mouse positions"""
+    keystroke_times = np.ascontiguousarray(keystroke_times, dtype=KEYSTROKE_DTYPE)
+    mouse_xy = np.ascontiguousarray(mouse_xy, dtype=MOUSE_DTYPE).reshape(-1, 2)
+    return (HEADER.pack(MAGIC, len(keystroke_times), len(mouse_xy), 0)
+            + keystroke_times.tobytes() + mouse_xy.tobytes())
+
+
+def encode_behavioral_data(behavioral_data):
+    """Pack a ``behavioral_data`` dict in the JSON format"""
+    mouse_movements = behavioral_data.get('mouse_movements', [])
+    mouse_xy = np.fromiter((c for m in mouse_movements for c in (m['x'], m['y'])),
+                           dtype=MOUSE_DTYPE, count=2 * len(mouse_movements))
+    return encode_telemetry(behavioral_data.get('keystroke_times', []), mouse_xy)
+
+
+def decode_telemetry(payload):
+    """Decode a packed payload (bytes-like, or base64 text) into PackedTelemetry"""
+    if isinstance(payload, str):
+        try:
+            payload = base64.b64decode(payload, validate=True)
+        except binascii.Error as e:
+            raise ValueError(f"Invalid base64 telemetry payload: {e}")
+
+    buffer = memoryview(payload)
+    if buffer.nbytes < HEADER.size:
+        raise ValueError("Telemetry payload is shorter than its header")
+    magic, n_keystrokes, n_mouse, _ = HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise ValueError(f"Not a packed telemetry payload (magic {magic!r})")
+
+    mouse_offset = HEADER.size + n_keystrokes * KEYSTROKE_DTYPE.itemsize
+    expected = mouse_offset + 2 * n_mouse * MOUSE_DTYPE.itemsize
+    if buffer.nbytes != expected:
+        raise ValueError(f"Telemetry payload is {buffer.nbytes} bytes, header describes {expected}")
+
+    keystroke_times = np.frombuffer(buffer, KEYSTROKE_DTYPE, n_keystrokes, HEADER.size)
+    mouse_xy = np.frombuffer(buffer, MOUSE_DTYPE, 2 * n_mouse, mouse_offset).reshape(n_mouse, 2)
+    return PackedTelemetry(keystroke_times, mouse_xy)
+
+
+def as_behavioral_data(behavioral_data):
+    """Return PackedTelemetry for packed payloads and anything else unchanged"""
+    if not behavioral_data or isinstance(behavioral_data, PackedTelemetry):
+        return behavioral_data
+    if isinstance(behavioral_data, dict):
+        packed = behavioral_data.get('packed')
+        return decode_telemetry(packed) if packed is not None else behavioral_data
+    if isinstance(behavioral_data, (bytes, bytearray, memoryview, str)):
+        return decode_telemetry(behavioral_data)
+    return behavioral_data
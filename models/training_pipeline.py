@@ -0,0 +1,235 @@
+# Streaming training pipeline: fit FraudDetector from session logs on disk
+#
+# Sessions are read in chunks (JSONL, CSV or Parquet), features are extracted
+# in a process pool, the scaler is fitted incrementally over every row and
+# the IsolationForest is fitted on a fixed-size reservoir sample. Memory is
+# bounded by chunk_size * in-flight chunks + reservoir_size, whatever the
+# size of the input.
+#
+# Usage:
+#   python -m models.training_pipeline sessions.jsonl --output model.fdm --workers 8
+
+import argparse
+import concurrent.futures
+import csv
+import json
+import os
+import resource
+import time
+
+import numpy as np
+
+from .feature_registry import FEATURE_REGISTRY
+
+SESSION_FIELDS = ('behavioral_data', 'geolocation_data', 'honeypot_triggered')
+
+
+def _parse_json_field(value):
+    if isinstance(value, str):
+        return json.loads(value) if value else None
+    return value
+
+
+def _parse_flag(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes')
+    return bool(value)
+
+
+def _csv_session(record):
+    """CSV cells hold behavioral/geolocation data as JSON strings"""
+    return {
+        'behavioral_data': _parse_json_field(record.get('behavioral_data')),
+        'geolocation_data': _parse_json_field(record.get('geolocation_data')),
+        'honeypot_triggered': _parse_flag(record.get('honeypot_triggered', False)),
+    }
+
+
+def _detect_format(path, fmt=None):
+    fmt = (fmt or os.path.splitext(path)[1].lstrip('.')).lower()
+    if fmt in ('json', 'ndjson'):
+        return 'jsonl'
+    if fmt not in ('jsonl', 'csv', 'parquet'):
+        raise ValueError(f"Unsupported session log format: {fmt!r} (expected jsonl, csv or parquet)")
+    return fmt
+
+
+def iter_raw_chunks(path, chunk_size=10000, fmt=None):
+    """Yield ``(format, records)`` chunks without decoding sessions.
+
+    Records are JSON lines for JSONL and dicts of cells for CSV/Parquet;
+    ``parse_records`` turns them into session dicts. Keeping the decode out
+    of the reader lets worker processes do it in parallel.
+    """
+    fmt = _detect_format(path, fmt)
+
+    if fmt == 'parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Reading Parquet session logs requires pyarrow (pip install pyarrow)")
+
+        parquet_file = pq.ParquetFile(path)
+        columns = [c for c in SESSION_FIELDS if c in parquet_file.schema_arrow.names]
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+            yield fmt, batch.to_pylist()
+        return
+
+    chunk = []
+    with open(path, 'r', newline='' if fmt == 'csv' else None) as f:
+        records = csv.DictReader(f) if fmt == 'csv' else (line for line in f if line.strip())
+        for record in records:
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                yield fmt, chunk
+                chunk = []
+    if chunk:
+        yield fmt, chunk
+
+
+def parse_records(fmt, records):
+    """Decode raw records from ``iter_raw_chunks`` into session dicts"""
+    if fmt == 'jsonl':
+        return [json.loads(line) for line in records]
+    return [_csv_session(record) for record in records]
+
+
+def iter_session_chunks(path, chunk_size=10000, fmt=None):
+    """Yield lists of session dicts from a JSONL, CSV or Parquet session log"""
+    for chunk_format, records in iter_raw_chunks(path, chunk_size, fmt):
+        yield parse_records(chunk_format, records)
+
+
+def extract_chunk(fmt, records, columns):
+    """Decode a raw chunk and return its feature matrix (runs in worker processes)"""
+    return FEATURE_REGISTRY.plan(columns).extract_matrix(parse_records(fmt, records))
+
+
+def _parallel_feature_chunks(raw_chunks, columns, workers, max_in_flight):
+    """Extract features in a process pool, in input order, with bounded look-ahead"""
+    if workers <= 1:
+        for fmt, records in raw_chunks:
+            yield len(records), extract_chunk(fmt, records, columns)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        pending = []
+        for fmt, records in raw_chunks:
+            pending.append((len(records), pool.submit(extract_chunk, fmt, records, columns)))
+            if len(pending) >= max_in_flight:
+                n_rows, future = pending.pop(0)
+                yield n_rows, future.result()
+        for n_rows, future in pending:
+            yield n_rows, future.result()
+
+
+class Reservoir:
+    """Uniform fixed-size sample over a stream of feature rows (Algorithm R, per chunk)"""
+
+    def __init__(self, size, n_features, seed=42, dtype=np.float64):
+        self.size = size
+        self.rows = np.empty((size, n_features), dtype=dtype)
+        self.seen = 0
+        self.rng = np.random.default_rng(seed)
+
+    def add(self, X):
+        filled = min(self.seen, self.size)
+        take = min(self.size - filled, len(X))
+        if take:
+            self.rows[filled:filled + take] = X[:take]
+        rest = X[take:]
+        if len(rest):
+            # Row with global index i replaces a random slot with probability size / (i + 1)
+            positions = self.seen + take + np.arange(len(rest))
+            slots = self.rng.integers(0, positions + 1)
+            keep = slots < self.size
+            self.rows[slots[keep]] = rest[keep]
+        self.seen += len(X)
+
+    def sample(self):
+        return self.rows[:min(self.seen, self.size)]
+
+
+def train_from_logs(detector, path, chunk_size=10000, workers=None, reservoir_size=100000,
+                    max_samples=256, n_jobs=-1, fmt=None, verbose=True):
+    """Fit ``detector`` from a session log; returns per-stage timings"""
+    from sklearn.preprocessing import StandardScaler
+
+    workers = workers or os.cpu_count() or 1
+    plan = detector.plan
+    timings = {'read_and_extract': 0.0, 'fit_scaler': 0.0, 'reservoir': 0.0}
+
+    scaler = StandardScaler()
+    reservoir = Reservoir(reservoir_size, len(plan), dtype=plan.dtype)
+    start = time.perf_counter()
+    total_rows = 0
+
+    chunk_start = time.perf_counter()
+    for n_rows, X in _parallel_feature_chunks(iter_raw_chunks(path, chunk_size, fmt), plan.columns,
+                                              workers, max_in_flight=workers * 2):
+        timings['read_and_extract'] += time.perf_counter() - chunk_start
+
+        stage_start = time.perf_counter()
+        scaler.partial_fit(X)
+        timings['fit_scaler'] += time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        reservoir.add(X)
+        timings['reservoir'] += time.perf_counter() - stage_start
+
+        total_rows += n_rows
+        if verbose:
+            elapsed = time.perf_counter() - start
+            print(f"[TRAIN] {total_rows:,} sessions processed ({total_rows / elapsed:,.0f}/s)")
+        chunk_start = time.perf_counter()
+
+    if total_rows == 0:
+        raise ValueError(f"No sessions found in {path}")
+
+    stage_start = time.perf_counter()
+    X_sample = scaler.transform(reservoir.sample())
+    model = detector.new_model(max_samples=min(max_samples, len(X_sample)), n_jobs=n_jobs)
+    model.fit(X_sample)
+    timings['fit_forest'] = time.perf_counter() - stage_start
+
+    stage_start = time.perf_counter()
+    detector.scaler = scaler
+    detector.model = model
+    detector.swap_state(detector.build_state(scaler, model))
+    timings['compile'] = time.perf_counter() - stage_start
+
+    timings['total'] = time.perf_counter() - start
+    timings['rows'] = total_rows
+    timings['reservoir_rows'] = len(X_sample)
+    timings['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+    if verbose:
+        for stage in ('read_and_extract', 'fit_scaler', 'reservoir', 'fit_forest', 'compile', 'total'):
+            print(f"[TRAIN] {stage:<18}{timings[stage]:>9.2f}s")
+        print(f"[TRAIN] peak RSS {timings['peak_rss_mb']:.0f} MB")
+    return timings
+
+
+def main():
+    from .fraud_detector import FraudDetector
+
+    parser = argparse.ArgumentParser(description="Train FraudDetector from session logs on disk")
+    parser.add_argument('input', help='Session log (.jsonl, .csv or .parquet)')
+    parser.add_argument('--output', required=True, help='Model artifact to write')
+    parser.add_argument('--format', choices=['jsonl', 'csv', 'parquet'], help='Override format detection')
+    parser.add_argument('--chunk-size', type=int, default=10000, help='Sessions per chunk')
+    parser.add_argument('--workers', type=int, default=None, help='Feature extraction processes')
+    parser.add_argument('--reservoir-size', type=int, default=100000, help='Rows kept for the forest fit')
+    parser.add_argument('--max-samples', type=int, default=256, help='IsolationForest max_samples')
+    parser.add_argument('--n-jobs', type=int, default=-1, help='IsolationForest n_jobs')
+    args = parser.parse_args()
+
+    detector = FraudDetector()
+    train_from_logs(detector, args.input, args.chunk_size, args.workers, args.reservoir_size,
+                    args.max_samples, args.n_jobs, fmt=args.format)
+    fingerprint = detector.save(args.output)
+    print(f"Model artifact saved to {args.output} ({fingerprint[:12]})")
+
+
+if __name__ == "__main__":
+    main()
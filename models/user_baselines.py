@@ -0,0 +1,317 @@
+# Per-user behavioral baselines in a memory-mapped open-addressing table
+#
+# Every user owns one fixed-size record (80 bytes) in a .npy file opened with
+# np.lib.format.open_memmap: running mean / variance of their typing and mouse
+# rhythm, session count, last-seen time and a small ring of recent locations.
+# The slot is found by hashing the user id and probing linearly, so lookups
+# and updates are O(1) and only the touched pages are read from disk. Ten
+# million users at the default 0.7 load factor is a ~1.2 GB sparse file.
+#
+# The number of users lives in a one-element sidecar (<path>.size, also a
+# memmap) updated on insert, so opening a store does not scan its keys.
+# One process should write to a store at a time; readers in other processes
+# can open it with mode='r'.
+#
+# Usage:
+#   python -m models.user_baselines create baselines.npy --capacity 16777216
+#   python -m models.user_baselines info baselines.npy
+#   python -m models.user_baselines show baselines.npy user-42
+
+import argparse
+import hashlib
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+# Per-session features tracked with Welford running statistics
+STATS = ('avg_keystroke_interval', 'typing_speed', 'avg_mouse_speed')
+LOCATION_SLOTS = 4
+
+RECORD_DTYPE = np.dtype([
+    ('key', '<u8'),                 # 64-bit hash of the user id, 0 = empty slot
+    ('sessions', '<u4'),
+    ('location_count', '<u2'),
+    ('location_head', '<u2'),       # next ring position to overwrite
+    ('last_seen', '<f8'),           # unix time of the last update
+    ('stat_mean', '<f4', (len(STATS),)),
+    ('stat_m2', '<f4', (len(STATS),)),
+    ('locations', '<f4', (LOCATION_SLOTS, 2)),
+])
+
+# Returned per request by compare / compare_and_update, in this order
+DEVIATION_FEATURES = ('baseline_sessions',) + tuple(f'{stat}_z' for stat in STATS) + (
+    'km_from_recent_location', 'hours_since_last_seen')
+
+EARTH_RADIUS_KM = 6371.0
+
+SIZE_SUFFIX = '.size'
+
+
+def user_key(user_id):
+    """Stable non-zero 64-bit key for a user id"""
+    digest = hashlib.blake2b(str(user_id).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') or 1
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class StoreFull(Exception):
+    """Raised when inserting a new user would exceed the store's load factor"""
+
+
+class UserBaselineStore:
+    """
+    Fixed-capacity table of per-user baselines backed by a memory-mapped file.
+
+    ``compare_and_update`` is the per-request entry point: it returns the
+    DEVIATION_FEATURES of a session against the user's history and then folds
+    the session into that history, with a single probe.
+    """
+
+    def __init__(self, records, path=None, max_load=0.7, min_sessions=3, size_counter=None):
+        self.records = records
+        self.path = path
+        self.capacity = len(records)
+        if self.capacity & (self.capacity - 1):
+            raise ValueError(f"Store capacity must be a power of two, got {self.capacity}")
+        self.max_load = max_load
+        self.min_sessions = min_sessions
+        # Field views, so probing does not go through the structured dtype
+        self.keys = records['key']
+        # One-element memmap holding the user count of file stores (see module header)
+        self.size_counter = size_counter
+        self.size = int(size_counter[0]) if size_counter is not None else int(np.count_nonzero(self.keys))
+        self._positions = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, path, capacity=1 << 20, **kwargs):
+        """Create an empty store for about ``capacity * max_load`` users"""
+        capacity = 1 << max(0, int(capacity) - 1).bit_length()
+        records = np.lib.format.open_memmap(path, mode='w+', dtype=RECORD_DTYPE, shape=(capacity,))
+        size_counter = np.lib.format.open_memmap(path + SIZE_SUFFIX, mode='w+', dtype='<u8', shape=(1,))
+        return cls(records, path, size_counter=size_counter, **kwargs)
+
+    @classmethod
+    def open(cls, path, mode='r+', **kwargs):
+        records = np.lib.format.open_memmap(path, mode=mode)
+        if records.dtype != RECORD_DTYPE:
+            raise ValueError(f"{path} is not a user baseline store (record dtype {records.dtype})")
+        size_path = path + SIZE_SUFFIX
+        if os.path.exists(size_path):
+            size_counter = np.lib.format.open_memmap(size_path, mode=mode)
+        else:
+            # Store written without a sidecar: count its keys once and add one when writable
+            size = np.count_nonzero(records['key'])
+            if mode == 'r':
+                size_counter = np.array([size], dtype='<u8')
+            else:
+                size_counter = np.lib.format.open_memmap(size_path, mode='w+', dtype='<u8', shape=(1,))
+                size_counter[0] = size
+        return cls(records, path, size_counter=size_counter, **kwargs)
+
+    @classmethod
+    def open_or_create(cls, path, capacity=1 << 20, **kwargs):
+        if os.path.exists(path):
+            return cls.open(path, **kwargs)
+        return cls.create(path, capacity, **kwargs)
+
+    def __len__(self):
+        return self.size
+
+    def _find(self, key):
+        """Slot holding ``key``, or the empty slot where it would go"""
+        mask = self.capacity - 1
+        keys = self.keys
+        slot = key & mask
+        while True:
+            current = keys[slot]
+            if current == key or current == 0:
+                return slot
+            slot = (slot + 1) & mask
+
+    def _slot_for_update(self, key):
+        slot = self._find(key)
+        if self.keys[slot] == 0:
+            if self.size + 1 > self.max_load * self.capacity:
+                raise StoreFull(f"User baseline store is full ({self.size:,} users, "
+                                f"capacity {self.capacity:,}); rehash into a larger store")
+            self.keys[slot] = key
+            self.size += 1
+            if self.size_counter is not None:
+                self.size_counter[0] = self.size
+        return slot
+
+    def positions(self, columns):
+        """Indices of STATS and of the location columns in a feature row with ``columns``"""
+        columns = tuple(columns)
+        positions = self._positions.get(columns)
+        if positions is None:
+            index = {name: i for i, name in enumerate(columns)}
+            positions = self._positions[columns] = (
+                tuple(index.get(stat, -1) for stat in STATS),
+                tuple(index.get(name, -1) for name in ('has_geolocation', 'latitude', 'longitude')),
+            )
+        return positions
+
+    def session_values(self, row, columns):
+        """``(stat values, latitude, longitude)`` of one feature row; missing stats are NaN"""
+        stat_positions, (has_geo, lat, lon) = self.positions(columns)
+        values = [float(row[i]) if i >= 0 else math.nan for i in stat_positions]
+        if has_geo >= 0 and lat >= 0 and lon >= 0 and row[has_geo]:
+            return values, float(row[lat]), float(row[lon])
+        return values, None, None
+
+    def _deviations(self, slot, values, latitude, longitude, now):
+        record = self.records[slot]
+        sessions = int(record['sessions'])
+        result = [float(sessions)]
+        if sessions >= self.min_sessions:
+            means = record['stat_mean']
+            m2 = record['stat_m2']
+            for i, value in enumerate(values):
+                if math.isnan(value):
+                    result.append(0.0)
+                    continue
+                mean = float(means[i])
+                std = math.sqrt(max(float(m2[i]), 0.0) / sessions)
+                # Floor so a perfectly regular history does not divide by zero
+                std = max(std, 1e-3 * abs(mean), 1e-9)
+                result.append((value - mean) / std)
+        else:
+            result.extend(0.0 for _ in values)
+
+        location_count = int(record['location_count'])
+        if latitude is not None and location_count:
+            locations = record['locations'][:location_count].tolist()
+            result.append(min(haversine_km(latitude, longitude, lat, lon) for lat, lon in locations))
+        else:
+            result.append(0.0)
+
+        last_seen = float(record['last_seen'])
+        result.append((now - last_seen) / 3600.0 if sessions else 0.0)
+        return result
+
+    def _update(self, slot, values, latitude, longitude, now):
+        record = self.records[slot]
+        sessions = int(record['sessions']) + 1
+        means = record['stat_mean']
+        m2 = record['stat_m2']
+        for i, value in enumerate(values):
+            if math.isnan(value):
+                continue
+            delta = value - float(means[i])
+            mean = float(means[i]) + delta / sessions
+            means[i] = mean
+            m2[i] = float(m2[i]) + delta * (value - mean)
+        record['sessions'] = sessions
+        record['last_seen'] = now
+
+        if latitude is not None:
+            head = int(record['location_head'])
+            record['locations'][head] = (latitude, longitude)
+            record['location_head'] = (head + 1) % LOCATION_SLOTS
+            record['location_count'] = min(int(record['location_count']) + 1, LOCATION_SLOTS)
+
+    def compare(self, user_id, values, latitude=None, longitude=None, now=None):
+        """DEVIATION_FEATURES of a session against the user's baseline (all zero for new users)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            slot = self._find(user_key(user_id))
+            if self.keys[slot] == 0:
+                return [0.0] * len(DEVIATION_FEATURES)
+            return self._deviations(slot, values, latitude, longitude, now)
+
+    def update(self, user_id, values, latitude=None, longitude=None, now=None):
+        """Fold one session into the user's baseline, creating the user if needed"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._update(self._slot_for_update(user_key(user_id)), values, latitude, longitude, now)
+
+    def compare_and_update(self, user_id, values, latitude=None, longitude=None, now=None, update=True):
+        """``compare`` then (when ``update``) ``update``, with one probe"""
+        now = time.time() if now is None else now
+        with self._lock:
+            slot = self._slot_for_update(user_key(user_id)) if update else self._find(user_key(user_id))
+            if self.keys[slot] == 0:
+                return [0.0] * len(DEVIATION_FEATURES)
+            deviations = self._deviations(slot, values, latitude, longitude, now)
+            if update:
+                self._update(slot, values, latitude, longitude, now)
+            return deviations
+
+    def lookup(self, user_id):
+        """The stored baseline of a user as a dict, or None"""
+        slot = self._find(user_key(user_id))
+        if self.keys[slot] == 0:
+            return None
+        record = self.records[slot]
+        sessions = int(record['sessions'])
+        location_count = int(record['location_count'])
+        return {
+            'sessions': sessions,
+            'last_seen': float(record['last_seen']),
+            'mean': dict(zip(STATS, record['stat_mean'].tolist())),
+            'std': dict(zip(STATS, np.sqrt(record['stat_m2'] / max(sessions, 1)).tolist())),
+            'locations': record['locations'][:location_count].tolist(),
+        }
+
+    def rehash(self, path, capacity):
+        """Copy every user into a new, larger store at ``path`` and return it"""
+        target = UserBaselineStore.create(path, capacity, max_load=self.max_load,
+                                          min_sessions=self.min_sessions)
+        occupied = np.flatnonzero(self.keys)
+        if len(occupied) > target.max_load * target.capacity:
+            raise StoreFull(f"{len(occupied):,} users do not fit in capacity {target.capacity:,}")
+        for slot in occupied.tolist():
+            key = int(self.keys[slot])
+            target_slot = target._slot_for_update(key)
+            target.records[target_slot] = self.records[slot]
+        target.flush()
+        return target
+
+    def flush(self):
+        if isinstance(self.records, np.memmap):
+            self.records.flush()
+        if isinstance(self.size_counter, np.memmap):
+            self.size_counter.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage a per-user behavioral baseline store")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    create = subparsers.add_parser('create', help='Create an empty store')
+    create.add_argument('path')
+    create.add_argument('--capacity', type=int, default=1 << 20, help='Slots (rounded up to a power of two)')
+    info = subparsers.add_parser('info', help='Print size and load factor')
+    info.add_argument('path')
+    show = subparsers.add_parser('show', help="Print one user's baseline")
+    show.add_argument('path')
+    show.add_argument('user_id')
+    args = parser.parse_args()
+
+    if args.command == 'create':
+        store = UserBaselineStore.create(args.path, args.capacity)
+        store.flush()
+        print(f"Created {args.path}: {store.capacity:,} slots, "
+              f"{store.capacity * RECORD_DTYPE.itemsize / 2 ** 20:,.0f} MB")
+        return
+
+    store = UserBaselineStore.open(args.path, mode='r')
+    if args.command == 'info':
+        print(f"{args.path}: {len(store):,} users in {store.capacity:,} slots "
+              f"(load {len(store) / store.capacity:.1%})")
+    else:
+        print(store.lookup(args.user_id))
+
+
+if __name__ == "__main__":
+    main()